@@ -0,0 +1,1350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双串口调试器性能测量脚本
+串口相关测量使用Linux伪终端(pty)代替真实串口，无需硬件即可运行
+
+用法:
+  python benchmark.py reader    测量接收线程空闲唤醒次数和首字节延迟
+  python benchmark.py batch     测量持续高速接收时投递给界面的批次频率
+  python benchmark.py capture   测量录制文件写入速度和按时间段打开的耗时
+  python benchmark.py hex       测量十六进制格式化速度
+  python benchmark.py decode    经loop://随机分块，比较逐块解码和增量解码的结果与速度，
+                                增量解码结果不一致时返回非0
+  python benchmark.py autosend  测量两个串口同时高频自动发送的定时抖动
+  python benchmark.py frame     随机分块送入各分帧器，检查成帧结果并测量速度
+  python benchmark.py checksum  测量各校验算法的速度，与逐位计算比较
+  python benchmark.py ports     测量多个串口同时接收时界面线程的负载(需要PyQt5)
+  python benchmark.py bridge    两对伪终端之间双向桥接，测量转发延迟和吞吐并校验数据
+  python benchmark.py xmodem    经伪终端向模拟接收方发送XMODEM/YMODEM文件，校验数据并测量线路利用率
+  python benchmark.py replay    以最快速度回放录制文件，测量接收处理和界面显示的吞吐(显示部分需要PyQt5)
+  python benchmark.py trigger   随机分块送入触发器，检查跨块的命中都能找到，测量正则和多模式字节匹配的速度
+  python benchmark.py sequence  由快速字符串(默认词条和SSCOM导入)生成命令序列再解析，检查步骤一致
+  python benchmark.py suite     经pty、socket://和loop://端到端测量接收吞吐、发送延迟，以及各显示模式下
+                                界面队列深度和每串口CPU(需要PyQt5)，--json输出结果便于版本间比较
+  python benchmark.py soak      长时间(默认10分钟)持续接收并显示，定期记录内存和界面队列深度(需要PyQt5)
+"""
+
+import os
+import sys
+import json
+import random
+import select
+import socket
+import platform
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+
+import serial
+
+from serial_core import (READ_MODE_BLOCKING, READ_MODE_POLL, DEFAULT_FLUSH_RATE, DIRECTION_RX,
+                         HEX_TABLE, read_chunk, cancel_read, format_hex, format_hexdump,
+                         CATCH_UP_POLICIES, PortReader, PortWriter, CaptureWriter, CaptureFile,
+                         TextAssembler, AutoSender, make_framer, CHECKSUMS, PortSession, ModemSender,
+                         MODEM_PROTOCOLS, MODEM_SOH, MODEM_STX, MODEM_EOT, MODEM_ACK, MODEM_NAK, MODEM_CAN,
+                         MODEM_CRC, MODEM_PAD, crc16_xmodem, char_bits, parse_triggers, TriggerEngine,
+                         default_quick_strings, parse_sscom_quick_strings, sequence_from_quick_strings,
+                         parse_sequence)
+
+try:
+    from version_info import VERSION
+except ImportError:
+    VERSION = '未知'
+
+
+def open_pty_pair(timeout=0.1):
+    """创建伪终端对，返回(主端fd, 从端串口对象)"""
+    if not hasattr(os, 'openpty'):
+        print("此项测量需要支持伪终端的系统(Linux/macOS)")
+        sys.exit(1)
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave), timeout=timeout)
+    os.close(slave)
+    return master, port
+
+
+def measure_reader(mode, idle_seconds=2.0, samples=50, min_bytes=1, timeout=0.1):
+    """测量一种读取模式的空闲唤醒次数和首字节延迟"""
+    master, port = open_pty_pair(timeout)
+    wakeups = 0
+    arrivals = []
+    running = True
+
+    def reader():
+        nonlocal wakeups
+        while running:
+            try:
+                data = read_chunk(port, mode, min_bytes)
+            except Exception:
+                break
+            wakeups += 1
+            if data:
+                arrivals.append(time.perf_counter())
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    # 空闲阶段：线路上没有数据
+    time.sleep(idle_seconds)
+    idle_wakeups = wakeups
+
+    # 延迟阶段：每次写入1字节，记录从写入到读出的时间
+    latencies = []
+    for _ in range(samples):
+        count = len(arrivals)
+        sent = time.perf_counter()
+        os.write(master, b'U')
+        deadline = sent + 1.0
+        while len(arrivals) == count and time.perf_counter() < deadline:
+            time.sleep(0.0001)
+        if len(arrivals) > count:
+            latencies.append((arrivals[count] - sent) * 1000)
+        time.sleep(0.005)
+
+    running = False
+    cancel_read(port)
+    thread.join(1)
+    port.close()
+    os.close(master)
+
+    return {
+        'mode': mode,
+        'idle_wakeups_per_sec': idle_wakeups / idle_seconds,
+        'latency_ms_median': statistics.median(latencies) if latencies else None,
+        'latency_ms_max': max(latencies) if latencies else None,
+    }
+
+
+def bench_reader(args):
+    print("=== 接收线程测量 (pty) ===")
+    print(f"{'模式':<10}{'空闲唤醒/秒':>14}{'首字节延迟中位(ms)':>22}{'最大(ms)':>12}")
+    for mode in (READ_MODE_POLL, READ_MODE_BLOCKING):
+        r = measure_reader(mode, args.idle, args.samples, args.min_bytes, args.timeout / 1000)
+        print(f"{r['mode']:<10}{r['idle_wakeups_per_sec']:>14.1f}"
+              f"{r['latency_ms_median']:>22.3f}{r['latency_ms_max']:>12.3f}")
+
+
+def feed_pty(master, baudrate, seconds, chunk_size=64):
+    """按波特率对应的字节速率向伪终端主端写入数据"""
+    rate = baudrate / 10  # 8N1每字节10位
+    payload = bytes(range(256)) * (chunk_size // 256 + 1)
+    payload = payload[:chunk_size]
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < seconds:
+        target = (time.perf_counter() - start) * rate
+        while sent < target:
+            os.write(master, payload)
+            sent += len(payload)
+        time.sleep(0.0005)
+    return sent
+
+
+def bench_batch(args):
+    print(f"=== 批量投递测量 (pty, {args.baud} 波特, {args.seconds} 秒) ===")
+    master, port = open_pty_pair(0.1)
+    batches = []
+
+    def on_batch(chunks, received):
+        batches.append((len(chunks), received))
+
+    reader = PortReader(port, on_batch, flush_rate=args.rate)
+    thread = threading.Thread(target=reader.run, daemon=True)
+    thread.start()
+    sent = feed_pty(master, args.baud, args.seconds)
+    time.sleep(0.2)
+    reader.stop()
+    thread.join(1)
+    port.close()
+    os.close(master)
+
+    reads = sum(n for n, _ in batches)
+    received = sum(size for _, size in batches)
+    print(f"发送字节: {sent}  接收字节: {received}")
+    print(f"读取次数: {reads} ({reads / args.seconds:.0f}/秒，即不合批时的信号数)")
+    print(f"投递批次: {len(batches)} ({len(batches) / args.seconds:.0f}/秒，上限 {args.rate}/秒)")
+    if batches:
+        print(f"每批平均读取块数: {reads / len(batches):.1f}  最大批次字节: {max(s for _, s in batches)}")
+
+
+def bench_capture(args):
+    print(f"=== 录制文件测量 ({args.mb} MB, 每条 {args.chunk} 字节) ===")
+    directory = tempfile.mkdtemp(prefix='sdcap_')
+    writer = CaptureWriter(os.path.join(directory, 'bench.cap'), 1,
+                           rotate_bytes=1 << 62, rotate_seconds=1 << 30)
+    writer.start()
+    payload = bytes(range(256)) * (args.chunk // 256 + 1)
+    payload = payload[:args.chunk]
+    count = args.mb * 1024 * 1024 // args.chunk
+    # 模拟每毫秒收到一块数据
+    timestamp_ns = time.monotonic_ns()
+    start = time.perf_counter()
+    for _ in range(count):
+        while writer.queue.full():
+            time.sleep(0.001)
+        writer.write(DIRECTION_RX, payload, timestamp_ns)
+        timestamp_ns += 1000000
+    writer.stop()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(writer.current_path)
+    print(f"写入: {size / 1048576:.1f} MB 用时 {elapsed:.2f} 秒 ({size / 1048576 / elapsed:.1f} MB/秒)，"
+          f"覆盖 {count / 1000 / 60:.1f} 分钟")
+
+    # 打开中间1%时间段
+    start = time.perf_counter()
+    with CaptureFile(writer.current_path) as capture:
+        opened = time.perf_counter() - start
+        first = capture.to_wall(capture.index_times[0])
+        last = capture.to_wall(capture.index_times[-1])
+        window_start = first + (last - first) * 0.5
+        window_end = window_start + (last - first) * 0.01
+        records = 0
+        received = 0
+        for _, _, _, data in capture.records(window_start, window_end):
+            records += 1
+            received += len(data)
+            data.release()
+        total = time.perf_counter() - start
+    print(f"打开文件及索引: {opened * 1000:.2f} ms ({len(capture.index_times)} 个索引项)")
+    print(f"读取1%时间段: {records} 条记录 {received} 字节，总用时 {total * 1000:.2f} ms")
+
+    os.remove(writer.current_path)
+    os.remove(writer.current_path + '.idx')
+    os.rmdir(directory)
+
+
+def bench_hex(args):
+    print("=== 十六进制格式化测量 (MB/秒) ===")
+    formatters = [
+        ('逐字节f-string', lambda data: ' '.join([f'{b:02X}' for b in data])),
+        ('查表', lambda data: ' '.join(map(HEX_TABLE.__getitem__, data))),
+        ('format_hex', format_hex),
+        ('format_hexdump', format_hexdump),
+    ]
+    print(f"{'块大小':>8}" + ''.join(f'{name:>18}' for name, _ in formatters))
+    for size in (1, 16, 256, 4096, 65536):
+        data = os.urandom(size)
+        row = f'{size:>8}'
+        for _, formatter in formatters:
+            # 每种格式化至少处理约4MB数据
+            loops = max(1, (4 * 1024 * 1024) // size // (1 if size > 16 else 8))
+            start = time.perf_counter()
+            for _ in range(loops):
+                formatter(data)
+            elapsed = time.perf_counter() - start
+            row += f'{size * loops / elapsed / 1048576:>18.2f}'
+        print(row)
+
+
+def bench_decode(args):
+    print(f"=== 分块解码测量 (loop://, {args.encoding}, {args.rounds} 轮) ===")
+    rng = random.Random(args.seed)
+    text = ''.join(f'第{i}行 温度=25.{i % 10}℃ ★ status=OK\n' for i in range(2000))
+    payload = text.encode(args.encoding)
+    expected = text.replace('\n', '')
+
+    port = serial.serial_for_url('loop://', timeout=0)
+    per_chunk_errors = 0
+    incremental_errors = 0
+    per_chunk_time = 0.0
+    incremental_time = 0.0
+    for _ in range(args.rounds):
+        # 随机切分后经过loop://端口回读
+        chunks = []
+        pos = 0
+        while pos < len(payload):
+            size = rng.randint(1, 64)
+            port.write(payload[pos:pos + size])
+            chunks.append(port.read(size))
+            pos += size
+
+        start = time.perf_counter()
+        decoded = ''.join(chunk.decode(args.encoding, errors='replace') for chunk in chunks)
+        per_chunk_time += time.perf_counter() - start
+        per_chunk_errors += decoded.count('\ufffd')
+
+        start = time.perf_counter()
+        assembler = TextAssembler(args.encoding)
+        lines = []
+        for chunk in chunks:
+            lines.extend(line for _, line in assembler.feed(chunk, 0))
+        incremental_time += time.perf_counter() - start
+        result = ''.join(lines)
+        if result != expected:
+            incremental_errors += 1
+    port.close()
+
+    total = len(payload) * args.rounds / 1048576
+    print(f"逐块解码: 替换字符 {per_chunk_errors} 个，{total / per_chunk_time:.1f} MB/秒")
+    print(f"增量解码: 结果不一致 {incremental_errors} 轮，{total / incremental_time:.1f} MB/秒(含分行)")
+    # 逐块解码只作对照，出现替换字符是预期的；增量解码必须与原文一致
+    return 1 if incremental_errors else 0
+
+
+def slip_encode(payload):
+    return b'\xc0' + payload.replace(b'\xdb', b'\xdb\xdd').replace(b'\xc0', b'\xdb\xdc') + b'\xc0'
+
+
+def cobs_encode(payload):
+    output = bytearray()
+    for block in payload.split(b'\x00'):
+        while len(block) >= 0xFE:
+            output += b'\xff' + block[:0xFE]
+            block = block[0xFE:]
+        output += bytes([len(block) + 1]) + block
+    return bytes(output) + b'\x00'
+
+
+def bench_frame(args):
+    print(f"=== 分帧测量 ({args.frames} 帧, 随机分块1~{args.chunk}字节) ===")
+    rng = random.Random(args.seed)
+    payloads = [os.urandom(rng.randint(4, 60)) for _ in range(args.frames)]
+    cases = [
+        ('分隔符', '0D 0A', [p.replace(b'\r\n', b'') for p in payloads],
+         lambda p: p + b'\r\n'),
+        ('定长', '32', [p[:32].ljust(32, b'\x00') for p in payloads], lambda p: p),
+        ('长度字段', '1,1,big,0', [b'\xaa' + bytes([len(p)]) + p for p in payloads], lambda p: p),
+        ('SLIP', '', payloads, slip_encode),
+        ('COBS', '', payloads, cobs_encode),
+    ]
+    print(f"{'分帧方式':<8}{'MB/秒':>10}{'万帧/秒':>10}{'结果':>8}")
+    for name, param, frames, encode in cases:
+        stream = b''.join(encode(frame) for frame in frames)
+        chunks = []
+        pos = 0
+        while pos < len(stream):
+            size = rng.randint(1, args.chunk)
+            chunks.append(stream[pos:pos + size])
+            pos += size
+        framer = make_framer(name, param)
+        start = time.perf_counter()
+        result = []
+        for chunk in chunks:
+            result.extend(frame for _, frame in framer.feed(chunk, 0))
+        elapsed = time.perf_counter() - start
+        expected = [frame for frame in frames if frame]
+        status = '一致' if result == expected else f'不一致({len(result)}/{len(expected)})'
+        print(f"{name:<8}{len(stream) / elapsed / 1048576:>10.1f}{len(result) / elapsed / 10000:>10.1f}"
+              f"{status:>8}")
+
+
+def crc16_modbus_bitwise(data):
+    """逐位计算的CRC16-Modbus，作为查表实现的对照"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def xor8_loop(data):
+    value = 0
+    for byte in data:
+        value ^= byte
+    return value
+
+
+def bench_checksum(args):
+    print("=== 校验算法测量 (MB/秒) ===")
+    algorithms = [(name, checksum.func) for name, checksum in CHECKSUMS.items()]
+    algorithms += [('Modbus逐位', crc16_modbus_bitwise), ('XOR逐字节', xor8_loop)]
+    sizes = (8, 256, 4096, 65536)
+    print(f"{'算法':<14}" + ''.join(f'{size:>12}' for size in sizes))
+    for name, func in algorithms:
+        row = f'{name:<14}'
+        for size in sizes:
+            data = os.urandom(size)
+            loops = max(1, args.kb * 1024 // size)
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(data)
+            elapsed = time.perf_counter() - start
+            row += f'{size * loops / elapsed / 1048576:>12.2f}'
+        print(row)
+    print("参考: 921600 波特的线路速率约 0.09 MB/秒")
+
+
+def bench_autosend(args):
+    print(f"=== 自动发送定时测量 (loop://, 2个串口, 间隔 {args.interval} ms, {args.seconds} 秒) ===")
+    senders = []
+    threads = []
+    for _ in range(2):
+        port = serial.serial_for_url('loop://', timeout=0)
+        writer = PortWriter(port, lambda *_: None)
+        thread = threading.Thread(target=writer.run, daemon=True)
+        thread.start()
+        sender = AutoSender(writer, b'AT\r\n', None, args.interval / 1000,
+                            CATCH_UP_POLICIES[args.catch_up])
+        senders.append(sender)
+        threads.append((writer, thread, port))
+    for sender in senders:
+        sender.start()
+    time.sleep(args.seconds)
+    for sender in senders:
+        sender.stop()
+    for writer, thread, port in threads:
+        writer.stop()
+        thread.join(1)
+        port.close()
+
+    expected = args.seconds * 1000 / args.interval
+    for i, sender in enumerate(senders, 1):
+        print(f"串口{i}: 发送 {sender.fired} 次 (理论 {expected:.0f})，跳过 {sender.missed}，"
+              f"丢弃 {sender.dropped}")
+        print(f"       抖动 {sender.stats.summary()}")
+
+
+def bench_ports(args):
+    counts = [int(n) for n in args.counts.split(',')]
+    print(f"=== 多串口界面负载测量 (pty, 每个串口 {args.baud} 波特文本行, {args.seconds} 秒) ===")
+    # 无显示环境下使用offscreen平台；配置文件写到临时目录
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import tty
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import serial_debugger
+    app = QApplication.instance() or QApplication([])
+    os.chdir(tempfile.mkdtemp(prefix='sdports_'))
+
+    print(f"{'串口数':<8}{'接收KB/秒':>12}{'界面处理次数/秒':>18}{'界面线程占用':>14}{'进程CPU':>10}")
+    for count in counts:
+        window = serial_debugger.SerialDebugger()
+        while len(window.tabs) < count:
+            window.add_port()
+        masters = []
+        for tab in window.tabs[:count]:
+            master, slave = os.openpty()
+            tty.setraw(master)
+            tty.setraw(slave)
+            tab.set_ports([{'device': os.ttyname(slave), 'description': 'pty'}])
+            tab.connect_serial()
+            os.close(slave)
+            masters.append(master)
+
+        line = b'sensor=0123 temp=25.50 hum=40.1\r\n'
+        rate = args.baud / 10  # 8N1每字节10位
+        running = True
+
+        def feeder():
+            start = time.perf_counter()
+            sent = 0
+            while running:
+                target = (time.perf_counter() - start) * rate
+                while sent < target:
+                    for master in masters:
+                        os.write(master, line)
+                    sent += len(line)
+                time.sleep(0.002)
+
+        dispatcher = window.dispatcher
+        drains, busy = dispatcher.drains, dispatcher.busy_time
+        cpu = time.process_time()
+        thread = threading.Thread(target=feeder, daemon=True)
+        thread.start()
+        QTimer.singleShot(int(args.seconds * 1000), app.quit)
+        app.exec_()
+        running = False
+        thread.join()
+
+        cpu = time.process_time() - cpu
+        received = sum(tab.session.received_count for tab in window.tabs)
+        print(f"{count:<8}{received / 1024 / args.seconds:>12.1f}"
+              f"{(dispatcher.drains - drains) / args.seconds:>18.1f}"
+              f"{(dispatcher.busy_time - busy) / args.seconds * 100:>13.1f}%"
+              f"{cpu / args.seconds * 100:>9.1f}%")
+        window.close()
+        for master in masters:
+            os.close(master)
+
+
+BRIDGE_READ_SIZE = 65536
+
+
+def bridge_direction(source, sink, rate, seconds, chunk_size, results, index):
+    """向source写入按rate限速的数据，从sink读出并校验，记录每块数据的端到端延迟"""
+    pattern = bytes(range(256)) * ((max(chunk_size, BRIDGE_READ_SIZE) + 255) // 256 + 1)
+    marks = []  # (累计字节数, 写入时间)
+    lock = threading.Lock()
+    latencies = []
+    received = 0
+    errors = 0
+    done = threading.Event()
+
+    def reader():
+        nonlocal received, errors
+        mark_index = 0
+        while True:
+            r, _, _ = select.select([sink], [], [], 0.2)
+            if not r:
+                if done.is_set():
+                    break
+                continue
+            data = os.read(sink, BRIDGE_READ_SIZE)
+            now = time.perf_counter()
+            offset = received % 256
+            if data != pattern[offset:offset + len(data)]:
+                errors += 1
+            received += len(data)
+            with lock:
+                while mark_index < len(marks) and marks[mark_index][0] <= received:
+                    latencies.append(now - marks[mark_index][1])
+                    mark_index += 1
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < seconds:
+        if sent < (time.perf_counter() - start) * rate:
+            offset = sent % 256
+            sent += chunk_size
+            # 先记录再写入，否则读线程可能在记录之前就读到这块数据
+            with lock:
+                marks.append((sent, time.perf_counter()))
+            os.write(source, pattern[offset:offset + chunk_size])
+        else:
+            time.sleep(0.0002)
+    time.sleep(0.5)
+    done.set()
+    thread.join()
+    results[index] = (sent, received, errors, latencies)
+
+
+def bench_bridge(args):
+    print(f"=== 双向桥接测量 (2对pty, 每个方向 {args.baud} 波特, {args.seconds} 秒, 每块 {args.chunk} 字节) ===")
+    import tty
+    pairs = [open_pty_pair(0.1) for _ in range(2)]
+    for master, _ in pairs:
+        tty.setraw(master)
+    (master_a, port_a), (master_b, port_b) = pairs
+    writers = [PortWriter(port, lambda *_: None) for port in (port_a, port_b)]
+    readers = [PortReader(port, lambda *_: None) for port in (port_a, port_b)]
+    readers[0].forward = writers[1].forward
+    readers[1].forward = writers[0].forward
+    threads = [threading.Thread(target=worker.run, daemon=True) for worker in readers + writers]
+    for thread in threads:
+        thread.start()
+
+    rate = args.baud / 10  # 8N1每字节10位
+    results = [None, None]
+    directions = [threading.Thread(target=bridge_direction,
+                                   args=(source, sink, rate, args.seconds, args.chunk, results, i))
+                  for i, (source, sink) in enumerate(((master_a, master_b), (master_b, master_a)))]
+    cpu = time.process_time()
+    for thread in directions:
+        thread.start()
+    for thread in directions:
+        thread.join()
+    cpu = time.process_time() - cpu
+
+    for reader in readers:
+        reader.stop()
+    for writer in writers:
+        writer.stop()
+    for thread in threads:
+        thread.join(1)
+    for master, port in pairs:
+        port.close()
+        os.close(master)
+
+    print(f"{'方向':<10}{'发送字节':>10}{'接收字节':>10}{'KB/秒':>9}{'校验':>6}"
+          f"{'延迟p50(ms)':>13}{'p99(ms)':>9}{'最大(ms)':>10}")
+    for name, (sent, received, errors, latencies) in zip(('A→B', 'B→A'), results):
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        print(f"{name:<10}{sent:>10}{received:>10}{received / 1024 / args.seconds:>9.1f}"
+              f"{'正确' if received == sent and not errors else '错误':>6}"
+              f"{p50:>13.3f}{p99:>9.3f}{(latencies[-1] * 1000 if latencies else 0):>10.3f}")
+    print(f"线路速率 {rate / 1024:.1f} KB/秒/方向，进程CPU {cpu / args.seconds * 100:.1f}%")
+    print("延迟为写入伪终端A到从伪终端B读出的端到端时间，含两次伪终端传递")
+
+
+class ModemReceiver:
+    """XMODEM/YMODEM模拟接收方，在伪终端主端上运行，用于端到端测试
+
+    line_rate为每秒字节数时按线路速率限速读取，使发送方的线路利用率接近真实串口；
+    error_rate为数据块被当作校验错误而回NAK的概率，用于测试重发。
+    """
+
+    def __init__(self, fd, batch=False, crc=True, line_rate=None, error_rate=0.0, seed=1, timeout=10.0):
+        self.fd = fd
+        self.batch = batch
+        self.crc = crc
+        self.line_rate = line_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.timeout = timeout
+        self.name = None
+        self.data = bytearray()
+        self.naks = 0
+        self._buffer = bytearray()
+        self._line_bytes = 0
+        self._start = None
+
+    def _read(self, n):
+        deadline = time.monotonic() + self.timeout
+        while len(self._buffer) < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if select.select([self.fd], [], [], remaining)[0]:
+                self._buffer += os.read(self.fd, 65536)
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        if self.line_rate:
+            # 按线路速率，这些字节最早什么时候才能收完
+            if self._start is None:
+                self._start = time.perf_counter()
+            self._line_bytes += n
+            delay = self._start + self._line_bytes / self.line_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def _reply(self, byte):
+        os.write(self.fd, bytes((byte,)))
+
+    def _block(self, head):
+        """读取一块的其余部分，返回(块号, 数据)，校验失败返回None"""
+        size = 128 if head == MODEM_SOH else 1024
+        rest = self._read(2 + size + (2 if self.crc else 1))
+        if rest is None:
+            return None
+        number, inverse, payload = rest[0], rest[1], rest[2:2 + size]
+        check = rest[2 + size:]
+        if self.crc:
+            valid = check == crc16_xmodem(payload).to_bytes(2, 'big')
+        else:
+            valid = check[0] == sum(payload) & 0xFF
+        if number + inverse != 0xFF or not valid:
+            return None
+        return number, payload
+
+    def receive(self):
+        """接收一个文件，返回是否成功"""
+        start = MODEM_CRC if self.crc else MODEM_NAK
+        expected = 0 if self.batch else 1
+        size = None
+        eot = False
+        self._reply(start)
+        while True:
+            head = self._read(1)
+            if head is None:
+                if expected in (0, 1) and not self.data:
+                    self._reply(start)
+                    continue
+                return False
+            head = head[0]
+            if head == MODEM_CAN:
+                return False
+            if head == MODEM_EOT:
+                if not eot:
+                    eot = True
+                    self._reply(MODEM_NAK)
+                    continue
+                self._reply(MODEM_ACK)
+                if self.batch:
+                    # 批量传输以空文件名的0号块结束
+                    self._reply(start)
+                    head = self._read(1)
+                    if head is None or self._block(head[0]) is None:
+                        return False
+                    self._reply(MODEM_ACK)
+                break
+            if head not in (MODEM_SOH, MODEM_STX):
+                continue
+            block = self._block(head)
+            if block is None or self.random.random() < self.error_rate:
+                self.naks += 1
+                self._buffer.clear()
+                self._reply(MODEM_NAK)
+                continue
+            number, payload = block
+            if number == (expected - 1) & 0xFF and expected > (0 if self.batch else 1):
+                self._reply(MODEM_ACK)  # 重复的块，上次的ACK丢失
+                continue
+            if number != expected & 0xFF:
+                self._reply(MODEM_CAN)
+                self._reply(MODEM_CAN)
+                return False
+            if self.batch and expected == 0:
+                name, _, info = payload.partition(b'\x00')
+                self.name = name.decode('utf-8', errors='replace')
+                size = int(info.split(b'\x00')[0].split()[0])
+                self._reply(MODEM_ACK)
+                self._reply(start)
+            else:
+                self.data += payload
+                self._reply(MODEM_ACK)
+            expected += 1
+        if size is not None:
+            del self.data[size:]
+        else:
+            self.data = self.data.rstrip(MODEM_PAD)
+        return True
+
+
+def bench_xmodem(args):
+    line_rate = args.baud / char_bits()
+    print(f"=== XMODEM/YMODEM传输测量 (pty, 模拟 {args.baud} 波特, 文件 {args.kb} KB, "
+          f"块错误率 {args.error_rate:.0%}) ===")
+    import tty
+    rng = random.Random(args.seed)
+    payload = bytes(rng.getrandbits(8) for _ in range(args.kb * 1024 - 37))
+    path = os.path.join(tempfile.mkdtemp(prefix='sdmodem_'), args.name)
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+    print(f"{'协议':<12}{'校验':>6}{'重发':>6}{'NAK':>6}{'用时(秒)':>10}{'KB/秒':>9}{'线路利用率':>12}")
+    for protocol in MODEM_PROTOCOLS:
+        for crc in ((True, False) if protocol == 'XMODEM' else (True,)):
+            master, slave = os.openpty()
+            tty.setraw(master)
+            tty.setraw(slave)
+            session = PortSession(1, {'port': os.ttyname(slave), 'baud': args.baud})
+            session.open()
+            receiver = ModemReceiver(master, protocol == 'YMODEM', crc, line_rate if args.throttle else None,
+                                     args.error_rate, args.seed)
+            result = []
+            thread = threading.Thread(target=lambda: result.append(receiver.receive()), daemon=True)
+            sender = ModemSender(session, path, protocol)
+            sender.start()
+            thread.start()
+            while not sender.finished:
+                time.sleep(0.01)
+            thread.join(5)
+            session.close()
+            os.close(master)
+            os.close(slave)
+            ok = bool(result and result[0]) and not sender.error and bytes(receiver.data) == payload
+            if protocol == 'YMODEM':
+                ok = ok and receiver.name == args.name
+            print(f"{protocol:<12}{'CRC16' if crc else '累加和':>6}{sender.retransmits:>6}{receiver.naks:>6}"
+                  f"{sender.elapsed:>10.2f}{sender.throughput / 1024:>9.1f}{sender.efficiency:>12.0%}"
+                  f"  {'正确' if ok else '错误: ' + str(sender.error)}")
+    os.remove(path)
+    if not args.throttle:
+        print("未限速时伪终端没有波特率限制，线路利用率仅供比较")
+
+
+def replay_once(session, path):
+    """以最快速度回放到session，返回所有数据交给on_batch的用时(秒)"""
+    start = time.perf_counter()
+    port = session.open_replay(path, 0)
+    while not (port.finished and session.received_count >= port.replayed):
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed
+
+
+def bench_replay(args):
+    print(f"=== 回放吞吐测量 ({args.mb} MB, 每块 {args.chunk} 字节, 最快速度) ===")
+    directory = tempfile.mkdtemp(prefix='sdreplay_')
+    writer = CaptureWriter(os.path.join(directory, 'bench.cap'), 1,
+                           rotate_bytes=1 << 62, rotate_seconds=1 << 30)
+    writer.start()
+    line = b'sensor=0123 temp=25.50 hum=40.1\r\n'
+    payload = (line * (args.chunk // len(line) + 1))[:args.chunk]
+    count = args.mb * 1024 * 1024 // args.chunk
+    timestamp_ns = time.monotonic_ns()
+    for _ in range(count):
+        while writer.queue.full():
+            time.sleep(0.001)
+        writer.write(DIRECTION_RX, payload, timestamp_ns)
+        timestamp_ns += 1000000
+    writer.stop()
+    path = writer.current_path
+    size = count * args.chunk
+
+    # 只经过接收线程的分帧和批次，不显示
+    print(f"{'处理路径':<24}{'用时(秒)':>10}{'MB/秒':>9}{'界面线程占用':>14}")
+    for framer in ('不分帧', '分隔符'):
+        session = PortSession(1, {'framer': framer})
+        session.on_batch = lambda s, chunks: None
+        elapsed = replay_once(session, path)
+        print(f"{'接收线程 ' + framer:<24}{elapsed:>10.2f}{size / 1048576 / elapsed:>9.1f}{'-':>14}")
+
+    # 经图形界面显示，界面线程处理不过来时回放自动暂停
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    import serial_debugger
+    app = QApplication.instance() or QApplication([])
+    os.chdir(tempfile.mkdtemp(prefix='sdreplay_ui_'))
+    window = serial_debugger.SerialDebugger()
+    tab = window.tabs[0]
+    tab.show_replay_dialog()
+    dialog = tab.replay_dialog
+    dialog.edit_path.setText(path)
+    dialog.combo_speed.setCurrentText('最快')
+    dispatcher = window.dispatcher
+    for name, hex_display in (('界面 文本', False), ('界面 十六进制', True)):
+        tab.check_hex_display.setChecked(hex_display)
+        busy = dispatcher.busy_time
+        start = time.perf_counter()
+        dialog.start()
+        while dialog.port is not None:
+            app.processEvents()
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        busy = dispatcher.busy_time - busy
+        print(f"{name:<24}{elapsed:>10.2f}{size / 1048576 / elapsed:>9.1f}{busy / elapsed * 100:>13.1f}%")
+    window.close()
+
+    os.remove(path)
+    os.remove(path + '.idx')
+    print("界面用时含回放窗口每200ms检查一次是否结束的等待")
+
+
+def bench_trigger(args):
+    print(f"=== 触发器测量 ({args.mb}MB, 随机分块1~{args.chunk}字节, 每{args.every}字节一次命中) ===")
+    rng = random.Random(args.seed)
+    background = bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz \n') for _ in range(65536))
+    keys = [f'KEY{i:03d}' for i in range(100)]
+    signatures = [bytes((0xDE, 0xAD, i)) for i in range(100)]
+    cases = [
+        ('正则1条', "regex 'ERROR [0-9]+'", lambda i: f'ERROR {i}'.encode()),
+        ('文本100条', '\n'.join(f'text {key}' for key in keys), lambda i: keys[i % 100].encode()),
+        ('十六进制100条', '\n'.join(f'hex "{sig.hex()}"' for sig in signatures), lambda i: signatures[i % 100]),
+        # 模式首字节在数据中很常见时，自动机无法跳过，逐字节查表
+        ('首字节常见', '\n'.join(f'text {word}' for word in ('the', 'and', 'ing', 'ion', 'ent', 'for')),
+         None),
+    ]
+    print(f"{'触发器':<12}{'MB/秒':>10}{'命中':>10}{'结果':>8}")
+    size = args.mb * 1048576
+    for name, script, planted in cases:
+        parts = []
+        total = 0
+        count = 0
+        while total < size:
+            offset = rng.randrange(len(background) - args.every)
+            parts.append(background[offset:offset + args.every])
+            if planted is not None:
+                parts.append(planted(count))
+                count += 1
+            total += args.every
+        stream = b''.join(parts)
+        chunks = []
+        pos = 0
+        while pos < len(stream):
+            step = rng.randint(1, args.chunk)
+            chunks.append(stream[pos:pos + step])
+            pos += step
+        engine = TriggerEngine(PortSession(1), parse_triggers(script))
+        start = time.perf_counter()
+        for chunk in chunks:
+            engine.on_received(chunk, 0)
+        elapsed = time.perf_counter() - start
+        hits = sum(rule.hits for rule in engine.rules)
+        status = '-' if planted is None else ('一致' if hits == count else f'不一致({hits}/{count})')
+        print(f"{name:<12}{len(stream) / elapsed / 1048576:>10.1f}{hits:>10}{status:>8}")
+
+
+def bench_sequence(args):
+    """由快速字符串生成脚本再解析回来，步骤与词条(含SSCOM延时)不一致时返回1"""
+    print("=== 命令序列生成与解析 ===")
+    sscom_lines = []
+    for i in range(1, args.count + 1):
+        sscom_lines.append(f'N1{i:02d}=0,命令{i},{i * 10}')
+        sscom_lines.append(f'N{i}=H,01 03 00 {i:02X} 00 01' if i % 2 else f'N{i}=A,AT+CMD{i}#{i}')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sscom.ini')
+        with open(path, 'w', encoding='gbk') as f:
+            f.write('\n'.join(sscom_lines) + '\n')
+        sscom = parse_sscom_quick_strings(path)
+    cases = [('默认词条(串口1)', default_quick_strings(1)), ('默认词条(串口2)', default_quick_strings(2)),
+             ('SSCOM导入', sscom)]
+    failed = 0
+    for name, quick_strings in cases:
+        expected = []
+        for i, item in enumerate(quick_strings, 1):
+            if item.get('content'):
+                expected.append(('quick', (i,)))
+                if item.get('delay'):
+                    expected.append(('delay', (float(item['delay']),)))
+        try:
+            result = [(step.kind, step.args) for step in
+                      parse_sequence(sequence_from_quick_strings(quick_strings))]
+            status = '一致' if result == expected else f'不一致({len(result)}/{len(expected)}步)'
+        except ValueError as e:
+            status = f'解析失败: {e}'
+        if status != '一致':
+            failed += 1
+        print(f"{name:<14}{len(expected):>6} 步  {status}")
+    return 1 if failed else 0
+
+
+def rss_bytes():
+    """当前进程的常驻内存(字节)；没有/proc的系统返回峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, p):
+    """已排序列表的百分位数，空列表返回None"""
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else None
+
+
+def write_json(path, name, args, results):
+    """把测量结果连同版本和运行环境写成JSON，用于比较不同版本"""
+    report = {
+        'benchmark': name,
+        'version': VERSION,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'pyserial': serial.VERSION,
+        'platform': platform.platform(),
+        'args': {key: value for key, value in vars(args).items() if key != 'func'},
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {path}")
+
+
+class PtyEndpoint:
+    """伪终端对：会话打开从端，测量方读写主端"""
+    name = 'pty'
+    remote = True
+
+    def __init__(self):
+        import tty
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def attach(self, session):
+        pass
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.master, view):]
+
+    def read(self, timeout):
+        if select.select([self.master], [], [], timeout)[0]:
+            return os.read(self.master, 65536)
+        return b''
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class SocketEndpoint:
+    """TCP连接代替串口：会话以socket://打开，测量方持有服务端连接"""
+    name = 'socket'
+    remote = True
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = f'socket://127.0.0.1:{self.server.getsockname()[1]}'
+        self.conn = None
+
+    def attach(self, session):
+        """会话打开后接受它的连接"""
+        self.conn, _ = self.server.accept()
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def write(self, data):
+        self.conn.sendall(data)
+
+    def read(self, timeout):
+        if select.select([self.conn], [], [], timeout)[0]:
+            return self.conn.recv(65536)
+        return b''
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+        self.server.close()
+
+
+class LoopEndpoint:
+    """pyserial的loop://：写入的数据从同一个串口读回，没有独立的对端
+
+    接收数据由测量方直接写入会话的串口对象产生；发送延迟为写出到本串口读回的时间。
+    loop://内部逐字节排队，吞吐远低于真实串口，只用于比较处理路径。
+    """
+    name = 'loop'
+    remote = False
+    port = 'loop://'
+
+    def attach(self, session):
+        self.serial_port = session.serial_port
+
+    def write(self, data):
+        self.serial_port.write(data)
+
+    def close(self):
+        pass
+
+
+SUITE_ENDPOINTS = {'pty': PtyEndpoint, 'socket': SocketEndpoint, 'loop': LoopEndpoint}
+SUITE_DISPLAY_MODES = {'text': (False, False), 'hex': (True, False), 'timestamp': (False, True)}  # (十六进制, 时间戳)
+SUITE_LINE = b'sensor=0123 temp=25.50 hum=40.1\r\n'
+
+
+class ArrivalObserver:
+    """记录接收线程读到数据的时间，用于没有对端的loop://"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.read_ns = 0
+
+    def on_sent(self, tag, sent_ns):
+        pass
+
+    def on_received(self, data, read_ns):
+        self.read_ns = read_ns
+        self.event.set()
+
+
+def measure_throughput(endpoint, seconds, chunk_size=4096):
+    """对端尽快写入seconds秒，返回(写入字节数, 接收字节数, 全部收到的用时)"""
+    session = PortSession(1, {'port': endpoint.port, 'baud': 921600})
+    session.open()
+    endpoint.attach(session)
+    payload = (SUITE_LINE * (chunk_size // len(SUITE_LINE) + 1))[:chunk_size]
+    sent = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        endpoint.write(payload)
+        sent += len(payload)
+    deadline = time.perf_counter() + 10
+    while session.received_count < sent and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    received = session.received_count
+    session.close()
+    return sent, received, elapsed
+
+
+def measure_send_latency(endpoint, samples, size=32):
+    """session.send()到对端(loop://为本串口)读到全部数据的时间(ms)，已排序"""
+    session = PortSession(1, {'port': endpoint.port, 'baud': 921600})
+    observer = ArrivalObserver()
+    session.add_observer(observer)
+    session.open()
+    endpoint.attach(session)
+    payload = SUITE_LINE[:size]
+    latencies = []
+    for _ in range(samples):
+        observer.event.clear()
+        start = time.perf_counter_ns()
+        session.send(payload)
+        if endpoint.remote:
+            received = 0
+            deadline = time.perf_counter() + 1.0
+            while received < len(payload) and time.perf_counter() < deadline:
+                received += len(endpoint.read(0.1))
+            if received >= len(payload):
+                latencies.append((time.perf_counter_ns() - start) / 1e6)
+        elif observer.event.wait(1.0):
+            # loop://的数据可能分几次读出，取第一次读到的时间
+            latencies.append((observer.read_ns - start) / 1e6)
+        time.sleep(0.002)
+    session.close()
+    latencies.sort()
+    return latencies
+
+
+def queue_sampler(dispatcher, samples, running):
+    """每5ms记录一次界面事件队列长度"""
+    while running.is_set():
+        samples.append(len(dispatcher.events))
+        time.sleep(0.005)
+
+
+def open_ui_ports(window, endpoint_class, count):
+    """在前count个标签页中连接新建的模拟串口，返回端点列表"""
+    while len(window.tabs) < count:
+        window.add_port()
+    endpoints = []
+    for tab in window.tabs[:count]:
+        endpoint = endpoint_class()
+        tab.set_ports([{'device': endpoint.port, 'description': endpoint.name}])
+        tab.combo_port.setCurrentText(endpoint.port)
+        tab.connect_serial()
+        endpoint.attach(tab.session)
+        endpoints.append(endpoint)
+    return endpoints
+
+
+def run_ui_load(app, window, endpoints, baud, seconds):
+    """按波特率向每个串口写入文本行seconds秒，返回界面负载统计"""
+    from PyQt5.QtCore import QTimer
+    rate = baud / 10  # 8N1每字节10位
+    running = threading.Event()
+    running.set()
+
+    def feeder():
+        start = time.perf_counter()
+        sent = 0
+        while running.is_set():
+            target = (time.perf_counter() - start) * rate
+            while sent < target:
+                for endpoint in endpoints:
+                    endpoint.write(SUITE_LINE)
+                sent += len(SUITE_LINE)
+            time.sleep(0.002)
+
+    dispatcher = window.dispatcher
+    depths = []
+    threads = [threading.Thread(target=feeder, daemon=True),
+               threading.Thread(target=queue_sampler, args=(dispatcher, depths, running), daemon=True)]
+    received = sum(tab.session.received_count for tab in window.tabs)
+    drains, busy = dispatcher.drains, dispatcher.busy_time
+    cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    running.clear()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu
+    received = sum(tab.session.received_count for tab in window.tabs) - received
+    return {
+        'received_kb_s': received / 1024 / seconds,
+        'ui_drains_per_s': (dispatcher.drains - drains) / seconds,
+        'ui_busy_pct': (dispatcher.busy_time - busy) / seconds * 100,
+        'cpu_pct': cpu / seconds * 100,
+        'cpu_pct_per_port': cpu / seconds * 100 / len(endpoints),
+        'queue_depth_max': max(depths) if depths else 0,
+        'queue_depth_mean': statistics.mean(depths) if depths else 0,
+    }
+
+
+def start_ui():
+    """无显示环境下使用offscreen平台，配置文件写到临时目录"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    import serial_debugger
+    app = QApplication.instance() or QApplication([])
+    os.chdir(tempfile.mkdtemp(prefix='sdsuite_'))
+    return app, serial_debugger
+
+
+def bench_suite(args):
+    endpoints = args.endpoints.split(',')
+    modes = args.modes.split(',')
+    print(f"=== 端到端测量 ({'/'.join(endpoints)}) ===")
+    results = {'transport': [], 'display': []}
+
+    print(f"{'端点':<8}{'接收MB/秒':>11}{'收全':>6}{'发送延迟p50(ms)':>17}{'p99(ms)':>9}{'最大(ms)':>10}")
+    for name in endpoints:
+        endpoint = SUITE_ENDPOINTS[name]()
+        sent, received, elapsed = measure_throughput(endpoint, args.seconds)
+        endpoint.close()
+        endpoint = SUITE_ENDPOINTS[name]()
+        latencies = measure_send_latency(endpoint, args.samples)
+        endpoint.close()
+        item = {
+            'transport': name,
+            'sent_bytes': sent,
+            'received_bytes': received,
+            'throughput_mb_s': received / 1048576 / elapsed,
+            'send_latency_ms': {'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99),
+                                'max': latencies[-1] if latencies else None, 'samples': len(latencies)},
+        }
+        results['transport'].append(item)
+        latency = item['send_latency_ms']
+        print(f"{name:<8}{item['throughput_mb_s']:>11.2f}{'是' if received == sent else '否':>6}"
+              f"{latency['p50'] or 0:>17.3f}{latency['p99'] or 0:>9.3f}{latency['max'] or 0:>10.3f}")
+
+    app, serial_debugger = start_ui()
+    print(f"\n界面负载: 每个串口 {args.baud} 波特文本行，{args.ports} 个串口，每项 {args.seconds} 秒")
+    print(f"{'端点':<8}{'显示模式':<11}{'接收KB/秒':>11}{'界面占用':>10}{'每串口CPU':>11}"
+          f"{'队列最大':>9}{'队列平均':>9}")
+    for name in endpoints:
+        for mode in modes:
+            hex_display, show_time = SUITE_DISPLAY_MODES[mode]
+            window = serial_debugger.SerialDebugger()
+            ports = open_ui_ports(window, SUITE_ENDPOINTS[name], args.ports)
+            for tab in window.tabs:
+                tab.check_hex_display.setChecked(hex_display)
+                tab.check_show_time.setChecked(show_time)
+            item = run_ui_load(app, window, ports, args.baud, args.seconds)
+            window.close()
+            for endpoint in ports:
+                endpoint.close()
+            item.update({'transport': name, 'mode': mode, 'ports': args.ports})
+            results['display'].append(item)
+            print(f"{name:<8}{mode:<11}{item['received_kb_s']:>11.1f}{item['ui_busy_pct']:>9.1f}%"
+                  f"{item['cpu_pct_per_port']:>10.1f}%{item['queue_depth_max']:>9}{item['queue_depth_mean']:>9.1f}")
+    if args.json:
+        write_json(args.json, 'suite', args, results)
+
+
+def bench_soak(args):
+    hex_display, show_time = SUITE_DISPLAY_MODES[args.mode]
+    seconds = args.minutes * 60
+    print(f"=== 长时间运行测量 (pty, {args.ports} 个串口, 每个 {args.baud} 波特, {args.mode}显示, "
+          f"{args.minutes:g} 分钟) ===")
+    app, serial_debugger = start_ui()
+    window = serial_debugger.SerialDebugger()
+    ports = open_ui_ports(window, PtyEndpoint, args.ports)
+    for tab in window.tabs:
+        tab.check_hex_display.setChecked(hex_display)
+        tab.check_show_time.setChecked(show_time)
+
+    print(f"{'分钟':>6}{'内存MB':>10}{'接收KB/秒':>11}{'界面占用':>10}{'CPU':>8}{'队列最大':>9}")
+    samples = []
+    rss_start = rss_bytes()
+    elapsed = 0.0
+    while elapsed < seconds:
+        interval = min(args.interval, seconds - elapsed)
+        item = run_ui_load(app, window, ports, args.baud, interval)
+        elapsed += interval
+        item.update({'minutes': elapsed / 60, 'rss_mb': rss_bytes() / 1048576})
+        samples.append(item)
+        print(f"{item['minutes']:>6.1f}{item['rss_mb']:>10.1f}{item['received_kb_s']:>11.1f}"
+              f"{item['ui_busy_pct']:>9.1f}%{item['cpu_pct']:>7.1f}%{item['queue_depth_max']:>9}")
+    window.close()
+    for endpoint in ports:
+        endpoint.close()
+
+    # 前半程日志缓冲逐渐填满到上限，后半程的增长才视为泄漏
+    baseline = samples[(len(samples) - 1) // 2]['rss_mb']
+    results = {
+        'rss_start_mb': rss_start / 1048576,
+        'rss_half_mb': baseline,
+        'rss_end_mb': samples[-1]['rss_mb'],
+        'rss_max_mb': max(item['rss_mb'] for item in samples),
+        'rss_growth_mb': samples[-1]['rss_mb'] - baseline,
+        'queue_depth_max': max(item['queue_depth_max'] for item in samples),
+        'samples': samples,
+    }
+    print(f"内存: 开始 {results['rss_start_mb']:.1f} MB，半程 {baseline:.1f} MB，"
+          f"结束 {results['rss_end_mb']:.1f} MB，后半程增长 {results['rss_growth_mb']:+.1f} MB")
+    if args.json:
+        write_json(args.json, 'soak', args, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双串口调试器性能测量')
+    sub = parser.add_subparsers(dest='command')
+
+    p = sub.add_parser('reader', help='接收线程空闲唤醒和首字节延迟')
+    p.add_argument('--idle', type=float, default=2.0, help='空闲测量时长(秒)')
+    p.add_argument('--samples', type=int, default=50, help='延迟采样次数')
+    p.add_argument('--min-bytes', type=int, default=1, help='阻塞模式最小字节数')
+    p.add_argument('--timeout', type=int, default=100, help='阻塞模式读超时(ms)')
+    p.set_defaults(func=bench_reader)
+
+    p = sub.add_parser('batch', help='高速接收时的批量投递频率')
+    p.add_argument('--baud', type=int, default=921600, help='模拟波特率')
+    p.add_argument('--seconds', type=float, default=3.0, help='测量时长(秒)')
+    p.add_argument('--rate', type=int, default=DEFAULT_FLUSH_RATE, help='每秒最多投递批次数')
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser('capture', help='录制文件写入和按时间段读取')
+    p.add_argument('--mb', type=int, default=128, help='写入数据量(MB)')
+    p.add_argument('--chunk', type=int, default=128, help='每条记录字节数')
+    p.set_defaults(func=bench_capture)
+
+    p = sub.add_parser('hex', help='十六进制格式化速度')
+    p.set_defaults(func=bench_hex)
+
+    p = sub.add_parser('decode', help='分块解码正确性和速度')
+    p.add_argument('--encoding', default='UTF-8', help='编码')
+    p.add_argument('--rounds', type=int, default=20, help='随机切分轮数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.set_defaults(func=bench_decode)
+
+    p = sub.add_parser('frame', help='分帧正确性和速度')
+    p.add_argument('--frames', type=int, default=100000, help='每种分帧方式的帧数')
+    p.add_argument('--chunk', type=int, default=256, help='随机分块的最大字节数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.set_defaults(func=bench_frame)
+
+    p = sub.add_parser('checksum', help='校验算法速度')
+    p.add_argument('--kb', type=int, default=1024, help='每种算法每个块大小处理的数据量(KB)')
+    p.set_defaults(func=bench_checksum)
+
+    p = sub.add_parser('autosend', help='自动发送定时抖动')
+    p.add_argument('--interval', type=float, default=1.0, help='发送间隔(ms)')
+    p.add_argument('--seconds', type=float, default=5.0, help='测量时长(秒)')
+    p.add_argument('--catch-up', default='跳过', choices=list(CATCH_UP_POLICIES.keys()), help='落后处理')
+    p.set_defaults(func=bench_autosend)
+
+    p = sub.add_parser('ports', help='多串口同时接收时的界面线程负载')
+    p.add_argument('--counts', default='1,2,4,8,16', help='依次测量的串口数，逗号分隔')
+    p.add_argument('--baud', type=int, default=115200, help='每个串口的模拟波特率')
+    p.add_argument('--seconds', type=float, default=5.0, help='每组测量时长(秒)')
+    p.set_defaults(func=bench_ports)
+
+    p = sub.add_parser('bridge', help='双向桥接的转发延迟和吞吐')
+    p.add_argument('--baud', type=int, default=921600, help='每个方向的模拟波特率')
+    p.add_argument('--seconds', type=float, default=5.0, help='测量时长(秒)')
+    p.add_argument('--chunk', type=int, default=32, help='每次写入的字节数')
+    p.set_defaults(func=bench_bridge)
+
+    p = sub.add_parser('xmodem', help='XMODEM/YMODEM端到端传输')
+    p.add_argument('--baud', type=int, default=115200, help='模拟波特率')
+    p.add_argument('--kb', type=int, default=64, help='文件大小(KB)')
+    p.add_argument('--error-rate', type=float, default=0.02, help='接收方判为校验错误的块比例')
+    p.add_argument('--no-throttle', dest='throttle', action='store_false', help='接收方不按线路速率限速')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.add_argument('--name', default='firmware.bin',
+                   help='文件名，YMODEM文件信息超过128字节时用1024字节的0号块，可用长文件名验证')
+    p.set_defaults(func=bench_xmodem)
+
+    p = sub.add_parser('replay', help='以最快速度回放录制文件的处理吞吐')
+    p.add_argument('--mb', type=int, default=16, help='录制数据量(MB)')
+    p.add_argument('--chunk', type=int, default=256, help='每条记录字节数')
+    p.set_defaults(func=bench_replay)
+
+    p = sub.add_parser('trigger', help='触发器跨块匹配的正确性和速度')
+    p.add_argument('--mb', type=int, default=8, help='数据量(MB)')
+    p.add_argument('--chunk', type=int, default=64, help='随机分块的最大字节数')
+    p.add_argument('--every', type=int, default=4096, help='平均每隔多少字节放入一次命中')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.set_defaults(func=bench_trigger)
+
+    p = sub.add_parser('sequence', help='由快速字符串生成命令序列再解析，检查步骤一致')
+    p.add_argument('--count', type=int, default=20, help='SSCOM配置中的词条数')
+    p.set_defaults(func=bench_sequence)
+
+    p = sub.add_parser('suite', help='经pty/socket/loop端到端测量吞吐、延迟和各显示模式的界面负载')
+    p.add_argument('--endpoints', default='pty,socket,loop', help='测量的端点，逗号分隔：pty、socket、loop')
+    p.add_argument('--modes', default='text,hex,timestamp', help='显示模式，逗号分隔：text、hex、timestamp')
+    p.add_argument('--ports', type=int, default=2, help='界面负载测量时同时接收的串口数')
+    p.add_argument('--baud', type=int, default=115200, help='界面负载测量时每个串口的模拟波特率')
+    p.add_argument('--seconds', type=float, default=3.0, help='每项测量时长(秒)')
+    p.add_argument('--samples', type=int, default=200, help='发送延迟采样次数')
+    p.add_argument('--json', help='把结果写入JSON文件')
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser('soak', help='长时间接收显示的内存增长和界面负载')
+    p.add_argument('--minutes', type=float, default=10.0, help='运行时长(分钟)')
+    p.add_argument('--interval', type=float, default=30.0, help='采样间隔(秒)')
+    p.add_argument('--ports', type=int, default=2, help='同时接收的串口数')
+    p.add_argument('--baud', type=int, default=115200, help='每个串口的模拟波特率')
+    p.add_argument('--mode', choices=list(SUITE_DISPLAY_MODES), default='timestamp', help='显示模式')
+    p.add_argument('--json', help='把结果写入JSON文件')
+    p.set_defaults(func=bench_soak)
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+    # 检查正确性的测量不一致时返回非0
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
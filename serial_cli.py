@@ -0,0 +1,657 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双串口调试器命令行模式
+不加载PyQt5，与图形界面共用serial_core和serial_debugger_config.json，
+适合在无界面的测试机上长时间录制或收发数据
+
+用法:
+  python serial_cli.py --list                                列出可用串口
+  python serial_cli.py -p COM3 -b 115200                     接收并输出到终端
+  python serial_cli.py --profile serial2 -f hex -t           使用串口2的已保存配置，十六进制加时间戳
+  python serial_cli.py -p COM3 -o rx.txt --capture rx.cap    输出到文件，同时录制原始数据
+  python serial_cli.py -p COM3 -s "AT" -a 1000               每1000ms发送一次"AT"
+  python serial_cli.py -p COM3 -q 3 -d 10                    发送第3个快速字符串，10秒后退出
+  python serial_cli.py -p COM3 --capture rx.cap --reconnect  长时间录制，拔插后自动重连
+  python serial_cli.py -p COM3 -b 9600 --framer idle -f hex  按Modbus RTU帧间隔分帧，每帧一行
+  python serial_cli.py -p COM3 --hex -s "01 03 00 00 00 01" --checksum CRC16-Modbus --framer idle
+                                                             追加CRC发送，并验证应答帧的CRC
+  python serial_cli.py -p COM3 -s "AT" -T 1000 --match "OK\r\n" --export at.json
+                                                             发送1000次，统计到应答OK的往返延迟
+  python serial_cli.py -p COM3 --sequence soak.txt --repeat 0 --export soak.csv
+                                                             循环执行命令序列脚本直到Ctrl+C，统计每一步耗时
+  python serial_cli.py -p COM3 --bridge COM4 -t --capture sniff.cap
+                                                             COM3与COM4双向转发，输出COM3收到的数据并录制双向流量
+  python serial_cli.py -p COM3 --send-file fw.bin --chunk-size 256 --ack "OK"
+                                                             按256字节分块发送固件，每块等待应答OK
+  python serial_cli.py -p COM3 --send-file fw.bin --protocol ymodem
+                                                             用YMODEM向bootloader发送固件
+  python serial_cli.py --replay field.cap --framer idle -f hex -t
+                                                             按原有时间间隔回放录制文件中收到的数据，无需连接设备
+  python serial_cli.py -p COM3 -o /dev/null --stats stats.jsonl
+                                                             每秒记录一行接收速率、读取大小分布和处理耗时
+  python serial_cli.py -p COM3 --capture rx.cap --reconnect --metrics-port 9464 --metrics-host 0.0.0.0
+                                                             长时间录制，同时在http://本机:9464/metrics提供Prometheus指标
+  python serial_cli.py -p COM3 -o /dev/null --triggers rules.txt --trigger-dir events
+                                                             无人值守监视，命中HardFault等时保存触发前的数据
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+import serial.tools.list_ports
+
+from serial_core import (CONFIG_FILE, PARITIES, STOP_BITS, READ_MODES, CATCH_UP_POLICIES,
+                         DEFAULT_ENCODING, LINE_FLUSH_TIMEOUT_MS, DEFAULT_CAPTURE_ROTATE_BYTES,
+                         DEFAULT_CAPTURE_ROTATE_SECONDS, load_config, format_hex, format_hexdump,
+                         TextAssembler, CaptureWriter, PortSession, Backoff, FRAMERS,
+                         decode_frame, CHECKSUMS, CHECKSUM_NONE, DEFAULT_TRANSACTION_TIMEOUT,
+                         TransactionRunner, export_transaction_stats, parse_sequence,
+                         SequenceRunner, SEQUENCE_CSV_FIELDS, DEFAULT_FILE_CHUNK_SIZE,
+                         DEFAULT_FILE_WAIT_TIMEOUT, FileSender, MODEM_PROTOCOLS, MODEM_TIMEOUT,
+                         ModemSender, DIRECTION_RX, DIRECTION_TX, PortMetrics, METRICS_INTERVAL,
+                         MetricsExporter, DEFAULT_METRICS_PORT, parse_triggers, TriggerEngine)
+
+OUTPUT_FORMATS = ('text', 'hex', 'hexdump', 'raw')
+BRIDGE_SETTINGS = ('baud', 'data_bits', 'stop_bits', 'parity', 'read_mode', 'read_timeout', 'min_bytes')
+PARITY_ALIASES = {'none': '无', 'odd': '奇校验', 'even': '偶校验'}
+FRAMER_ALIASES = {kind: name for name, kind in FRAMERS.items()}
+
+
+def profile_name(text):
+    """--profile参数：serialN"""
+    if not re.fullmatch(r'serial[1-9]\d*', text):
+        raise argparse.ArgumentTypeError(f'无效的串口配置名: {text}')
+    return text
+
+
+def log(message):
+    """状态信息输出到stderr，不混入接收数据"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S.%f')[:-3]
+
+
+class ReceiveOutput:
+    """把接收线程投递的批次格式化后写入输出流，每批写一次并刷新
+
+    只保存增量解码器中未完成的一行，内存占用不随运行时间增长。
+    framed为True时每块数据是一帧，每帧输出一行；同时设置checksum时校验错误的帧标出[校验错误]。
+    """
+
+    def __init__(self, stream, output_format='text', encoding=DEFAULT_ENCODING, show_time=False):
+        self.stream = stream
+        self.output_format = output_format
+        self.show_time = show_time
+        self.framed = False
+        self.checksum = None
+        self.assembler = TextAssembler(encoding)
+        self.offset = 0
+        self._lock = threading.Lock()
+
+    def line(self, timestamp, text, frame=None):
+        if frame is not None and self.checksum is not None and not self.checksum.verify(frame):
+            text = '[校验错误] ' + text
+        if self.show_time:
+            return f'[{format_timestamp(timestamp)}] {text}\n'
+        return text + '\n'
+
+    def on_batch(self, chunks):
+        """接收线程回调"""
+        with self._lock:
+            parts = []
+            for received_time, data in chunks:
+                if self.output_format == 'raw':
+                    parts.append(data)
+                    continue
+                frame = data if self.framed else None
+                if self.output_format == 'hex':
+                    text = self.line(received_time, format_hex(data), frame)
+                elif self.output_format == 'hexdump':
+                    text = self.line(received_time, format_hexdump(data, 0 if self.framed else self.offset), frame)
+                    self.offset += len(data)
+                elif self.framed:
+                    text = self.line(received_time, decode_frame(data, self.assembler.encoding), frame)
+                else:
+                    text = ''.join(self.line(line_time, line)
+                                   for line_time, line in self.assembler.feed(data, received_time))
+                parts.append(text.encode('utf-8'))
+            self.stream.write(b''.join(parts))
+            self.stream.flush()
+
+    def flush_partial_line(self, timeout=LINE_FLUSH_TIMEOUT_MS / 1000):
+        """输出超过timeout秒没有后续数据的不完整行，timeout为0时立即输出"""
+        with self._lock:
+            partial_time = self.assembler.partial_time
+            if partial_time is None or time.time() - partial_time < timeout:
+                return
+            pending = self.assembler.flush()
+            if pending:
+                self.stream.write(self.line(*pending).encode('utf-8'))
+                self.stream.flush()
+
+
+def port_session(args, config):
+    """命令行参数优先，其次使用配置文件中对应串口的设置"""
+    index = int(args.profile[len('serial'):])
+    session = PortSession(index, config.get(args.profile))
+    settings = session.settings
+    overrides = {
+        'port': args.port,
+        'baud': args.baud,
+        'data_bits': args.data_bits,
+        'stop_bits': args.stop_bits,
+        'parity': PARITY_ALIASES.get(args.parity, args.parity),
+        'read_mode': args.read_mode,
+        'read_timeout': args.read_timeout,
+        'min_bytes': args.min_bytes,
+        'send_encoding': args.send_encoding,
+        'recv_encoding': args.encoding,
+        'auto_newline': args.newline,
+        'auto_reconnect': True if args.reconnect else None,
+        'framer': FRAMER_ALIASES.get(args.framer, args.framer),
+        'frame_param': args.frame_param,
+        'checksum': args.checksum,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            settings[key] = value
+    return session
+
+
+def build_send_items(args, session):
+    """按命令行顺序准备要发送的数据，返回[(发送字节, 显示文本), ...]"""
+    items = []
+    for kind, value in args.send_items:
+        if kind == 'quick':
+            quick_strings = session.quick_strings
+            if not 1 <= value <= len(quick_strings) or not quick_strings[value - 1]['content']:
+                raise ValueError(f'词条{value}不存在或内容为空')
+            text, is_hex = quick_strings[value - 1]['content'], quick_strings[value - 1].get('hex', False)
+        else:
+            text, is_hex = value, args.hex
+        _, send_bytes, display_data = session.encode(text, is_hex)
+        items.append((send_bytes, display_data))
+    return items
+
+
+class SendItemAction(argparse.Action):
+    """--send和--quick按出现顺序记录到同一个列表"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        items = getattr(namespace, 'send_items', None) or []
+        items.append((self.const, values))
+        setattr(namespace, 'send_items', items)
+
+
+def run(args):
+    config = load_config(args.config)
+    session = port_session(args, config)
+    settings = session.settings
+    if not settings['port'] and not args.replay:
+        log('请用-p指定串口，或先在图形界面中保存串口配置')
+        return 2
+    try:
+        send_items = build_send_items(args, session)
+    except ValueError as e:
+        log(str(e))
+        return 2
+    if args.auto_send and not send_items:
+        log('自动发送需要用-s或-q指定发送内容')
+        return 2
+    if args.transaction and (args.auto_send or not send_items):
+        log('事务测试需要用-s或-q指定请求，且不能与自动发送同时使用')
+        return 2
+    if args.sequence and (args.auto_send or args.transaction):
+        log('命令序列不能与自动发送或事务测试同时使用')
+        return 2
+    if args.send_file and (args.auto_send or args.transaction or args.sequence):
+        log('发送文件不能与自动发送、事务测试或命令序列同时使用')
+        return 2
+    steps = None
+    if args.sequence:
+        try:
+            with open(args.sequence, 'r', encoding='utf-8') as f:
+                steps = parse_sequence(f.read())
+        except (OSError, ValueError) as e:
+            log(f'命令序列 {args.sequence} 无效: {e}')
+            return 2
+    pattern = None
+    if args.match:
+        try:
+            pattern = re.compile(args.match.encode(settings['recv_encoding']))
+        except (re.error, LookupError) as e:
+            log(f'应答匹配表达式无效: {e}')
+            return 2
+    ack = None
+    if args.ack:
+        try:
+            ack = re.compile(args.ack.encode(settings['recv_encoding']))
+        except (re.error, LookupError) as e:
+            log(f'应答匹配表达式无效: {e}')
+            return 2
+
+    trigger_engine = None
+    if args.triggers is not None:
+        try:
+            if args.triggers:
+                with open(args.triggers, 'r', encoding='utf-8') as f:
+                    rules = parse_triggers(f.read())
+            else:
+                rules = parse_triggers(session.triggers)
+            if not rules:
+                raise ValueError('没有触发器')
+            trigger_engine = TriggerEngine(session, rules, save_dir=args.trigger_dir)
+        except (OSError, ValueError) as e:
+            log(f"触发器 {args.triggers or '配置'} 无效: {e}")
+            return 2
+
+    stats_file = None
+    if args.stats:
+        try:
+            stats_file = open(args.stats, 'a', encoding='utf-8')
+        except OSError as e:
+            log(f'无法写入性能统计: {e}')
+            return 2
+        session.set_metrics(PortMetrics())
+
+    if args.output:
+        stream = open(args.output, 'ab')
+    else:
+        stream = sys.stdout.buffer
+    output = ReceiveOutput(stream, args.format, settings['recv_encoding'], args.timestamp)
+    errors = []
+    session.on_batch = lambda s, chunks: output.on_batch(chunks)
+    session.on_error = lambda s, message: errors.append(message)
+
+    def on_written(s, written, sent_time, tag, finished):
+        if finished and tag:
+            log(f"[发送] {format_timestamp(sent_time)} {tag.rstrip()}")
+    session.on_written = on_written
+
+    capture_config = config.get('capture', {})
+
+    def new_capture(path):
+        capture = CaptureWriter(path, session.index,
+                                int(capture_config.get('rotate_bytes', DEFAULT_CAPTURE_ROTATE_BYTES)),
+                                int(capture_config.get('rotate_seconds', DEFAULT_CAPTURE_ROTATE_SECONDS)))
+        capture.start()
+        return capture
+
+    if args.capture:
+        session.set_capture(new_capture(args.capture))
+        log(f"开始录制: {session.capture.current_path}")
+
+    if trigger_engine is not None:
+        # 终端上高亮显示highlight触发器的命中
+        highlight = sys.stderr.isatty()
+
+        def on_trigger(engine, event):
+            message = f"[触发] {format_timestamp(event.time)} {event.describe()}"
+            log(f"\033[1;31m{message}\033[0m" if highlight and event.rule.highlight else message)
+            for error in event.errors:
+                log(f"[触发] {error}")
+        trigger_engine.on_trigger = on_trigger
+        trigger_engine.capture_factory = lambda: new_capture(os.path.join(
+            args.trigger_dir, f"capture_port{session.index}_{time.strftime('%Y%m%d_%H%M%S')}.cap"))
+        trigger_engine.start()
+        log(f"触发器已启用: {len(trigger_engine.rules)} 条")
+
+    replay = None
+    try:
+        output.framed = session.make_framer() is not None
+        output.checksum = session.checksum
+        if args.replay:
+            replay = session.open_replay(args.replay, args.speed, DIRECTION_TX if args.replay_tx else DIRECTION_RX)
+        else:
+            session.open()
+    except Exception as e:
+        if args.replay:
+            log(f"无法回放 {args.replay}: {e}")
+        else:
+            log(f"串口 {settings['port']} 连接失败: {e}")
+        session.close()
+        if session.capture:
+            session.capture.stop()
+        return 1
+    if replay is not None:
+        log(f"开始回放: {args.replay}，{f'{args.speed:g}倍速' if args.speed else '最快速度'}")
+    else:
+        log(f"串口 {settings['port']} 连接成功，波特率 {settings['baud']}")
+
+    peer = None
+    peer_errors = []
+    if args.bridge:
+        # 另一侧使用相同的串口参数，只转发不输出；录制文件中本串口的发送方向即为另一侧收到的数据
+        peer = PortSession(session.index + 1, {key: settings[key] for key in BRIDGE_SETTINGS})
+        peer.settings['port'] = args.bridge
+        peer.on_error = lambda s, message: peer_errors.append(message)
+        try:
+            peer.open()
+        except Exception as e:
+            log(f"桥接串口 {args.bridge} 连接失败: {e}")
+            session.close()
+            if session.capture:
+                session.capture.stop()
+            return 1
+        session.set_bridge(peer)
+        peer.set_bridge(session)
+        log(f"已桥接 {settings['port']} ⇄ {args.bridge}")
+
+    runner = None
+    file_sender = None
+    if args.send_file:
+        try:
+            if args.protocol != 'raw':
+                file_sender = ModemSender(session, args.send_file, args.protocol.upper(),
+                                          args.wait_timeout / 1000 if args.wait_timeout else MODEM_TIMEOUT)
+            else:
+                file_sender = FileSender(session, args.send_file, args.chunk_size, args.chunk_delay / 1000,
+                                         args.hex_file, ack, args.wait_cts,
+                                         (args.wait_timeout or DEFAULT_FILE_WAIT_TIMEOUT * 1000) / 1000)
+        except OSError as e:
+            log(f"无法读取文件: {e}")
+            session.close()
+            if session.capture:
+                session.capture.stop()
+            return 2
+        for data, display in send_items:
+            session.send(data, display)
+        file_sender.start()
+        log(f"开始发送文件: {args.send_file} ({file_sender.total} 字节)")
+    elif steps is not None:
+        try:
+            runner = SequenceRunner(session, steps, args.repeat)
+        except ValueError as e:
+            log(f'命令序列 {args.sequence} 无效: {e}')
+            session.close()
+            if session.capture:
+                session.capture.stop()
+            return 2
+        for data, display in send_items:
+            session.send(data, display)
+        runner.start()
+        log(f"开始执行命令序列: {len(steps)} 步 × {args.repeat or '无限'} 轮")
+    elif args.transaction:
+        requests = [(display.rstrip(), data, None) for data, display in send_items]
+        runner = TransactionRunner(session, requests, args.transaction, args.gap / 1000,
+                                   args.response_timeout / 1000, pattern)
+        runner.start()
+        log(f"开始事务测试: {len(requests)} 条请求 × {args.transaction} 轮")
+    elif args.auto_send:
+        send_bytes, display_data = send_items[-1]
+        for data, display in send_items[:-1]:
+            session.send(data, display)
+        session.start_auto_send(send_bytes, None, args.auto_send / 1000, CATCH_UP_POLICIES[args.catch_up])
+        log(f"自动发送已启用，间隔: {args.auto_send}ms，内容: {display_data}")
+    else:
+        for data, display in send_items:
+            session.send(data, display)
+
+    exporter = None
+    if args.metrics_port is not None:
+        try:
+            exporter = MetricsExporter(lambda: [item for item in (session, peer) if item is not None],
+                                       args.metrics_port, args.metrics_host)
+        except OSError as e:
+            log(f"指标接口启动失败: {e}")
+        else:
+            exporter.start()
+            log(f"指标接口: {exporter.address}")
+
+    deadline = time.monotonic() + args.duration if args.duration else None
+    auto_sender = session.auto_sender
+    backoff = Backoff()
+    reconnect_at = None
+    progress_at = time.monotonic() + 1
+    stats_at = time.monotonic() + METRICS_INTERVAL
+
+    def schedule_reconnect():
+        delay = backoff.next_delay()
+        log(f"{delay:g}秒后第{backoff.attempts}次重连")
+        return time.monotonic() + delay
+
+    try:
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if runner is not None and runner.finished:
+                break
+            if peer_errors:
+                break
+            if replay is not None and replay.finished and session.received_count >= replay.replayed:
+                break
+            if file_sender is not None:
+                if file_sender.finished:
+                    break
+                if time.monotonic() >= progress_at:
+                    progress_at += 1
+                    log(file_sender.summary())
+            if stats_file is not None and time.monotonic() >= stats_at:
+                stats_at += METRICS_INTERVAL
+                record = {'time': datetime.now().isoformat(timespec='milliseconds')}
+                record.update(session.metrics_snapshot())
+                stats_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stats_file.flush()
+            if errors and reconnect_at is None:
+                if not args.reconnect:
+                    break
+                # 断线：关闭串口，录制文件保持打开，按指数退避重连
+                for error in errors:
+                    log(error)
+                del errors[:]
+                session.close()
+                backoff.reset()
+                reconnect_at = schedule_reconnect()
+            if reconnect_at is not None and time.monotonic() >= reconnect_at:
+                try:
+                    session.reconnect()
+                except Exception as e:
+                    log(f"重连失败: {e}")
+                    reconnect_at = schedule_reconnect()
+                else:
+                    reconnect_at = None
+                    log(f"串口 {settings['port']} 重连成功")
+                    if auto_sender:
+                        auto_sender = session.start_auto_send(auto_sender.data, auto_sender.tag,
+                                                              auto_sender.interval, auto_sender.catch_up)
+            time.sleep(LINE_FLUSH_TIMEOUT_MS / 1000)
+            output.flush_partial_line()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if trigger_engine is not None:
+            trigger_engine.stop()
+        if runner is not None:
+            runner.stop()
+        if file_sender is not None:
+            file_sender.stop()
+        if peer is not None:
+            peer.close()
+        session.close()
+        if exporter is not None:
+            exporter.stop()
+        output.flush_partial_line(0)
+        if session.capture:
+            session.capture.stop()
+        if args.output:
+            stream.close()
+        if stats_file is not None:
+            stats_file.close()
+
+    for error in errors + peer_errors:
+        log(error)
+    log(f"已断开，接收 {session.received_count} 字节，发送 {session.sent_count} 字节")
+    if replay is not None:
+        log(f"回放{'完成' if replay.finished else '未完成'}，{replay.summary()}")
+    if peer is not None:
+        log(f"桥接串口 {args.bridge} 接收 {peer.received_count} 字节，发送 {peer.sent_count} 字节")
+    if session.framer is not None:
+        log(f"分帧 {session.frame_count} 帧，错误 {session.framer.errors} 次")
+        if session.checksum is not None:
+            log(f"校验错误 {session.checksum_errors} 帧")
+    if trigger_engine is not None:
+        for rule in trigger_engine.rules:
+            log(f"触发 {rule.summary()}")
+    if auto_sender:
+        log(f"自动发送共 {auto_sender.fired} 次，跳过 {auto_sender.missed} 次，"
+            f"队列满丢弃 {auto_sender.dropped} 次")
+        log(f"自动发送定时抖动: {auto_sender.stats.summary()}")
+    if file_sender is not None:
+        summary = file_sender.summary()
+        if file_sender.error:
+            log(f"文件发送失败: {file_sender.error}，{summary}")
+        elif file_sender.position < file_sender.total:
+            log(f"文件发送未完成，{summary}")
+        else:
+            log(f"文件发送完成，{summary}")
+    if steps is not None:
+        log(f"命令序列共完成 {runner.iterations} 轮")
+        for item in runner.stats:
+            log(f"序列 {item.summary()}")
+        if args.export:
+            try:
+                export_transaction_stats(runner.stats, args.export, SEQUENCE_CSV_FIELDS)
+                log(f"序列统计已导出到: {args.export}")
+            except OSError as e:
+                log(f"导出失败: {e}")
+    elif runner is not None:
+        stats = list(runner.stats.values())
+        for item in stats:
+            log(f"事务 {item.summary()}")
+        if args.export:
+            try:
+                export_transaction_stats(stats, args.export)
+                log(f"事务统计已导出到: {args.export}")
+            except OSError as e:
+                log(f"导出失败: {e}")
+    if file_sender is not None and (file_sender.error or file_sender.position < file_sender.total):
+        return 1
+    return 1 if errors or peer_errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双串口调试器命令行模式')
+    parser.add_argument('--list', action='store_true', help='列出可用串口后退出')
+    parser.add_argument('--config', default=CONFIG_FILE, help=f'配置文件，默认{CONFIG_FILE}')
+    parser.add_argument('--profile', type=profile_name, default='serial1',
+                        help='使用配置文件中哪个串口的设置(serial1、serial2……)，默认serial1')
+
+    group = parser.add_argument_group('串口参数（未指定时使用配置文件中的设置）')
+    group.add_argument('-p', '--port', help='串口，如COM3或/dev/ttyUSB0，也可以是pyserial的URL，如socket://host:port')
+    group.add_argument('-b', '--baud', type=int, help='波特率')
+    group.add_argument('--data-bits', type=int, choices=(5, 6, 7, 8), help='数据位')
+    group.add_argument('--stop-bits', choices=list(STOP_BITS), help='停止位')
+    group.add_argument('--parity', choices=list(PARITIES) + list(PARITY_ALIASES), help='校验位')
+    group.add_argument('--read-mode', choices=list(READ_MODES), help='接收模式')
+    group.add_argument('--read-timeout', type=int, help='读超时(毫秒)')
+    group.add_argument('--min-bytes', type=int, help='阻塞模式最少等待字节数')
+
+    group = parser.add_argument_group('接收')
+    group.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='text',
+                       help='输出格式：text按行解码，hex十六进制，hexdump带偏移和ASCII列，raw原始字节')
+    group.add_argument('-e', '--encoding', help='接收编码')
+    group.add_argument('-t', '--timestamp', action='store_true', help='每行前加接收时间戳')
+    group.add_argument('-o', '--output', help='追加写入到文件，默认输出到终端')
+    group.add_argument('--capture', help='同时录制收发原始数据到文件')
+    group.add_argument('--framer', choices=list(FRAMERS) + list(FRAMER_ALIASES),
+                       help='分帧方式，每帧输出一行：none、delimiter、fixed、length、slip、cobs、idle')
+    group.add_argument('--frame-param', help='分帧参数，格式同图形界面，如--framer length --frame-param 2,1,big,2')
+
+    group = parser.add_argument_group('发送')
+    group.add_argument('-s', '--send', action=SendItemAction, const='text', metavar='DATA',
+                       help='发送数据，可重复指定')
+    group.add_argument('-q', '--quick', action=SendItemAction, const='quick', type=int, metavar='N',
+                       help='发送配置中的第N个快速字符串，可重复指定')
+    group.add_argument('--hex', action='store_true', help='-s的数据为十六进制')
+    group.add_argument('--send-encoding', help='发送编码')
+    group.add_argument('--checksum', choices=[CHECKSUM_NONE] + list(CHECKSUMS),
+                       help='发送时追加的校验，分帧接收时同时验证每帧')
+    group.add_argument('--newline', action='store_const', const=True, dest='newline',
+                       help='文本发送时追加\\r\\n')
+    group.add_argument('--no-newline', action='store_const', const=False, dest='newline',
+                       help='文本发送时不追加换行符')
+    group.add_argument('-a', '--auto-send', type=int, metavar='MS',
+                       help='按间隔(毫秒)重复发送最后一条数据')
+    group.add_argument('--catch-up', choices=list(CATCH_UP_POLICIES), default='跳过',
+                       help='自动发送落后时的补偿方式')
+    group = parser.add_argument_group('事务测试')
+    group.add_argument('-T', '--transaction', type=int, metavar='N',
+                       help='把-s/-q指定的请求依次发送N轮，等待应答并统计往返延迟')
+    group.add_argument('--match', help='应答匹配的正则表达式，默认请求后收到的第一帧(不分帧时为第一块数据)')
+    group.add_argument('--response-timeout', type=float, default=DEFAULT_TRANSACTION_TIMEOUT * 1000,
+                       metavar='MS', help='等待应答的超时(毫秒)')
+    group.add_argument('--gap', type=float, default=0, metavar='MS', help='两次请求之间的间隔(毫秒)')
+    group.add_argument('--export', help='导出各命令(或序列各步骤)的延迟统计，.csv为汇总表，其他为含直方图的JSON')
+
+    group = parser.add_argument_group('命令序列')
+    group.add_argument('--sequence', metavar='FILE',
+                       help='执行UTF-8编码的命令序列脚本(send/hex/quick/wait/delay/if/ontimeout/goto/loop/stop)，'
+                            '格式同图形界面的命令序列窗口')
+    group.add_argument('--repeat', type=int, default=1, metavar='N', help='命令序列执行轮数，0为一直执行直到Ctrl+C')
+
+    group = parser.add_argument_group('发送文件')
+    group.add_argument('--send-file', metavar='FILE', help='分块流式发送文件(固件等)，发送完成后退出')
+    group.add_argument('--protocol', choices=['raw'] + [name.lower() for name in MODEM_PROTOCOLS], default='raw',
+                       help='raw按下面的分块参数直接发送；xmodem、xmodem-1k、ymodem按协议分块、校验和重发')
+    group.add_argument('--chunk-size', type=int, default=DEFAULT_FILE_CHUNK_SIZE, metavar='BYTES',
+                       help='每块字节数')
+    group.add_argument('--chunk-delay', type=float, default=0, metavar='MS', help='上一块写完后的延时(毫秒)')
+    group.add_argument('--hex-file', action='store_true', help='文件为空白或逗号分隔的十六进制文本，转换后发送')
+    group.add_argument('--ack', help='每块写完后等待应答匹配此正则表达式再发送下一块')
+    group.add_argument('--wait-cts', action='store_true', help='每块发送前等待CTS有效(硬件流控)')
+    group.add_argument('--wait-timeout', type=float, metavar='MS',
+                       help=f'等待应答或CTS的超时(毫秒)，超时后停止发送，默认{DEFAULT_FILE_WAIT_TIMEOUT * 1000:g}；'
+                            f'使用传输协议时为每块等待确认的超时，默认{MODEM_TIMEOUT * 1000:g}')
+
+    group = parser.add_argument_group('桥接')
+    group.add_argument('--bridge', metavar='PORT',
+                       help='与另一个串口双向转发(使用相同的串口参数)，用于串在设备和主机之间监听；'
+                            '终端只输出-p串口收到的数据，--capture录制的发送方向即另一侧收到的数据')
+
+    group = parser.add_argument_group('回放')
+    group.add_argument('--replay', metavar='FILE',
+                       help='以录制文件代替串口，数据按分帧和输出格式处理，回放完成后退出；不需要-p')
+    group.add_argument('--speed', type=float, default=1.0, metavar='N',
+                       help='回放倍速，1为按录制时的时间间隔，0为不等待尽快回放(可用于测量处理速度)')
+    group.add_argument('--replay-tx', action='store_true', help='回放录制中发送方向的数据，默认回放接收的数据')
+
+    group = parser.add_argument_group('触发器')
+    group.add_argument('--triggers', nargs='?', const='', metavar='FILE',
+                       help='按UTF-8编码的触发器脚本(regex/text/hex 匹配内容 动作...)匹配接收数据，格式同图形界面的'
+                            '触发器窗口；不指定文件时使用配置中该串口的触发器脚本')
+    group.add_argument('--trigger-dir', default='.', metavar='DIR',
+                       help='save保存的触发前数据和capture=start开始的录制文件放在此目录，默认当前目录')
+
+    group = parser.add_argument_group('性能统计')
+    group.add_argument('--stats', metavar='FILE',
+                       help='每秒追加一行JSON：接收速率、读取大小分布、批次合并数、发送拒绝次数等')
+    group.add_argument('--metrics-port', type=int, metavar='PORT',
+                       help=f'在此端口提供HTTP指标接口/metrics(OpenMetrics/Prometheus格式)，如{DEFAULT_METRICS_PORT}')
+    group.add_argument('--metrics-host', default='127.0.0.1',
+                       help='指标接口监听地址，默认只允许本机访问，集中采集时用0.0.0.0')
+
+    group = parser.add_argument_group('运行')
+    group.add_argument('--reconnect', action='store_true',
+                       help='读写出错后不退出，按指数退避(最长30秒)重新打开串口，USB串口按VID/PID/序列号匹配')
+    group.add_argument('-d', '--duration', type=float, default=0, help='运行秒数，默认一直运行直到Ctrl+C')
+    parser.set_defaults(send_items=[])
+    args = parser.parse_args()
+
+    if args.list:
+        for port in serial.tools.list_ports.comports():
+            print(f'{port.device}\t{port.description}')
+        return 0
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
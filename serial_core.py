@@ -0,0 +1,3581 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口引擎核心
+不依赖PyQt5的串口读写逻辑，供GUI和测量脚本共用
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import codecs
+import collections
+import csv
+import time
+import bisect
+import binascii
+import queue
+import select
+import http.server
+import shlex
+import socket
+import struct
+import threading
+
+import serial
+import serial.tools.list_ports
+from serial.urlhandler import protocol_socket
+
+CONFIG_FILE = 'serial_debugger_config.json'
+
+# 串口参数，键为界面和配置文件中使用的文本
+STOP_BITS = {'1': serial.STOPBITS_ONE, '1.5': serial.STOPBITS_ONE_POINT_FIVE, '2': serial.STOPBITS_TWO}
+PARITIES = {'无': serial.PARITY_NONE, '奇校验': serial.PARITY_ODD, '偶校验': serial.PARITY_EVEN}
+DEFAULT_BAUD_RATE = 115200
+DEFAULT_ENCODING = 'UTF-8'
+
+QUICK_STRING_COUNT = 40          # 每个串口的快速字符串词条数
+
+# 读取模式
+READ_MODE_BLOCKING = 'blocking'  # 在操作系统中阻塞等待首字节
+READ_MODE_POLL = 'poll'          # 旧的轮询方式：查询in_waiting后休眠
+READ_MODES = {'阻塞': READ_MODE_BLOCKING, '轮询': READ_MODE_POLL}
+
+POLL_INTERVAL = 0.01             # 轮询模式休眠时间(秒)
+DEFAULT_READ_TIMEOUT_MS = 100    # 阻塞模式读超时(毫秒)
+DEFAULT_MIN_BYTES = 1            # 阻塞模式最少等待字节数
+READ_PENDING_TIMEOUT = 0.005     # 有待投递数据时的固定读超时(秒)，修改超时需要重新配置串口，不按剩余时间逐次调整
+
+DEFAULT_FLUSH_RATE = 30          # 每秒最多向界面投递的批次数
+DEFAULT_BATCH_BYTES = 64 * 1024  # 批次达到此大小立即投递
+
+DEFAULT_SEND_QUEUE_BYTES = 1024 * 1024  # 发送队列最多排队字节数
+WRITE_CHUNK_SIZE = 4096                 # 发送线程每次写入串口的最大字节数
+
+# 自动发送
+CATCH_UP_SKIP = 'skip'           # 落后时跳过错过的周期，保持原有节拍
+CATCH_UP_BURST = 'burst'         # 落后时立即补发错过的周期
+CATCH_UP_POLICIES = {'跳过': CATCH_UP_SKIP, '补发': CATCH_UP_BURST}
+SCHEDULER_SPIN_TIME = 0.0002     # 截止时间前最后0.2ms让出CPU轮询，避免休眠过头
+JITTER_BUCKET_US = 10            # 抖动统计直方图精度(微秒)
+JITTER_BUCKETS = 2000            # 直方图覆盖0~20ms，超出部分计入最后一格
+
+# 请求/应答事务
+DEFAULT_TRANSACTION_TIMEOUT = 1.0     # 等待应答的超时(秒)
+TRANSACTION_BUFFER_BYTES = 64 * 1024  # 按正则匹配应答时最多保留的接收字节数
+HISTOGRAM_PRECISION_BITS = 8          # 延迟直方图每个2的幂区间细分为128格，相对误差小于1%
+
+# 文件发送
+DEFAULT_FILE_CHUNK_SIZE = 1024     # 每块字节数
+DEFAULT_FILE_WAIT_TIMEOUT = 5.0    # 等待应答或CTS的超时(秒)
+FILE_SEND_WINDOW = 4               # 不逐块等待时发送队列中最多的块数
+HEX_TEXT_SEPARATORS = b' \t\r\n\v\f,'  # 十六进制文本文件中忽略的分隔符
+
+# XMODEM/YMODEM
+MODEM_SOH = 0x01    # 128字节块
+MODEM_STX = 0x02    # 1024字节块
+MODEM_EOT = 0x04
+MODEM_ACK = 0x06
+MODEM_NAK = 0x15
+MODEM_CAN = 0x18
+MODEM_CRC = 0x43    # 'C'，接收方请求CRC16模式
+MODEM_PAD = b'\x1a'  # 最后一块的填充字节
+MODEM_CANCEL = bytes((MODEM_CAN,)) * 5  # 中止传输
+MODEM_PROTOCOLS = {'XMODEM': 128, 'XMODEM-1K': 1024, 'YMODEM': 1024}  # 协议 -> 数据块大小
+MODEM_TIMEOUT = 10.0        # 等待每块应答的超时(秒)
+MODEM_START_TIMEOUT = 60.0  # 等待接收方开始的超时(秒)
+MODEM_RETRIES = 10          # 每块最多重发次数
+
+# 录制
+DIRECTION_RX = 0                 # 接收
+DIRECTION_TX = 1                 # 发送
+DEFAULT_CAPTURE_ROTATE_BYTES = 256 * 1024 * 1024  # 单个录制文件最大字节数
+DEFAULT_CAPTURE_ROTATE_SECONDS = 3600             # 单个录制文件最长时间(秒)
+DEFAULT_CAPTURE_FLUSH_INTERVAL = 1.0              # 定期刷新到磁盘的间隔(秒)
+CAPTURE_QUEUE_SIZE = 10000                        # 待写入队列长度，写满时丢弃并计数
+REPLAY_SPEEDS = {'原速': 1.0, '2倍速': 2.0, '10倍速': 10.0, '100倍速': 100.0, '最快': 0.0}  # 0为不等待
+REPLAY_THROTTLE_INTERVAL = 0.001                  # 下游处理不过来时暂停回放的检查间隔(秒)
+
+# 录制文件格式(小端)：
+#   文件头  magic(4) 版本(2) 串口号(2) 开始墙上时间(float64) 开始单调时间ns(int64)
+#   记录    单调时间ns(int64) 串口号(1) 方向(1) 长度(4) 原始数据
+# 索引文件path.idx为连续的(单调时间ns(int64), 记录偏移(uint64))
+CAPTURE_MAGIC = b'SDCP'
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct('<4sHHdq')
+CAPTURE_RECORD = struct.Struct('<qBBI')
+CAPTURE_INDEX_ENTRY = struct.Struct('<qQ')
+CAPTURE_INDEX_SUFFIX = '.idx'
+CAPTURE_INDEX_INTERVAL_NS = 1000000000      # 每秒至少一个索引项
+CAPTURE_INDEX_INTERVAL_BYTES = 1024 * 1024  # 每1MB至少一个索引项
+
+# 分帧
+FRAMER_NONE = 'none'             # 不分帧，按每次读到的数据块处理
+FRAMER_DELIMITER = 'delimiter'   # 以分隔符结尾
+FRAMER_FIXED = 'fixed'           # 固定长度
+FRAMER_LENGTH = 'length'         # 帧头中的长度字段
+FRAMER_SLIP = 'slip'             # SLIP(RFC 1055)
+FRAMER_COBS = 'cobs'             # COBS，以0x00分隔
+FRAMER_IDLE = 'idle'             # 字节间空闲超时，如Modbus RTU的3.5字符时间
+FRAMERS = {'不分帧': FRAMER_NONE, '分隔符': FRAMER_DELIMITER, '定长': FRAMER_FIXED,
+           '长度字段': FRAMER_LENGTH, 'SLIP': FRAMER_SLIP, 'COBS': FRAMER_COBS, '空闲间隔': FRAMER_IDLE}
+FRAMER_PARAM_HINTS = {
+    FRAMER_NONE: '',
+    FRAMER_DELIMITER: '十六进制分隔符，如0D 0A，默认0A',
+    FRAMER_FIXED: '帧长度(字节)，如8',
+    FRAMER_LENGTH: '偏移,字节数,big/little,附加长度，如2,1,big,2；帧长=偏移+字节数+长度值+附加长度',
+    FRAMER_SLIP: '',
+    FRAMER_COBS: '',
+    FRAMER_IDLE: '空闲毫秒数，留空按波特率取3.5个字符时间',
+}
+MAX_FRAME_BYTES = 64 * 1024      # 单帧最大字节数，超出时视为错误并重新同步
+MODBUS_MIN_GAP = 0.00175         # 波特率高于19200时Modbus RTU固定使用1.75ms帧间隔
+
+# 校验
+CHECKSUM_NONE = '无'
+
+# 断线重连
+RECONNECT_INITIAL_DELAY = 0.5    # 第一次重连前等待(秒)
+RECONNECT_MAX_DELAY = 30.0       # 重连等待上限(秒)
+
+# 串口热插拔监视
+PORT_WATCH_INTERVAL = 1.0        # 检查串口变化的间隔(秒)
+PORT_WATCH_FULL_SCAN = 10.0      # Linux下/dev没有变化时，最长隔多久也完整枚举一次(秒)
+PORT_WATCH_DIRS = ('/dev', '/dev/serial/by-id')  # Linux下这些目录变化时才重新枚举
+
+LINE_FLUSH_TIMEOUT_MS = 100      # 不完整的行超过此时间没有后续数据时直接显示
+
+DEFAULT_LOG_MAX_LINES = 100000          # 日志最多保留行数
+DEFAULT_LOG_MAX_BYTES = 32 * 1024 * 1024  # 日志最多保留字符数
+
+# 性能统计
+READ_SIZE_BUCKETS = 17           # 读取大小分布按2的幂分组，最后一组为64KB及以上
+METRICS_INTERVAL = 1.0           # 统计面板刷新和导出间隔(秒)
+DEFAULT_METRICS_PORT = 9464      # HTTP指标接口端口
+METRICS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # 秒
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 触发器
+TRIGGER_KINDS = ('regex', 'text', 'hex')  # 正则匹配解码后的文本，text和hex按字节匹配
+TRIGGER_CAPTURE_ACTIONS = ('start', 'stop')
+TRIGGER_OVERLAP_CHARS = 256      # 正则在上一块末尾保留的字符数，不超过此长度的跨块匹配都能找到
+TRIGGER_DEFAULT_HOLDOFF = 1.0    # 同一触发器两次执行动作的最小间隔(秒)
+TRIGGER_RING_MAX_BYTES = 16 * 1024 * 1024  # 保存触发前数据的环形缓冲最多字节数
+TRIGGER_TEXT_MAX = 80            # 事件中保留的命中内容最多字符数
+
+
+# 十六进制格式化查表，供不支持bytes.hex(sep)的Python版本使用
+HEX_TABLE = [f'{b:02X}' for b in range(256)]
+# hexdump的ASCII列：可打印字符原样显示，其余显示为'.'
+ASCII_TABLE = bytes(b if 0x20 <= b < 0x7F else 0x2E for b in range(256))
+HEXDUMP_WIDTH = 16
+
+
+def format_hex(data):
+    """把字节数据格式化为以空格分隔的大写十六进制，如'48 65 6C'"""
+    try:
+        return data.hex(' ').upper()
+    except TypeError:
+        # Python 3.8以前bytes.hex()不支持分隔符
+        return ' '.join(map(HEX_TABLE.__getitem__, data))
+
+
+def format_hexdump(data, offset=0, width=HEXDUMP_WIDTH):
+    """hexdump样式：每行为偏移、十六进制列和ASCII列，返回多行文本"""
+    data = bytes(data)
+    # 整块格式化一次，再按行切片
+    hex_text = format_hex(data)
+    ascii_text = data.translate(ASCII_TABLE).decode('ascii')
+    hex_width = width * 3 - 1
+    lines = []
+    for i in range(0, len(data), width):
+        lines.append(f'{offset + i:08X}  {hex_text[i * 3:i * 3 + hex_width]:<{hex_width}}  '
+                     f'{ascii_text[i:i + width]}')
+    return '\n'.join(lines)
+
+
+class TextAssembler:
+    """按串口保存的增量解码器和行拼接
+
+    多字节字符跨两次读取时由codecs增量解码器拼接，不会变成替换字符；
+    每个字节只解码一次，完整的行立即返回，不完整的行留待后续数据或flush()。
+    """
+
+    def __init__(self, encoding='UTF-8'):
+        self.set_encoding(encoding)
+
+    def set_encoding(self, encoding):
+        """切换编码，丢弃解码器中的状态"""
+        self.encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.partial = ''
+        self.partial_time = None
+
+    def reset(self):
+        self.decoder.reset()
+        self.partial = ''
+        self.partial_time = None
+
+    def feed(self, data, timestamp):
+        """解码一块数据，返回完整的行[(首字节时间戳, 文本), ...]"""
+        text = self.decoder.decode(data)
+        if not text:
+            return []
+        if self.partial_time is None:
+            self.partial_time = timestamp
+        lines = []
+        parts = text.split('\n')
+        if len(parts) > 1:
+            lines.append((self.partial_time, (self.partial + parts[0]).replace('\r', '')))
+            for part in parts[1:-1]:
+                lines.append((timestamp, part.replace('\r', '')))
+            self.partial = parts[-1]
+            self.partial_time = timestamp if self.partial else None
+        else:
+            self.partial += text
+        return lines
+
+    def flush(self):
+        """取出不完整的行，没有时返回None；解码器中未凑齐的字节继续保留"""
+        text = self.partial
+        timestamp = self.partial_time
+        self.partial = ''
+        self.partial_time = None
+        if not text:
+            return None
+        return timestamp, text.replace('\r', '')
+
+
+class Framer:
+    """分帧器基类：把接收数据流按协议切成完整的帧
+
+    在接收线程中运行。未成帧的数据保存在复用的bytearray中，用memoryview切片扫描，
+    每帧只在产出时复制一次。帧不含分隔符、SLIP/COBS转义等成帧字节；
+    帧的时间戳为首字节所在数据块的接收时间。
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.first_time = None  # 缓冲中未成帧数据的首字节时间戳
+        self.frames = 0         # 已产出帧数
+        self.errors = 0         # 超长、长度字段非法或解码失败的次数
+
+    def reset(self):
+        self.buffer.clear()
+        self.first_time = None
+
+    def feed(self, data, timestamp):
+        """送入一块数据，返回完整的帧[(时间戳, 帧数据), ...]"""
+        buffer = self.buffer
+        if not buffer:
+            self.first_time = timestamp
+        buffer += data
+        frames = []
+        consumed = 0
+        frame_time = self.first_time
+        with memoryview(buffer) as view:
+            for end, frame in self._split(view):
+                consumed = end
+                if frame:
+                    frames.append((frame_time, frame))
+                frame_time = timestamp
+        if consumed:
+            del buffer[:consumed]
+            self.first_time = timestamp if buffer else None
+        self.frames += len(frames)
+        return frames
+
+    def _split(self, view):
+        """在view中查找完整的帧，依次产出(帧结束位置, 帧数据)，帧数据为None表示丢弃这段数据"""
+        raise NotImplementedError
+
+    def time_to_flush(self, now):
+        """距缓冲中的数据超时成帧还有多少秒，不按时间成帧时返回None"""
+        return None
+
+    def flush(self, now=None):
+        """取出超时成帧的数据，now为None时(停止接收)立即取出；返回[(时间戳, 帧数据), ...]"""
+        return []
+
+
+class DelimiterFramer(Framer):
+    """以分隔符结尾的帧，分隔符不包含在帧中"""
+
+    def __init__(self, delimiter=b'\n', max_length=MAX_FRAME_BYTES):
+        super().__init__()
+        self.delimiter = bytes(delimiter)
+        self.max_length = max_length
+
+    def _split(self, view):
+        buffer = self.buffer
+        delimiter = self.delimiter
+        start = 0
+        while True:
+            index = buffer.find(delimiter, start)
+            if index < 0:
+                break
+            yield index + len(delimiter), bytes(view[start:index])
+            start = index + len(delimiter)
+        if len(buffer) - start > self.max_length:
+            # 长时间没有分隔符，整段作为一帧输出
+            self.errors += 1
+            yield len(buffer), bytes(view[start:])
+
+
+class FixedLengthFramer(Framer):
+    """固定长度的帧"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+
+    def _split(self, view):
+        length = self.length
+        for start in range(0, len(view) - length + 1, length):
+            yield start + length, bytes(view[start:start + length])
+
+
+class LengthFieldFramer(Framer):
+    """帧头中带长度字段的帧，帧长 = offset + width + 长度值 + adjust，输出整帧(含帧头)"""
+
+    def __init__(self, offset=0, width=1, byteorder='big', adjust=0, max_length=MAX_FRAME_BYTES):
+        super().__init__()
+        self.offset = offset
+        self.width = width
+        self.byteorder = byteorder
+        self.adjust = adjust
+        self.max_length = max_length
+
+    def _split(self, view):
+        header = self.offset + self.width
+        size = len(view)
+        start = 0
+        while size - start >= header:
+            value = int.from_bytes(view[start + self.offset:start + header], self.byteorder)
+            length = header + value + self.adjust
+            if length < header or length > self.max_length:
+                # 长度字段非法，跳过一个字节重新同步
+                self.errors += 1
+                start += 1
+                yield start, None
+                continue
+            if size - start < length:
+                break
+            yield start + length, bytes(view[start:start + length])
+            start += length
+
+
+def slip_decode(data):
+    """SLIP解码：ESC ESC_END还原为END，ESC ESC_ESC还原为ESC"""
+    return data.replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
+
+
+def cobs_decode(data):
+    """COBS解码，数据不合法时抛出ValueError"""
+    output = bytearray()
+    index = 0
+    size = len(data)
+    while index < size:
+        code = data[index]
+        end = index + code
+        if code == 0 or end > size:
+            raise ValueError('COBS数据不合法')
+        output += data[index + 1:end]
+        index = end
+        if code < 0xFF and index < size:
+            output.append(0)
+    return bytes(output)
+
+
+class SlipFramer(Framer):
+    """SLIP帧：以0xC0分隔，输出解码后的数据"""
+
+    def _split(self, view):
+        buffer = self.buffer
+        start = 0
+        while True:
+            index = buffer.find(b'\xc0', start)
+            if index < 0:
+                break
+            yield index + 1, slip_decode(bytes(view[start:index]))
+            start = index + 1
+        if len(buffer) - start > MAX_FRAME_BYTES:
+            self.errors += 1
+            yield len(buffer), None
+
+
+class CobsFramer(Framer):
+    """COBS帧：以0x00分隔，输出解码后的数据，解码失败的帧丢弃并计入errors"""
+
+    def _split(self, view):
+        buffer = self.buffer
+        start = 0
+        while True:
+            index = buffer.find(b'\x00', start)
+            if index < 0:
+                break
+            try:
+                frame = cobs_decode(bytes(view[start:index]))
+            except ValueError:
+                self.errors += 1
+                frame = None
+            yield index + 1, frame
+            start = index + 1
+        if len(buffer) - start > MAX_FRAME_BYTES:
+            self.errors += 1
+            yield len(buffer), None
+
+
+class IdleFramer(Framer):
+    """字节间空闲超过gap秒即认为一帧结束
+
+    时间精度取决于接收线程的唤醒：同一次read()读到的数据不会再被拆开，
+    因此阻塞读取时最小字节数应设为1。
+    """
+
+    def __init__(self, gap):
+        super().__init__()
+        self.gap = gap
+        self.last_time = None  # 最后一块数据的接收时间
+
+    def feed(self, data, timestamp):
+        frames = []
+        if self.buffer and timestamp - self.last_time >= self.gap:
+            frames = self.flush()
+        if not self.buffer:
+            self.first_time = timestamp
+        self.buffer += data
+        self.last_time = timestamp
+        return frames
+
+    def time_to_flush(self, now):
+        if not self.buffer:
+            return None
+        return max(0.0, self.last_time + self.gap - now)
+
+    def flush(self, now=None):
+        if not self.buffer or (now is not None and now - self.last_time < self.gap):
+            return []
+        frame = (self.first_time, bytes(self.buffer))
+        self.reset()
+        self.frames += 1
+        return [frame]
+
+
+def char_bits(data_bits=8, stop_bits='1', parity='无'):
+    """每个字符在线路上占用的位数：起始位+数据位+校验位+停止位"""
+    return 1 + int(data_bits) + (0 if parity == '无' else 1) + float(stop_bits)
+
+
+def modbus_gap(baud_rate, bits=10):
+    """Modbus RTU帧间隔：3.5个字符时间，波特率高于19200时固定为1.75ms"""
+    if baud_rate > 19200:
+        return MODBUS_MIN_GAP
+    return 3.5 * bits / baud_rate
+
+
+def parse_hex_bytes(text):
+    """'0D 0A'或'0D0A'转为字节，格式错误时抛出ValueError"""
+    return bytes.fromhex(text.replace(' ', ''))
+
+
+def make_framer(name, param='', baud_rate=DEFAULT_BAUD_RATE, bits=10):
+    """按FRAMERS中的名称和参数文本创建分帧器，不分帧时返回None；参数错误时抛出ValueError"""
+    kind = FRAMERS.get(name, name)
+    param = (param or '').strip()
+    try:
+        if kind == FRAMER_NONE:
+            return None
+        if kind == FRAMER_DELIMITER:
+            delimiter = parse_hex_bytes(param) if param else b'\n'
+            if not delimiter:
+                raise ValueError
+            return DelimiterFramer(delimiter)
+        if kind == FRAMER_FIXED:
+            length = int(param)
+            if not 0 < length <= MAX_FRAME_BYTES:
+                raise ValueError
+            return FixedLengthFramer(length)
+        if kind == FRAMER_LENGTH:
+            fields = [field.strip() for field in param.split(',')] if param else []
+            offset = int(fields[0]) if len(fields) > 0 else 0
+            width = int(fields[1]) if len(fields) > 1 else 1
+            byteorder = fields[2].lower() if len(fields) > 2 else 'big'
+            adjust = int(fields[3]) if len(fields) > 3 else 0
+            if offset < 0 or width not in (1, 2, 3, 4) or byteorder not in ('big', 'little'):
+                raise ValueError
+            return LengthFieldFramer(offset, width, byteorder, adjust)
+        if kind == FRAMER_SLIP:
+            return SlipFramer()
+        if kind == FRAMER_COBS:
+            return CobsFramer()
+        if kind == FRAMER_IDLE:
+            gap = float(param) / 1000 if param else modbus_gap(baud_rate, bits)
+            if gap <= 0:
+                raise ValueError
+            return IdleFramer(gap)
+    except (ValueError, IndexError):
+        raise ValueError(f'分帧参数错误: {param}，格式: {FRAMER_PARAM_HINTS[kind]}')
+    raise ValueError(f'不支持的分帧方式: {name}')
+
+
+def decode_frame(frame, encoding=DEFAULT_ENCODING):
+    """把一帧解码为一行文本，去掉行尾的回车换行"""
+    return frame.decode(encoding, errors='replace').rstrip('\r\n')
+
+
+def crc16_table(poly):
+    """反射形式CRC16的256项查找表"""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+CRC16_MODBUS_TABLE = crc16_table(0xA001)
+
+
+def crc16_modbus(data):
+    """CRC16-Modbus：多项式0x8005(反射0xA001)，初值0xFFFF"""
+    table = CRC16_MODBUS_TABLE
+    crc = 0xFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_ccitt(data):
+    """CRC16-CCITT(CCITT-FALSE)：多项式0x1021，初值0xFFFF"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def crc16_xmodem(data):
+    """XMODEM使用的CRC16：多项式0x1021，初值0"""
+    return binascii.crc_hqx(data, 0)
+
+
+def xor8(data):
+    """所有字节异或，长数据当作一个大整数对折异或，不逐字节循环"""
+    if len(data) < 32:
+        value = 0
+        for byte in data:
+            value ^= byte
+        return value
+    value = int.from_bytes(data, 'little')
+    width = 8
+    while width < len(data) * 8:
+        width *= 2
+    while width > 8:
+        width //= 2
+        value = (value ^ (value >> width)) & ((1 << width) - 1)
+    return value
+
+
+def sum8(data):
+    """所有字节累加和的低8位"""
+    return sum(data) & 0xFF
+
+
+class Checksum:
+    """校验算法：计算校验值、追加到数据末尾、验证帧末尾的校验值"""
+
+    def __init__(self, name, func, size, byteorder='big'):
+        self.name = name
+        self.func = func
+        self.size = size
+        self.byteorder = byteorder
+
+    def digest(self, data):
+        return self.func(data).to_bytes(self.size, self.byteorder)
+
+    def append(self, data):
+        return bytes(data) + self.digest(data)
+
+    def verify(self, frame):
+        """帧末尾的校验值是否正确"""
+        size = self.size
+        if len(frame) <= size:
+            return False
+        return self.digest(frame[:-size]) == frame[-size:]
+
+
+# Modbus低字节在前，其余按大端追加
+CHECKSUMS = {checksum.name: checksum for checksum in (
+    Checksum('CRC16-Modbus', crc16_modbus, 2, 'little'),
+    Checksum('CRC16-CCITT', crc16_ccitt, 2),
+    Checksum('CRC32', binascii.crc32, 4),
+    Checksum('XOR', xor8, 1),
+    Checksum('SUM8', sum8, 1),
+)}
+
+
+def read_chunk(serial_port, mode=READ_MODE_BLOCKING, min_bytes=DEFAULT_MIN_BYTES):
+    """读取一块数据，无数据时返回空字节串
+
+    阻塞模式下read()由pyserial在select/WaitCommEvent中等待，首字节到达即唤醒，
+    超时时间由serial_port.timeout决定；min_bytes越大唤醒次数越少但延迟越高。
+    """
+    if mode == READ_MODE_POLL:
+        waiting = serial_port.in_waiting
+        data = serial_port.read(waiting) if waiting else b''
+        time.sleep(POLL_INTERVAL)
+        return data
+
+    data = serial_port.read(max(1, min_bytes))
+    if data:
+        # 把内核缓冲中已到达的数据一次读完
+        waiting = serial_port.in_waiting
+        if waiting:
+            data += serial_port.read(waiting)
+    return data
+
+
+def cancel_read(serial_port):
+    """中断阻塞中的read()，用于停止接收线程"""
+    try:
+        serial_port.cancel_read()
+    except Exception:
+        # 旧版本pyserial或已关闭的串口不支持cancel_read，等待读超时即可
+        pass
+
+
+def set_read_timeout(serial_port, timeout):
+    """修改读超时，值不变时不重新配置串口"""
+    if serial_port.timeout != timeout:
+        serial_port.timeout = timeout
+
+
+class ChunkBatcher:
+    """把接收线程读到的小块数据攒成批次，限制跨线程投递频率
+
+    每块数据保留自己的接收时间戳，批次内容为[(时间戳, 字节数据), ...]。
+    分帧时每块数据为一帧，received另外记录实际读到的字节数。
+    """
+
+    def __init__(self, flush_rate=DEFAULT_FLUSH_RATE, max_bytes=DEFAULT_BATCH_BYTES):
+        self.interval = 1.0 / flush_rate if flush_rate > 0 else 0.0
+        self.max_bytes = max_bytes
+        self.chunks = []
+        self.size = 0
+        self.received = 0
+        self.last_flush = 0.0
+
+    def add(self, data, timestamp):
+        """加入一块数据"""
+        self.chunks.append((timestamp, data))
+        self.size += len(data)
+
+    def time_to_flush(self, now):
+        """距下次允许投递还有多少秒，批次为空时返回None"""
+        if not self.chunks and not self.received:
+            return None
+        if self.size >= self.max_bytes:
+            return 0.0
+        return max(0.0, self.last_flush + self.interval - now)
+
+    def due(self, now):
+        """批次是否应当投递"""
+        return self.time_to_flush(now) == 0.0
+
+    def take(self, now):
+        """取出当前批次并清空，返回(批次, 读到的字节数)"""
+        chunks = self.chunks
+        received = self.received
+        self.chunks = []
+        self.size = 0
+        self.received = 0
+        self.last_flush = now
+        return chunks, received
+
+
+def read_size_label(bucket):
+    """读取大小分组的名称，如4-7"""
+    low = 1 << bucket
+    if bucket == READ_SIZE_BUCKETS - 1:
+        return f'{low}+'
+    return str(low) if low == 1 else f'{low}-{2 * low - 1}'
+
+
+class PortMetrics:
+    """单个串口的性能计数器
+
+    接收线程累加读取次数、字节数和读取大小分布，界面线程累加解码和格式化耗时。
+    未启用时会话的metrics为None，热路径上只多一次判断。snapshot()返回自上次快照
+    以来的速率和耗时，供统计面板显示或按行导出JSON。
+    """
+    COUNTERS = ('reads', 'read_bytes', 'batches', 'batch_chunks', 'decode_ns', 'format_ns', 'lines',
+                'send_rejected')
+
+    def __init__(self):
+        self.reads = 0          # 读取到数据的次数
+        self.read_bytes = 0
+        self.read_sizes = [0] * READ_SIZE_BUCKETS
+        self.batches = 0        # 投递给界面的批次数
+        self.batch_chunks = 0   # 批次中的数据块(分帧时为帧)数
+        self.decode_ns = 0      # 字节转为显示文本(解码、十六进制格式化)的耗时
+        self.format_ns = 0      # 加时间戳和标签组成日志行的耗时
+        self.lines = 0          # 生成的日志行数
+        self.send_rejected = 0  # 发送队列已满被拒绝的次数
+        self.queue_latency = 0.0  # 本周期内批次从读到到界面处理的最长时间(秒)
+        self._last_time = time.monotonic()
+        self._last = dict.fromkeys(self.COUNTERS, 0)
+        self._last_sizes = [0] * READ_SIZE_BUCKETS
+
+    def on_read(self, size):
+        """接收线程每读到一块数据调用一次"""
+        self.reads += 1
+        self.read_bytes += size
+        self.read_sizes[min(size.bit_length(), READ_SIZE_BUCKETS) - 1] += 1
+
+    def on_batch(self, chunks):
+        self.batches += 1
+        self.batch_chunks += len(chunks)
+
+    def on_queued(self, received_time):
+        """界面线程开始处理一个批次，received_time为批次中第一块数据的接收时间"""
+        latency = time.time() - received_time
+        if latency > self.queue_latency:
+            self.queue_latency = latency
+
+    def snapshot(self, now=None):
+        """自上次快照以来的统计，返回可直接序列化为JSON的字典"""
+        now = time.monotonic() if now is None else now
+        interval = max(now - self._last_time, 1e-9)
+        counters = {name: getattr(self, name) for name in self.COUNTERS}
+        delta = {name: counters[name] - self._last[name] for name in self.COUNTERS}
+        sizes = list(self.read_sizes)
+        histogram = {read_size_label(i): count - last
+                     for i, (count, last) in enumerate(zip(sizes, self._last_sizes)) if count > last}
+        latency = self.queue_latency
+        self.queue_latency = 0.0
+        self._last_time = now
+        self._last = counters
+        self._last_sizes = sizes
+        return {
+            'interval_s': round(interval, 3),
+            'bytes_per_s': delta['read_bytes'] / interval,
+            'reads_per_s': delta['reads'] / interval,
+            'read_size_mean': delta['read_bytes'] / delta['reads'] if delta['reads'] else 0.0,
+            'read_size_histogram': histogram,
+            'batches_per_s': delta['batches'] / interval,
+            'chunks_per_batch': delta['batch_chunks'] / delta['batches'] if delta['batches'] else 0.0,
+            'lines_per_s': delta['lines'] / interval,
+            'decode_ms_per_s': delta['decode_ns'] / 1e6 / interval,
+            'format_ms_per_s': delta['format_ns'] / 1e6 / interval,
+            'queue_latency_ms_max': latency * 1000,
+            'send_rejected': delta['send_rejected'],
+        }
+
+
+class PortReader:
+    """接收循环：阻塞读取串口数据，按批次回调on_batch(chunks, 读到的字节数)
+
+    设置framer时批次中的每块数据为一帧，分帧在接收线程中完成。
+    observers中的对象在接收线程中收到每帧(不分帧时为每块数据)的回调
+    on_received(数据, perf_counter_ns时间)，用于测量应答延迟。
+    设置forward时每块数据读到后立即在接收线程中调用forward(数据)，先于分帧和批次，
+    用于桥接转发；数据仍照常进入批次和录制。设置redirect时数据只交给redirect(数据)，
+    不分帧、不进入批次也不通知observers，用于文件传输协议临时接管接收；仍计数和录制。
+    run()在调用线程中执行，读取出错时抛出异常，由调用方决定如何处理。
+    """
+
+    def __init__(self, serial_port, on_batch, read_mode=READ_MODE_BLOCKING,
+                 min_bytes=DEFAULT_MIN_BYTES, flush_rate=DEFAULT_FLUSH_RATE,
+                 batch_bytes=DEFAULT_BATCH_BYTES):
+        self.serial_port = serial_port
+        self.on_batch = on_batch
+        self.read_mode = read_mode
+        self.min_bytes = min_bytes
+        self.batcher = ChunkBatcher(flush_rate, batch_bytes)
+        self.capture = None  # CaptureWriter，录制时由调用方设置
+        self.framer = None   # Framer，分帧时由调用方在run()之前设置
+        self.forward = None  # forward(数据)，桥接时由调用方设置
+        self.redirect = None  # redirect(数据)，传输协议接管接收时由调用方设置
+        self.metrics = None  # PortMetrics，启用性能统计时由调用方设置
+        self.observers = ()  # 由调用方整体替换，不在原元组上修改
+        self.running = True
+
+    def _deliver(self, frames, read_ns):
+        """把帧加入批次并通知observers，read_ns为帧最后一块数据的读取时间"""
+        batcher = self.batcher
+        observers = self.observers
+        for frame_time, frame in frames:
+            batcher.add(frame, frame_time)
+            for observer in observers:
+                observer.on_received(frame, read_ns)
+
+    def run(self):
+        serial_port = self.serial_port
+        batcher = self.batcher
+        framer = self.framer
+        read_timeout = serial_port.timeout
+        # 有待投递数据或等待空闲成帧时改用固定的短超时，读到数据或超时后再检查截止时间；
+        # 超时只在两个值之间切换，持续接收时不会每次读取都重新配置串口
+        pending_timeout = min(read_timeout, READ_PENDING_TIMEOUT)
+        if isinstance(framer, IdleFramer):
+            pending_timeout = min(pending_timeout, max(framer.gap, 0.001))
+        read_ns = 0
+        try:
+            while self.running and serial_port.is_open:
+                pending = batcher.time_to_flush(time.monotonic()) is not None or (
+                    framer is not None and framer.time_to_flush(time.time()) is not None)
+                set_read_timeout(serial_port, pending_timeout if pending else read_timeout)
+
+                data = read_chunk(serial_port, self.read_mode, self.min_bytes)
+                if data:
+                    forward = self.forward
+                    if forward is not None:
+                        forward(data)
+                    read_ns = time.perf_counter_ns()
+                    received_time = time.time()
+                    batcher.received += len(data)
+                    metrics = self.metrics
+                    if metrics is not None:
+                        metrics.on_read(len(data))
+                    redirect = self.redirect
+                    if redirect is not None:
+                        redirect(data)
+                    elif framer is None:
+                        self._deliver(((received_time, data),), read_ns)
+                    else:
+                        self._deliver(framer.feed(data, received_time), read_ns)
+                    capture = self.capture
+                    if capture is not None:
+                        capture.write(DIRECTION_RX, data, time.monotonic_ns())
+                if framer is not None:
+                    # 空闲超时成帧的时间按最后一块数据计算，不含等待空闲的时间
+                    self._deliver(framer.flush(time.time()), read_ns)
+
+                now = time.monotonic()
+                if batcher.due(now):
+                    self.on_batch(*batcher.take(now))
+        finally:
+            # 投递剩余数据
+            if framer is not None:
+                self._deliver(framer.flush(), read_ns)
+            if batcher.chunks or batcher.received:
+                self.on_batch(*batcher.take(time.monotonic()))
+
+    def stop(self):
+        self.running = False
+        # 唤醒阻塞在read()中的线程
+        cancel_read(self.serial_port)
+
+
+def cancel_write(serial_port):
+    """中断阻塞中的write()，用于停止发送线程"""
+    try:
+        serial_port.cancel_write()
+    except Exception:
+        pass
+
+
+class PortWriter:
+    """发送循环：从有界队列取出数据写入串口，每写出一段回调on_written(字节数, 时间戳, tag, 是否写完)
+
+    send()可在任意线程调用，不会阻塞；排队字节数超过上限时返回False，由调用方
+    决定提示或丢弃。大块数据按WRITE_CHUNK_SIZE分段写入，每段完成都会回调，
+    计数以实际写入的字节为准。observers中的对象在一次send()的数据全部写出后
+    收到回调on_sent(tag, perf_counter_ns时间)。
+    forward()供桥接的另一个串口的接收线程直接写出，不经过队列。
+    """
+
+    def __init__(self, serial_port, on_written, max_pending=DEFAULT_SEND_QUEUE_BYTES):
+        self.serial_port = serial_port
+        self.on_written = on_written
+        self.max_pending = max_pending
+        self.capture = None  # CaptureWriter，录制时由调用方设置
+        self.observers = ()  # 由调用方整体替换，不在原元组上修改
+        self.pending_bytes = 0
+        self.forward_errors = 0  # 转发写出失败次数
+        self.running = True
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # 发送线程和转发线程不会交错写入
+
+    def send(self, data, tag=None):
+        """把数据加入发送队列，队列已满时返回False"""
+        with self._lock:
+            # 队列为空时总是接受，保证超过上限的单次大数据也能发送
+            if self.pending_bytes and self.pending_bytes + len(data) > self.max_pending:
+                return False
+            self.pending_bytes += len(data)
+        self._queue.put((data, tag))
+        return True
+
+    def forward(self, data):
+        """在调用线程中直接写出转发的数据，串口已关闭或写出失败时返回False
+
+        写出失败只计数，不抛出异常，不影响调用方的接收线程；串口本身的错误由本串口的收发线程报告。
+        """
+        if not self.running:
+            return False
+        try:
+            with self._write_lock:
+                written = self.serial_port.write(data) or 0
+        except Exception:
+            self.forward_errors += 1
+            return False
+        capture = self.capture
+        if capture is not None:
+            capture.write(DIRECTION_TX, data, time.monotonic_ns())
+        self.on_written(written, time.time(), None, True)
+        return True
+
+    def run(self):
+        serial_port = self.serial_port
+        while self.running:
+            item = self._queue.get()
+            if item is None:
+                break
+            data, tag = item
+            view = memoryview(data)
+            pos = 0
+            try:
+                while pos < len(data) and self.running:
+                    chunk = view[pos:pos + WRITE_CHUNK_SIZE]
+                    with self._write_lock:
+                        written = serial_port.write(chunk) or 0
+                    write_ns = time.perf_counter_ns()
+                    pos += len(chunk)
+                    capture = self.capture
+                    if capture is not None:
+                        capture.write(DIRECTION_TX, bytes(chunk[:written]), time.monotonic_ns())
+                    self.on_written(written, time.time(), tag, pos >= len(data))
+                if pos >= len(data) > 0:
+                    for observer in self.observers:
+                        observer.on_sent(tag, write_ns)
+            finally:
+                with self._lock:
+                    self.pending_bytes -= len(data)
+
+    def stop(self):
+        """停止发送，丢弃尚未写出的数据"""
+        self.running = False
+        self._queue.put(None)
+        cancel_write(self.serial_port)
+
+
+class JitterStats:
+    """定时抖动统计，用固定直方图计算分位数，内存占用不随次数增长"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * JITTER_BUCKETS
+
+    def add(self, jitter):
+        """记录一次抖动(秒)"""
+        self.count += 1
+        self.total += jitter
+        if jitter > self.max:
+            self.max = jitter
+        bucket = int(jitter * 1e6 / JITTER_BUCKET_US)
+        self.buckets[min(bucket, JITTER_BUCKETS - 1)] += 1
+
+    def percentile(self, p):
+        """第p百分位抖动(秒)"""
+        if not self.count:
+            return 0.0
+        target = math.ceil(self.count * p / 100)
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                # 取所在格的上沿，不超过实际最大值
+                return min((i + 1) * JITTER_BUCKET_US / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return '无数据'
+        return (f'平均 {self.total / self.count * 1000:.3f}ms，p50 {self.percentile(50) * 1000:.3f}ms，'
+                f'p99 {self.percentile(99) * 1000:.3f}ms，最大 {self.max * 1000:.3f}ms')
+
+
+def sleep_until(deadline, stop_event):
+    """休眠到perf_counter时间deadline，stop_event置位时提前返回False
+
+    先休眠到截止时间前SCHEDULER_SPIN_TIME，再让出CPU轮询到截止时间。
+    """
+    while True:
+        if stop_event.is_set():
+            return False
+        remaining = deadline - time.perf_counter()
+        if remaining <= SCHEDULER_SPIN_TIME:
+            break
+        # time.sleep比Event.wait唤醒更准，分段休眠以便及时响应停止
+        time.sleep(min(remaining - SCHEDULER_SPIN_TIME, 0.05))
+    while time.perf_counter() < deadline:
+        time.sleep(0)
+    return True
+
+
+class IntervalScheduler:
+    """高精度周期调度线程
+
+    按单调时钟计算每次的截止时间(起点 + n * 周期)，不会累积漂移；先休眠到截止时间前
+    SCHEDULER_SPIN_TIME，再让出CPU轮询到截止时间。回调在调度线程中执行，不能操作界面。
+    """
+
+    def __init__(self, interval, callback, catch_up=CATCH_UP_SKIP):
+        self.interval = interval
+        self.callback = callback
+        self.catch_up = catch_up
+        self.stats = JitterStats()
+        self.fired = 0
+        self.missed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        interval = self.interval
+        deadline = time.perf_counter() + interval
+        while sleep_until(deadline, self._stop):
+            now = time.perf_counter()
+            self.stats.add(now - deadline)
+            self.fired += 1
+            self.callback()
+
+            deadline += interval
+            now = time.perf_counter()
+            if now > deadline and self.catch_up == CATCH_UP_SKIP:
+                # 跳过已经错过的周期，下一次仍落在原来的节拍上
+                skipped = math.ceil((now - deadline) / interval)
+                self.missed += skipped
+                deadline += skipped * interval
+
+
+class AutoSender(IntervalScheduler):
+    """自动发送：按周期把同一份数据放入PortWriter的发送队列，队列满时计入dropped"""
+
+    def __init__(self, writer, data, tag, interval, catch_up=CATCH_UP_SKIP):
+        super().__init__(interval, self._send, catch_up)
+        self.writer = writer
+        self.data = data
+        self.tag = tag
+        self.dropped = 0
+
+    def _send(self):
+        if not self.writer.send(self.data, self.tag):
+            self.dropped += 1
+
+
+class LatencyHistogram:
+    """HDR风格的延迟直方图(纳秒)
+
+    小于2^precision的值逐个计数，更大的值按2的幂分段，每段再细分为2^(precision-1)格，
+    相对误差不超过1/2^(precision-1)。只保存出现过的格，内存占用不随次数增长。
+    """
+
+    def __init__(self, precision=HISTOGRAM_PRECISION_BITS):
+        self.precision = precision
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = value.bit_length() - self.precision
+        if shift <= 0:
+            return value
+        half = 1 << (self.precision - 1)
+        return (1 << self.precision) + (shift - 1) * half + (value >> shift) - half
+
+    def _value(self, index):
+        """格的代表值：格内的中点"""
+        full = 1 << self.precision
+        if index < full:
+            return index
+        half = full >> 1
+        shift = (index - full) // half + 1
+        top = (index - full) % half + half
+        return (top << shift) + (1 << (shift - 1))
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """第p百分位的值，不超过实际最大值；没有数据时返回0"""
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def buckets(self):
+        """[(格的代表值, 次数), ...]，按值排序"""
+        return [(self._value(index), self.counts[index]) for index in sorted(self.counts)]
+
+    def cumulative(self, bounds):
+        """小于等于各上限的累计次数，bounds为升序的纳秒值；可在记录线程之外调用"""
+        counts = dict(self.counts)
+        result = [0] * len(bounds)
+        for index, count in counts.items():
+            i = bisect.bisect_left(bounds, self._value(index))
+            if i < len(bounds):
+                result[i] += count
+        for i in range(1, len(result)):
+            result[i] += result[i - 1]
+        return result
+
+
+class TransactionStats:
+    """一条请求命令的事务统计：往返延迟直方图、超时和发送失败次数"""
+
+    def __init__(self, name):
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def attempts(self):
+        return self.histogram.count + self.timeouts + self.errors
+
+    def summary(self):
+        histogram = self.histogram
+        text = f'{self.name}: 成功 {histogram.count} 次，超时 {self.timeouts} 次'
+        if self.errors:
+            text += f'，发送失败 {self.errors} 次'
+        if histogram.count:
+            text += (f'，p50 {histogram.percentile(50) / 1e6:.3f}ms，p99 {histogram.percentile(99) / 1e6:.3f}ms，'
+                     f'最大 {histogram.max / 1e6:.3f}ms')
+        return text
+
+    def to_dict(self):
+        histogram = self.histogram
+        return {
+            'name': self.name,
+            'count': histogram.count,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'min_ms': (histogram.min or 0) / 1e6,
+            'mean_ms': histogram.mean / 1e6,
+            'p50_ms': histogram.percentile(50) / 1e6,
+            'p90_ms': histogram.percentile(90) / 1e6,
+            'p99_ms': histogram.percentile(99) / 1e6,
+            'p999_ms': histogram.percentile(99.9) / 1e6,
+            'max_ms': (histogram.max or 0) / 1e6,
+            'histogram_ns': histogram.buckets(),
+        }
+
+
+class TransactionTag(tuple):
+    """事务请求的发送tag，与普通tag一样是(标签, 显示文本)，每次发送都是不同的对象
+
+    不显示时为空元组，界面按普通tag处理，不会显示。
+    """
+
+
+TRANSACTION_CSV_FIELDS = ('name', 'count', 'timeouts', 'errors', 'min_ms', 'mean_ms',
+                          'p50_ms', 'p90_ms', 'p99_ms', 'p999_ms', 'max_ms')
+
+
+def export_transaction_stats(stats, path, fields=TRANSACTION_CSV_FIELDS):
+    """导出各命令(或序列各步骤)的统计，扩展名为.csv时导出fields列的汇总表，否则导出含直方图的JSON"""
+    rows = [item.to_dict() for item in stats]
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow([row[field] for field in fields])
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+class TransactionRunner:
+    """请求/应答事务测量线程
+
+    依次发送requests中的每条请求[(命令名, 发送字节, 显示文本或None), ...]，共rounds轮，
+    等待应答后记录往返延迟：从发送线程写完请求到接收线程收到应答，
+    两端都用perf_counter_ns在收发线程中取时间，不含界面处理的延迟。
+    pattern为None时请求后收到的第一帧(不分帧时为第一块数据)即应答；
+    否则把请求后收到的数据拼接起来，直到pattern(bytes正则)匹配。
+    超时从请求放入发送队列开始计时。
+    """
+
+    def __init__(self, session, requests, rounds=1, interval=0.0,
+                 timeout=DEFAULT_TRANSACTION_TIMEOUT, pattern=None, label='事务'):
+        self.session = session
+        self.requests = requests
+        self.rounds = rounds
+        self.interval = interval
+        self.timeout = timeout
+        self.pattern = pattern
+        self.label = label
+        self.stats = {}  # 命令名 -> TransactionStats，按首次发送的顺序
+        for name, _, _ in requests:
+            self.stats.setdefault(name, TransactionStats(name))
+        self.completed = 0
+        self.finished = False
+        self.on_finished = None  # 结束时在事务线程中调用on_finished(runner)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._stop = threading.Event()
+        self._tag = None
+        self._sent_ns = None
+        self._response_ns = None
+        self._buffer = bytearray()
+        self._thread = threading.Thread(target=self._run, name=f'{session.name}事务', daemon=True)
+
+    @property
+    def total(self):
+        return self.rounds * len(self.requests)
+
+    def latency_stats(self):
+        """[(请求名, 延迟直方图, 超时次数), ...]，供指标接口导出"""
+        return [(item.name, item.histogram, item.timeouts) for item in list(self.stats.values())]
+
+    def start(self):
+        self.session.add_observer(self)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._done.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def on_sent(self, tag, sent_ns):
+        """发送线程回调"""
+        with self._lock:
+            if tag is self._tag:
+                self._sent_ns = sent_ns
+
+    def on_received(self, data, received_ns):
+        """接收线程回调；请求写完之前收到的数据属于之前的应答，不计入"""
+        with self._lock:
+            if self._sent_ns is None or self._response_ns is not None:
+                return
+            if self.pattern is not None:
+                buffer = self._buffer
+                buffer += data
+                if len(buffer) > TRANSACTION_BUFFER_BYTES:
+                    del buffer[:len(buffer) - TRANSACTION_BUFFER_BYTES]
+                if not self.pattern.search(buffer):
+                    return
+            self._response_ns = received_ns
+        self._done.set()
+
+    def _transact(self, name, data, display):
+        stats = self.stats[name]
+        tag = TransactionTag((f'{self.label}[{name}]', display) if display is not None else ())
+        with self._lock:
+            self._tag = tag
+            self._sent_ns = None
+            self._response_ns = None
+            self._buffer.clear()
+        self._done.clear()
+        if not self.session.send(data, tag):
+            stats.errors += 1
+        else:
+            self._done.wait(self.timeout)
+        with self._lock:
+            self._tag = None
+            sent_ns, response_ns = self._sent_ns, self._response_ns
+            self._sent_ns = None
+        if self._stop.is_set() and response_ns is None:
+            return
+        if response_ns is not None:
+            stats.histogram.record(response_ns - sent_ns)
+        elif sent_ns is not None or self.session.is_open:
+            stats.timeouts += 1
+        self.completed += 1
+
+    def _run(self):
+        try:
+            for _ in range(self.rounds):
+                for name, data, display in self.requests:
+                    if self._stop.is_set() or not self.session.is_open:
+                        return
+                    self._transact(name, data, display)
+                    if self.interval > 0:
+                        self._stop.wait(self.interval)
+        finally:
+            self.session.remove_observer(self)
+            self.finished = True
+            if self.on_finished:
+                self.on_finished(self)
+
+
+class StepStats:
+    """序列中一个步骤的统计：执行次数、耗时直方图、超时和发送失败次数
+
+    发送步骤记录从放入发送队列到写完的时间，等待步骤记录从上一条发送写完到应答匹配的时间，
+    延时步骤记录实际延时，便于检查定时精度。
+    """
+
+    def __init__(self, step):
+        self.step = step
+        self.count = 0
+        self.histogram = LatencyHistogram()
+        self.timeouts = 0
+        self.errors = 0
+
+    def summary(self):
+        histogram = self.histogram
+        text = f'第{self.step.line}行 {self.step.text}: 执行 {self.count} 次'
+        if self.timeouts:
+            text += f'，超时 {self.timeouts} 次'
+        if self.errors:
+            text += f'，发送失败 {self.errors} 次'
+        if histogram.count:
+            text += (f'，p50 {histogram.percentile(50) / 1e6:.3f}ms，p99 {histogram.percentile(99) / 1e6:.3f}ms，'
+                     f'最大 {histogram.max / 1e6:.3f}ms')
+        return text
+
+    def to_dict(self):
+        histogram = self.histogram
+        return {
+            'line': self.step.line,
+            'step': self.step.text,
+            'count': self.count,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'mean_ms': histogram.mean / 1e6,
+            'p50_ms': histogram.percentile(50) / 1e6,
+            'p99_ms': histogram.percentile(99) / 1e6,
+            'max_ms': (histogram.max or 0) / 1e6,
+            'histogram_ns': histogram.buckets(),
+        }
+
+
+SEQUENCE_CSV_FIELDS = ('line', 'step', 'count', 'timeouts', 'errors', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms')
+
+
+class SequenceStep:
+    """命令序列中的一步，kind为SEQUENCE_COMMANDS中的命令，target为跳转目标的步骤下标"""
+
+    def __init__(self, line, text, kind, args, target=None):
+        self.line = line
+        self.text = text
+        self.kind = kind
+        self.args = args
+        self.target = target
+
+
+SEQUENCE_COMMANDS = ('send', 'hex', 'quick', 'wait', 'delay', 'if', 'ontimeout', 'goto', 'loop', 'stop')
+SEQUENCE_ARG_COUNTS = {'wait': (1, 2), 'if': (2, 2), 'ontimeout': (1, 1), 'goto': (1, 1),
+                       'loop': (2, 2), 'stop': (0, 0)}  # 按空格分隔参数的命令: (最少, 最多)参数个数
+SEQUENCE_HELP = """# 每行一条命令，#开头为注释，"名称:"定义跳转标签
+# send 文本          按发送编码、校验和换行设置发送文本
+# hex 01 03 00 00    发送十六进制
+# quick 3            发送第3个快速字符串
+# wait 正则 [超时ms]  等待上一条发送后收到的数据匹配，正则含空格或反斜杠时加引号
+# delay 毫秒          精确延时
+# if 正则 标签        上一条发送后收到的数据匹配时跳转
+# ontimeout 标签      上一个wait超时时跳转
+# goto 标签           跳转
+# loop 标签 次数      跳回标签，使标签到此处共执行指定次数，0为无限
+# stop               结束本轮
+"""
+
+
+def parse_sequence(text):
+    """解析命令序列脚本，返回[SequenceStep, ...]；格式错误时抛出ValueError，信息含行号"""
+    steps = []
+    labels = {}
+    jumps = []
+    for line, raw in enumerate(text.splitlines(), 1):
+        source = raw.strip()
+        if not source or source.startswith('#'):
+            continue
+        if source.endswith(':') and not source[:-1].split()[1:]:
+            labels[source[:-1]] = len(steps)
+            continue
+        kind, _, rest = source.partition(' ')
+        kind = kind.lower()
+        rest = rest.strip()
+        try:
+            if kind not in SEQUENCE_COMMANDS:
+                raise ValueError(f'未知命令 {kind}')
+            if kind in ('send', 'hex'):
+                if not rest:
+                    raise ValueError('缺少发送内容')
+                args = (rest,)
+            elif kind in ('quick', 'delay'):
+                # 数字参数后可以跟#注释
+                rest = rest.partition('#')[0].strip()
+                if not re.fullmatch(r'\d+(\.\d*)?' if kind == 'delay' else r'\d+', rest):
+                    raise ValueError(f'{kind}的参数必须是数字')
+                args = (float(rest) if kind == 'delay' else int(rest),)
+            else:
+                args = tuple(shlex.split(rest))
+                low, high = SEQUENCE_ARG_COUNTS[kind]
+                if not low <= len(args) <= high:
+                    raise ValueError('参数个数错误')
+                if kind == 'wait':
+                    timeout = float(args[1]) / 1000 if len(args) > 1 else DEFAULT_TRANSACTION_TIMEOUT
+                    args = (args[0], timeout)
+                elif kind == 'loop':
+                    args = (args[0], int(args[1]))
+                if kind in ('if', 'ontimeout', 'goto', 'loop'):
+                    jumps.append((len(steps), args[-2] if kind == 'loop' else args[-1]))
+        except ValueError as e:
+            raise ValueError(f'第{line}行: {e}')
+        steps.append(SequenceStep(line, source, kind, args))
+    for index, label in jumps:
+        if label not in labels:
+            raise ValueError(f'第{steps[index].line}行: 未定义的标签 {label}')
+        steps[index].target = labels[label]
+    return steps
+
+
+def sequence_from_quick_strings(quick_strings):
+    """按快速字符串顺序生成序列脚本，词条带延时(SSCOM导入)时在其后延时"""
+    lines = []
+    for i, item in enumerate(quick_strings, 1):
+        if not item.get('content'):
+            continue
+        if item.get('label'):
+            lines.append(f"# {item['label']}")
+        lines.append(f"quick {i}")
+        if item.get('delay'):
+            lines.append(f"delay {item['delay']}")
+    return '\n'.join(lines) + '\n'
+
+
+class SequenceRunner:
+    """命令序列执行线程
+
+    按parse_sequence()的步骤依次执行，共repeat轮(0为无限)，用于长时间的浸泡测试。
+    等待和分支匹配上一条发送写完之后收到的数据，最多保留TRANSACTION_BUFFER_BYTES字节；
+    统计只保存每个步骤的直方图，运行轮数再多内存占用也不增长。
+    步骤中的文本、十六进制和快速字符串在创建时按会话设置编码，错误时抛出ValueError。
+    """
+
+    def __init__(self, session, steps, repeat=1, show=False, label='序列'):
+        self.session = session
+        self.steps = steps
+        self.repeat = repeat
+        self.show = show
+        self.label = label
+        self.stats = [StepStats(step) for step in steps]
+        self.iterations = 0      # 已完成的轮数
+        self.current = None      # 正在执行的步骤下标
+        self.finished = False
+        self.on_finished = None  # 结束时在序列线程中调用on_finished(runner)
+        encoding = session.settings['recv_encoding']
+        self._actions = []
+        for step in steps:
+            try:
+                self._actions.append(self._compile(step, encoding))
+            except (ValueError, LookupError, re.error) as e:
+                raise ValueError(f'第{step.line}行: {e}')
+        self._lock = threading.Lock()
+        self._matched = threading.Event()
+        self._stop = threading.Event()
+        self._tag = None
+        self._sent_ns = None
+        self._send_stats = None
+        self._queued_ns = 0
+        self._buffer = bytearray()
+        self._wait_pos = 0
+        self._last_ns = None
+        self._pattern = None
+        self._match_ns = None
+        self._timed_out = False
+        self._thread = threading.Thread(target=self._run, name=f'{session.name}序列', daemon=True)
+
+    def _compile(self, step, encoding):
+        """把步骤参数转换为执行时使用的值：发送字节和显示文本、bytes正则或秒数"""
+        kind, args = step.kind, step.args
+        if kind in ('send', 'hex', 'quick'):
+            if kind == 'quick':
+                if not 1 <= args[0] <= len(self.session.quick_strings):
+                    raise ValueError(f'快速字符串编号超出范围: {args[0]}')
+                item = self.session.quick_strings[args[0] - 1]
+                if not item.get('content'):
+                    raise ValueError(f'快速字符串{args[0]}为空')
+                _, data, display = self.session.encode(item['content'], item.get('hex', False))
+            else:
+                _, data, display = self.session.encode(args[0], kind == 'hex')
+            return data, display
+        if kind in ('wait', 'if'):
+            return re.compile(args[0].encode(encoding)), args[-1]
+        if kind == 'delay':
+            return args[0] / 1000
+        return None
+
+    def latency_stats(self):
+        """wait步骤的[(名称, 应答延迟直方图, 超时次数), ...]，供指标接口导出"""
+        return [(f'第{item.step.line}行 {item.step.text}', item.histogram, item.timeouts)
+                for item in self.stats if item.step.kind == 'wait']
+
+    def start(self):
+        self.session.add_observer(self)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._matched.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def on_sent(self, tag, sent_ns):
+        """发送线程回调"""
+        with self._lock:
+            if tag is not self._tag:
+                return
+            self._sent_ns = sent_ns
+            stats = self._send_stats
+        stats.histogram.record(sent_ns - self._queued_ns)
+
+    def on_received(self, data, received_ns):
+        """接收线程回调；发送中的请求写完之前收到的数据属于之前的应答，不计入"""
+        with self._lock:
+            if self._tag is not None and self._sent_ns is None:
+                return
+            buffer = self._buffer
+            buffer += data
+            excess = len(buffer) - TRANSACTION_BUFFER_BYTES
+            if excess > 0:
+                del buffer[:excess]
+                self._wait_pos = max(0, self._wait_pos - excess)
+            self._last_ns = received_ns
+            pattern = self._pattern
+            if pattern is None:
+                return
+            match = pattern.search(buffer, self._wait_pos)
+            if not match:
+                return
+            self._wait_pos = match.end()
+            self._pattern = None
+            self._match_ns = received_ns
+        self._matched.set()
+
+    def _send(self, stats, data, display):
+        tag = TransactionTag((f'{self.label}[{stats.step.line}]', display) if self.show else ())
+        with self._lock:
+            self._tag = tag
+            self._sent_ns = None
+            self._send_stats = stats
+            self._buffer.clear()
+            self._wait_pos = 0
+            self._queued_ns = time.perf_counter_ns()
+        if not self.session.send(data, tag):
+            stats.errors += 1
+
+    def _wait(self, stats, pattern, timeout):
+        """等待pattern匹配，返回是否匹配"""
+        start_ns = time.perf_counter_ns()
+        with self._lock:
+            match = pattern.search(self._buffer, self._wait_pos)
+            if match:
+                self._wait_pos = match.end()
+                match_ns = self._last_ns
+            else:
+                self._matched.clear()
+                self._pattern = pattern
+                self._match_ns = None
+        if not match:
+            self._matched.wait(timeout)
+            with self._lock:
+                self._pattern = None
+                match_ns = self._match_ns
+        if match_ns is None:
+            if not self._stop.is_set():
+                stats.timeouts += 1
+            return False
+        with self._lock:
+            sent_ns = self._sent_ns
+        stats.histogram.record(match_ns - (sent_ns if sent_ns is not None else start_ns))
+        return True
+
+    def _run_once(self):
+        steps, actions, stats = self.steps, self._actions, self.stats
+        loops = {}  # loop步骤下标 -> 本次循环已执行的次数
+        index = 0
+        while index < len(steps):
+            if self._stop.is_set() or not self.session.is_open:
+                return False
+            self.current = index
+            step = steps[index]
+            kind = step.kind
+            action = actions[index]
+            step_stats = stats[index]
+            step_stats.count += 1
+            index += 1
+            if kind in ('send', 'hex', 'quick'):
+                self._send(step_stats, *action)
+            elif kind == 'wait':
+                self._timed_out = not self._wait(step_stats, *action)
+            elif kind == 'delay':
+                start = time.perf_counter()
+                sleep_until(start + action, self._stop)
+                step_stats.histogram.record((time.perf_counter() - start) * 1e9)
+            elif kind == 'if':
+                with self._lock:
+                    matched = action[0].search(self._buffer) is not None
+                if matched:
+                    index = step.target
+            elif kind == 'ontimeout':
+                if self._timed_out:
+                    index = step.target
+            elif kind == 'goto':
+                index = step.target
+            elif kind == 'loop':
+                count = loops.get(index, 1)
+                if step.args[1] == 0 or count < step.args[1]:
+                    loops[index] = count + 1
+                    index = step.target
+                else:
+                    loops.pop(index, None)  # 复位，外层循环再次进入时重新计数
+            elif kind == 'stop':
+                break
+        return True
+
+    def _run(self):
+        try:
+            while self.repeat == 0 or self.iterations < self.repeat:
+                if not self._run_once():
+                    return
+                self.iterations += 1
+        finally:
+            self.session.remove_observer(self)
+            self.current = None
+            self.finished = True
+            if self.on_finished:
+                self.on_finished(self)
+
+
+class FileSender:
+    """文件发送线程：把文件按块经PortWriter的发送队列写出，用于固件下载等大文件发送
+
+    二进制文件通过mmap按块切片直接放入发送队列，不复制也不整个读入内存；
+    hex_text为True时文件为空白分隔的十六进制文本，边读边转换。
+    发送队列中最多FILE_SEND_WINDOW块；设置块间延时、应答或CTS等待时逐块发送：
+    上一块写完后等待应答ack(bytes正则)匹配、延时delay秒，发送前等待CTS有效，
+    等待超过timeout秒时停止并记录error。进度position为已读取的文件字节数，sent为已写出的字节数。
+    """
+
+    def __init__(self, session, path, chunk_size=DEFAULT_FILE_CHUNK_SIZE, delay=0.0, hex_text=False,
+                 ack=None, wait_cts=False, timeout=DEFAULT_FILE_WAIT_TIMEOUT):
+        self.session = session
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.delay = delay
+        self.hex_text = hex_text
+        self.ack = ack
+        self.wait_cts = wait_cts
+        self.timeout = timeout
+        self.total = os.path.getsize(path)
+        self.position = 0
+        self.sent = 0
+        self.chunks = 0
+        self.error = None
+        self.finished = False
+        self.on_finished = None  # 结束时在发送线程中调用on_finished(sender)
+        self._start = None
+        self._end = None
+        self._cond = threading.Condition()
+        self._pending = collections.deque()  # 已放入发送队列、尚未写完的(tag, 字节数)
+        self._ack_buffer = bytearray()
+        self._acked = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'{session.name}文件发送', daemon=True)
+
+    @property
+    def paced(self):
+        """是否逐块发送"""
+        return self.delay > 0 or self.ack is not None or self.wait_cts
+
+    @property
+    def elapsed(self):
+        if self._start is None:
+            return 0.0
+        return (self._end or time.perf_counter()) - self._start
+
+    @property
+    def throughput(self):
+        """平均写出速度(字节/秒)"""
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f'已发送 {self.sent} 字节 ({self.position}/{self.total})，{self.chunks} 块，'
+                f'{self.throughput / 1024:.1f} KB/秒，用时 {self.elapsed:.1f} 秒')
+
+    def start(self):
+        self.session.add_observer(self)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._acked.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def on_sent(self, tag, sent_ns):
+        """发送线程回调，发送队列先进先出，本发送器的块按顺序写完"""
+        with self._cond:
+            pending = self._pending
+            if pending and tag is pending[0][0]:
+                self.sent += pending.popleft()[1]
+                self._cond.notify_all()
+
+    def on_received(self, data, received_ns):
+        """接收线程回调，只在等待应答时拼接数据"""
+        ack = self.ack
+        if ack is None or self._acked.is_set():
+            return
+        buffer = self._ack_buffer
+        buffer += data
+        if len(buffer) > TRANSACTION_BUFFER_BYTES:
+            del buffer[:len(buffer) - TRANSACTION_BUFFER_BYTES]
+        if ack.search(buffer):
+            self._acked.set()
+
+    def _chunks(self, view):
+        """依次返回(要发送的数据, 读到的文件位置)"""
+        size = len(view)
+        step = self.chunk_size
+        if not self.hex_text:
+            for pos in range(0, size, step):
+                end = min(pos + step, size)
+                yield view[pos:end], end
+            return
+        digits = bytearray()
+        for pos in range(0, size, step * 2):
+            end = min(pos + step * 2, size)
+            digits += view[pos:end].tobytes().translate(None, HEX_TEXT_SEPARATORS)
+            while len(digits) >= step * 2 or (end == size and digits):
+                piece = digits[:step * 2]
+                del digits[:step * 2]
+                try:
+                    data = bytes.fromhex(piece.decode('ascii'))
+                except (UnicodeDecodeError, ValueError):
+                    raise ValueError(f'文件第{pos + 1}字节附近有无效的十六进制数据')
+                yield data, end
+
+    def _wait_written(self, limit):
+        """等待发送队列中本发送器的块数不超过limit，停止或断开时返回False"""
+        with self._cond:
+            while len(self._pending) > limit:
+                if self._stop.is_set():
+                    return False
+                if not self.session.is_open:
+                    self.error = '串口已断开'
+                    return False
+                self._cond.wait(0.1)
+        return not self._stop.is_set()
+
+    def _wait_clear_to_send(self):
+        deadline = time.monotonic() + self.timeout
+        while not self.session.serial_port.cts:
+            if self._stop.is_set():
+                return False
+            if time.monotonic() >= deadline:
+                self.error = '等待CTS超时'
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _send_chunk(self, data):
+        tag = TransactionTag(())
+        self._ack_buffer.clear()
+        self._acked.clear()
+        with self._cond:
+            self._pending.append((tag, len(data)))
+        if not self.session.send(data, tag):
+            with self._cond:
+                self._pending.pop()
+            self.error = '发送队列已满或串口已断开'
+            return False
+        self.chunks += 1
+        return True
+
+    def _send_all(self, view):
+        paced = self.paced
+        window = 1 if paced else FILE_SEND_WINDOW
+        for data, position in self._chunks(view):
+            if not self._wait_written(window - 1):
+                return
+            if self.wait_cts and not self._wait_clear_to_send():
+                return
+            if not self._send_chunk(data):
+                return
+            self.position = position
+            if not paced:
+                continue
+            if not self._wait_written(0):
+                return
+            if self.ack is not None:
+                if not self._acked.wait(self.timeout):
+                    self.error = f'第{self.chunks}块等待应答超时'
+                    return
+                if self._stop.is_set():
+                    return
+            if self.delay > 0 and not sleep_until(time.perf_counter() + self.delay, self._stop):
+                return
+        self._wait_written(0)
+
+    def _run(self):
+        self._start = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as f:
+                if not self.total:
+                    return
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                view = memoryview(mm)
+                try:
+                    self._send_all(view)
+                finally:
+                    view.release()
+                    try:
+                        mm.close()
+                    except BufferError:
+                        # 发送线程仍引用最后一块的切片，交给垃圾回收
+                        pass
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+        finally:
+            self._end = time.perf_counter()
+            self.session.remove_observer(self)
+            self.finished = True
+            if self.on_finished:
+                self.on_finished(self)
+
+
+class ModemError(Exception):
+    """XMODEM/YMODEM传输失败，信息可直接提示给用户"""
+
+
+def modem_block(number, payload, size, crc=True):
+    """XMODEM/YMODEM数据块：SOH/STX + 块号 + 块号反码 + 数据(用pad补足) + CRC16(高字节在前)或累加和"""
+    if len(payload) > size:
+        raise ValueError(f'数据超过块大小: {len(payload)} > {size}')
+    header = bytes((MODEM_SOH if size == 128 else MODEM_STX, number & 0xFF, 0xFF - (number & 0xFF)))
+    data = bytes(payload).ljust(size, MODEM_PAD if number else b'\x00')
+    check = crc16_xmodem(data).to_bytes(2, 'big') if crc else bytes((sum8(data),))
+    return header + data + check
+
+
+class ModemSender:
+    """XMODEM/XMODEM-1K/YMODEM文件发送线程
+
+    传输期间串口收到的数据经PortSession.set_redirect()直接交给本对象，不进入分帧、显示和observers，
+    录制照常进行。等待接收方发出'C'(CRC16)或NAK(累加和)后开始，每块等待ACK，收到NAK或超时重发，
+    重发超过retries次、收到两个CAN或stop()时中止。接口与FileSender相同，另有块数、重发次数和线路利用率。
+    """
+
+    def __init__(self, session, path, protocol='XMODEM-1K', timeout=MODEM_TIMEOUT,
+                 start_timeout=MODEM_START_TIMEOUT, retries=MODEM_RETRIES):
+        self.session = session
+        self.path = path
+        self.protocol = protocol
+        self.block_size = MODEM_PROTOCOLS[protocol]
+        self.batch = protocol == 'YMODEM'
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.retries = retries
+        self.total = os.path.getsize(path)
+        self.position = 0    # 已确认的文件字节数
+        self.sent = 0        # 写出的字节数，含块头、校验和重发
+        self.chunks = 0      # 已确认的数据块数
+        self.retransmits = 0
+        self.error = None
+        self.finished = False
+        self.on_finished = None  # 结束时在传输线程中调用on_finished(sender)
+        settings = session.settings
+        # 线路每秒能传输的字节数
+        self.line_rate = int(settings['baud']) / char_bits(settings['data_bits'], settings['stop_bits'],
+                                                           settings['parity'])
+        self._start = None
+        self._end = None
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'{session.name}{protocol}', daemon=True)
+
+    @property
+    def elapsed(self):
+        if self._start is None:
+            return 0.0
+        return (self._end or time.perf_counter()) - self._start
+
+    @property
+    def throughput(self):
+        """有效速度：已确认的文件字节数/秒"""
+        elapsed = self.elapsed
+        return self.position / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def efficiency(self):
+        """有效速度占线路速率的比例"""
+        return self.throughput / self.line_rate if self.line_rate else 0.0
+
+    def summary(self):
+        return (f'{self.protocol} 已确认 {self.position}/{self.total} 字节，{self.chunks} 块，'
+                f'重发 {self.retransmits} 次，{self.throughput / 1024:.1f} KB/秒'
+                f'(线路速率的{self.efficiency:.0%})，用时 {self.elapsed:.1f} 秒')
+
+    def start(self):
+        self.session.set_redirect(self.on_data)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def on_data(self, data):
+        """接收线程回调"""
+        with self._cond:
+            self._buffer += data
+            self._cond.notify_all()
+
+    def _read_byte(self, timeout):
+        """读取接收方的一个控制字节，超时返回None，停止或断开时抛出ModemError"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._buffer:
+                if self._stop.is_set():
+                    raise ModemError('已停止')
+                if not self.session.is_open:
+                    raise ModemError('串口已断开')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, 0.1))
+            byte = self._buffer[0]
+            del self._buffer[0]
+            return byte
+
+    def _write(self, data):
+        if not self.session.send(data, TransactionTag(())):
+            raise ModemError('发送队列已满或串口已断开')
+        self.sent += len(data)
+
+    def _wait_start(self):
+        """等待接收方的'C'或NAK，返回是否使用CRC16"""
+        deadline = time.monotonic() + self.start_timeout
+        cancels = 0
+        while time.monotonic() < deadline:
+            byte = self._read_byte(deadline - time.monotonic())
+            if byte == MODEM_CRC:
+                return True
+            if byte == MODEM_NAK:
+                return False
+            cancels = cancels + 1 if byte == MODEM_CAN else 0
+            if cancels >= 2:
+                raise ModemError('接收方取消了传输')
+        raise ModemError('等待接收方开始超时')
+
+    def _send_block(self, block):
+        """发送一块直到收到ACK"""
+        cancels = 0
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retransmits += 1
+            with self._cond:
+                self._buffer.clear()  # 丢弃上一次应答之后的残留数据
+            self._write(block)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                byte = self._read_byte(deadline - time.monotonic())
+                if byte == MODEM_ACK:
+                    return
+                if byte is None or byte == MODEM_NAK:
+                    break
+                cancels = cancels + 1 if byte == MODEM_CAN else 0
+                if cancels >= 2:
+                    raise ModemError('接收方取消了传输')
+                # 其他字节是线路噪声，继续等待
+        raise ModemError(f'第{self.chunks + 1}块重发{self.retries}次仍未确认')
+
+    def _send_eot(self):
+        """发送EOT直到收到ACK；接收方通常先回NAK确认不是噪声"""
+        for attempt in range(self.retries + 1):
+            with self._cond:
+                self._buffer.clear()
+            self._write(bytes((MODEM_EOT,)))
+            if self._read_byte(self.timeout) == MODEM_ACK:
+                return
+        raise ModemError('结束传输未被确认')
+
+    def _transfer(self, f):
+        header = None
+        if self.batch:
+            # 0号块：文件名、长度和修改时间，放不下128字节时用1024字节块
+            name = os.path.basename(self.path).encode('utf-8', errors='replace')
+            mtime = int(os.path.getmtime(self.path))
+            header = name + b'\x00' + f'{self.total} {mtime:o}'.encode() + b'\x00'
+            if len(header) > 1024:
+                raise ModemError(f'文件名过长，YMODEM文件信息块最多1024字节: {len(header)}')
+        crc = self._wait_start()
+        if header is not None:
+            self._send_block(modem_block(0, header, 128 if len(header) <= 128 else 1024))
+            crc = self._wait_start()
+        number = 1
+        while True:
+            payload = f.read(self.block_size)
+            if not payload:
+                break
+            # 最后不足128字节时改用128字节块，少传填充
+            size = 128 if len(payload) <= 128 else self.block_size
+            self._send_block(modem_block(number, payload, size, crc))
+            number += 1
+            self.chunks += 1
+            self.position += len(payload)
+        self._send_eot()
+        if self.batch:
+            # 空文件名的0号块结束批量传输
+            self._wait_start()
+            self._send_block(modem_block(0, b'', 128))
+
+    def _run(self):
+        self._start = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as f:
+                self._transfer(f)
+        except (OSError, ModemError) as e:
+            if not self._stop.is_set():
+                self.error = str(e)
+            if self.session.is_open:
+                self.session.send(MODEM_CANCEL, None)
+        finally:
+            self._end = time.perf_counter()
+            self.session.set_redirect(None)
+            self.finished = True
+            if self.on_finished:
+                self.on_finished(self)
+
+
+class CaptureWriter:
+    """录制文件写入器：后台线程把收发的原始字节流式写入磁盘
+
+    文件格式见CAPTURE_HEADER/CAPTURE_RECORD；同时写入path.idx时间索引。
+    带缓冲写入、定期刷新，并按文件大小或时间轮换为path_0001.cap、path_0002.cap……
+    write()只把数据放入队列，可以在接收线程或界面线程中调用。
+    """
+
+    def __init__(self, path, port_id, rotate_bytes=DEFAULT_CAPTURE_ROTATE_BYTES,
+                 rotate_seconds=DEFAULT_CAPTURE_ROTATE_SECONDS,
+                 flush_interval=DEFAULT_CAPTURE_FLUSH_INTERVAL):
+        self.base, self.ext = os.path.splitext(path)
+        self.ext = self.ext or '.cap'
+        self.port_id = port_id
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(CAPTURE_QUEUE_SIZE)
+        self.dropped = 0
+        self.written = 0
+        self.file_index = 0
+        self.current_path = None
+        self.error = None
+        self._file = None
+        self._index_file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._last_index_ns = None
+        self._last_index_offset = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._open_next()
+        self._thread.start()
+
+    def stop(self):
+        """写完队列中剩余的数据后关闭文件"""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+
+    def write(self, direction, data, timestamp_ns=None):
+        """加入一条记录，timestamp_ns为time.monotonic_ns()，队列满时丢弃"""
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        try:
+            self.queue.put_nowait((timestamp_ns, direction, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def _close_files(self):
+        if self._file:
+            self._file.close()
+            self._index_file.close()
+
+    def _open_next(self):
+        self._close_files()
+        self.file_index += 1
+        self.current_path = f'{self.base}_{self.file_index:04d}{self.ext}'
+        self._file = open(self.current_path, 'wb', buffering=1024 * 1024)
+        self._index_file = open(self.current_path + CAPTURE_INDEX_SUFFIX, 'wb')
+        header = CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, self.port_id,
+                                     time.time(), time.monotonic_ns())
+        self._file.write(header)
+        self._file_bytes = len(header)
+        self._file_opened = time.monotonic()
+        self._last_index_ns = None
+
+    def _run(self):
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    timestamp_ns, direction, data = item
+                    # 每隔一段时间或一定字节数记录一个(时间, 偏移)索引项
+                    if (self._last_index_ns is None or
+                            timestamp_ns - self._last_index_ns >= CAPTURE_INDEX_INTERVAL_NS or
+                            self._file_bytes - self._last_index_offset >= CAPTURE_INDEX_INTERVAL_BYTES):
+                        self._index_file.write(CAPTURE_INDEX_ENTRY.pack(timestamp_ns, self._file_bytes))
+                        self._last_index_ns = timestamp_ns
+                        self._last_index_offset = self._file_bytes
+                    record = CAPTURE_RECORD.pack(timestamp_ns, self.port_id, direction, len(data))
+                    self._file.write(record)
+                    self._file.write(data)
+                    size = len(record) + len(data)
+                    self._file_bytes += size
+                    self.written += size
+
+                now = time.monotonic()
+                if now - last_flush >= self.flush_interval:
+                    self._file.flush()
+                    self._index_file.flush()
+                    last_flush = now
+                if self._file_bytes > CAPTURE_HEADER.size and (
+                        self._file_bytes >= self.rotate_bytes or
+                        now - self._file_opened >= self.rotate_seconds):
+                    self._open_next()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._close_files()
+
+
+class CaptureFile:
+    """录制文件读取器
+
+    通过mmap访问文件，按.idx时间索引二分定位，打开大文件中的某个时间段无需
+    从头扫描；索引文件缺失时扫描记录头重建。records()返回的数据是文件映射上的
+    memoryview，在close()之前有效，需要长期保存时请转换为bytes。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = open(path, 'rb')
+        size = os.fstat(self._fp.fileno()).st_size
+        if size < CAPTURE_HEADER.size:
+            self._fp.close()
+            raise ValueError('不是有效的录制文件')
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.port_id, self.wall_start, self.mono_start_ns = \
+            CAPTURE_HEADER.unpack_from(self._mm, 0)
+        if magic != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError('不是有效的录制文件')
+        if version != CAPTURE_VERSION:
+            self.close()
+            raise ValueError(f'不支持的录制文件版本: {version}')
+        self.index_times, self.index_offsets = self._load_index()
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            # 仍有records()返回的memoryview在使用，交给垃圾回收
+            pass
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_index(self):
+        times, offsets = [], []
+        index_path = self.path + CAPTURE_INDEX_SUFFIX
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % CAPTURE_INDEX_ENTRY.size
+            for timestamp_ns, offset in CAPTURE_INDEX_ENTRY.iter_unpack(data[:usable]):
+                times.append(timestamp_ns)
+                offsets.append(offset)
+            return times, offsets
+
+        # 没有索引文件时扫描记录头重建
+        last_ns = None
+        for offset, timestamp_ns, _, _, length in self._scan(CAPTURE_HEADER.size):
+            if last_ns is None or timestamp_ns - last_ns >= CAPTURE_INDEX_INTERVAL_NS:
+                times.append(timestamp_ns)
+                offsets.append(offset)
+                last_ns = timestamp_ns
+        return times, offsets
+
+    def _scan(self, offset):
+        """从offset开始依次返回(偏移, 时间, 串口号, 方向, 长度)，遇到截断的记录停止"""
+        mm = self._mm
+        size = len(mm)
+        record_size = CAPTURE_RECORD.size
+        while offset + record_size <= size:
+            timestamp_ns, port_id, direction, length = CAPTURE_RECORD.unpack_from(mm, offset)
+            if offset + record_size + length > size:
+                break
+            yield offset, timestamp_ns, port_id, direction, length
+            offset += record_size + length
+
+    def to_wall(self, timestamp_ns):
+        """单调时间(ns)转换为墙上时间(秒)"""
+        return self.wall_start + (timestamp_ns - self.mono_start_ns) / 1e9
+
+    def to_monotonic(self, wall_time):
+        """墙上时间(秒)转换为单调时间(ns)"""
+        return self.mono_start_ns + int((wall_time - self.wall_start) * 1e9)
+
+    def records(self, start=None, end=None):
+        """按时间顺序返回(墙上时间, 串口号, 方向, 数据)，start/end为墙上时间(秒)"""
+        offset = CAPTURE_HEADER.size
+        start_ns = self.to_monotonic(start) if start is not None else None
+        end_ns = self.to_monotonic(end) if end is not None else None
+        if start_ns is not None:
+            i = bisect.bisect_right(self.index_times, start_ns) - 1
+            if i >= 0:
+                offset = self.index_offsets[i]
+
+        view = memoryview(self._mm)
+        record_size = CAPTURE_RECORD.size
+        for offset, timestamp_ns, port_id, direction, length in self._scan(offset):
+            if start_ns is not None and timestamp_ns < start_ns:
+                continue
+            if end_ns is not None and timestamp_ns > end_ns:
+                break
+            payload_offset = offset + record_size
+            yield (self.to_wall(timestamp_ns), port_id, direction,
+                   view[payload_offset:payload_offset + length])
+
+
+class CapturePort:
+    """把录制文件当作只读串口回放，代替串口交给PortReader读取
+
+    每条记录作为一块数据返回，保持录制时的分块；按记录之间的时间间隔返回数据，
+    speed为倍速，0为不等待尽快回放。分帧、解码和显示与实时接收走同一条路径。
+    只回放direction方向(默认接收)的记录，写入的数据直接丢弃。
+    throttle()返回True时暂停回放，尽快回放时用于等待下游处理完已投递的数据。
+    回放到文件末尾后finished为True，之后read()像空闲串口一样等待超时，由调用方关闭。
+    """
+
+    def __init__(self, path, speed=1.0, direction=DIRECTION_RX, timeout=DEFAULT_READ_TIMEOUT_MS / 1000):
+        self.path = path
+        self.speed = speed
+        self.direction = direction
+        self.timeout = timeout
+        self.throttle = None
+        self.capture = CaptureFile(path)
+        self.is_open = True
+        self.finished = False
+        self.records = 0      # 已回放的记录数
+        self.replayed = 0     # 已回放的字节数
+        self.position = 0.0   # 当前记录在录制中的时间(秒，从第一条记录算起)
+        self._records = self.capture.records()
+        self._first = None    # 第一条记录的墙上时间
+        self._start = None
+        self._end = None
+        self._data = b''      # 当前记录中尚未读出的数据
+        self._due = 0.0       # 当前记录应当返回的monotonic时间
+        self._cancel = threading.Event()
+
+    @property
+    def elapsed(self):
+        if self._start is None:
+            return 0.0
+        return (self._end or time.monotonic()) - self._start
+
+    @property
+    def throughput(self):
+        """平均回放速度(字节/秒)"""
+        elapsed = self.elapsed
+        return self.replayed / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f'已回放 {self.replayed} 字节，{self.records} 块，录制时间 {self.position:.1f} 秒，'
+                f'{self.throughput / 1024:.1f} KB/秒，用时 {self.elapsed:.1f} 秒')
+
+    def _next(self):
+        """取出下一条要回放的记录，没有时标记结束并返回False"""
+        for wall_time, _, direction, payload in self._records:
+            if direction != self.direction or not payload:
+                continue
+            # 复制出来再交给接收线程，文件映射在close()后失效
+            self._data = bytes(payload)
+            payload.release()
+            now = time.monotonic()
+            if self._first is None:
+                self._first = wall_time
+                self._start = now
+            self.position = wall_time - self._first
+            self._due = self._start + self.position / self.speed if self.speed > 0 else now
+            return True
+        self.finished = True
+        self._end = time.monotonic()
+        return False
+
+    def _wait(self, seconds):
+        """等待seconds秒(None为一直等待)，被cancel_read()中断时返回True"""
+        if self._cancel.wait(seconds):
+            self._cancel.clear()
+            return True
+        return False
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        if not self._data and (self.finished or not self._next()):
+            self._wait(self.timeout)
+            return b''
+        while True:
+            now = time.monotonic()
+            if self.throttle is not None and self.throttle():
+                wait = REPLAY_THROTTLE_INTERVAL
+            else:
+                wait = self._due - now
+                if wait <= 0:
+                    break
+            if deadline is not None:
+                if now >= deadline:
+                    return b''
+                wait = min(wait, deadline - now)
+            if self._wait(wait):
+                return b''
+
+        data = self._data
+        if size < len(data):
+            self._data = data[size:]
+            data = data[:size]
+        else:
+            self._data = b''
+            self.records += 1
+        self.replayed += len(data)
+        return data
+
+    @property
+    def in_waiting(self):
+        """当前记录已到时的剩余字节数"""
+        if self._data and time.monotonic() >= self._due:
+            return len(self._data)
+        return 0
+
+    def write(self, data):
+        return len(data)
+
+    def cancel_read(self):
+        self._cancel.set()
+
+    def cancel_write(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+        self._data = b''
+        self._records.close()
+        self.capture.close()
+
+
+def write_capture_file(path, port_id, records):
+    """把[(单调时间ns, 方向, 数据), ...]一次写成录制文件，不写索引(打开时扫描重建)"""
+    with open(path, 'wb') as f:
+        f.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, port_id, time.time(), time.monotonic_ns()))
+        for timestamp_ns, direction, data in records:
+            f.write(CAPTURE_RECORD.pack(timestamp_ns, port_id, direction, len(data)))
+            f.write(data)
+
+
+class AhoCorasick:
+    """多个字节串的Aho-Corasick自动机，状态可跨数据块保留，分在两块中的匹配也能找到
+
+    每个字节只查一次转移表，与模式数量无关；处于初始状态时用正则跳到下一个可能的
+    首字节，数据中很少出现模式首字节时大部分数据在C代码中跳过。
+    """
+
+    def __init__(self, patterns):
+        goto = [{}]
+        outputs = [()]
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                raise ValueError('匹配内容不能为空')
+            state = 0
+            for byte in pattern:
+                next_state = goto[state].get(byte)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][byte] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] += (index,)
+
+        # 按广度优先计算失败转移，输出合并失败状态的输出
+        fail = [0] * len(goto)
+        pending = collections.deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for byte, next_state in goto[state].items():
+                pending.append(next_state)
+                target = fail[state]
+                while target and byte not in goto[target]:
+                    target = fail[target]
+                target = goto[target].get(byte, 0) if state else 0
+                fail[next_state] = target
+                outputs[next_state] += outputs[target]
+        self.goto = goto
+        self.fail = fail
+        self.outputs = outputs
+        self.lengths = [len(pattern) for pattern in patterns]
+        self._skip = re.compile(b'[' + b''.join(re.escape(bytes((byte,))) for byte in goto[0]) + b']')
+
+    def search(self, data, state=0):
+        """从state开始匹配data，返回([(结束下标, 模式序号), ...], 新状态)，结束下标为末字节之后"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        skip = self._skip.search
+        matches = []
+        i = 0
+        size = len(data)
+        while i < size:
+            if not state:
+                found = skip(data, i)
+                if found is None:
+                    break
+                i = found.start()
+            byte = data[i]
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            i += 1
+            if outputs[state]:
+                matches.extend((i, index) for index in outputs[state])
+        return matches, state
+
+
+class TriggerRule:
+    """触发器脚本中的一条，kind为TRIGGER_KINDS中的类型"""
+
+    def __init__(self, line, text, kind, pattern, highlight=False, send=0, capture='', save=0.0,
+                 holdoff=TRIGGER_DEFAULT_HOLDOFF):
+        self.line = line
+        self.text = text
+        self.kind = kind
+        self.pattern = pattern
+        self.highlight = highlight  # 日志高亮
+        self.send = send            # 发送的快速字符串编号，0为不发送
+        self.capture = capture      # 'start'/'stop'开始或停止录制，''为不变
+        self.save = save            # 保存触发前多少秒的接收数据，0为不保存
+        self.holdoff = holdoff
+        self.hits = 0               # 命中次数
+        self.fired = 0              # 执行动作的次数，holdoff内的命中只计数
+        self.last_text = None       # 最近一次命中的内容
+        self.last_time = None
+
+    def summary(self):
+        return f'第{self.line}行 {self.text}: 命中 {self.hits} 次，执行 {self.fired} 次'
+
+
+TRIGGER_HELP = """# 每行一个触发器: 类型 匹配内容 [动作 ...]，#开头为注释；匹配内容含空格或反斜杠时加引号
+# regex 正则          匹配按接收编码解码后的文本，如 regex 'Hard ?Fault'
+# text 文本           按字节匹配文本，多个text/hex触发器一起匹配，数量多也不变慢
+# hex 十六进制         按字节匹配，如 hex "DE AD BE EF"
+# 动作可组合，每次命中都记录日志：
+#   highlight         日志中高亮显示
+#   send=N            发送第N个快速字符串
+#   capture=start     开始录制(已在录制时不变)，capture=stop停止录制
+#   save=秒           把触发前这些秒收到的数据保存为录制文件
+#   holdoff=秒        同一触发器两次执行动作的最小间隔，默认1秒，期间的命中只计数
+"""
+
+
+def parse_triggers(text):
+    """解析触发器脚本，返回[TriggerRule, ...]；格式错误时抛出ValueError，信息含行号"""
+    rules = []
+    for line, raw in enumerate(text.splitlines(), 1):
+        source = raw.strip()
+        if not source or source.startswith('#'):
+            continue
+        try:
+            try:
+                words = shlex.split(source)
+            except ValueError as e:
+                raise ValueError(f'引号不匹配: {e}')
+            if len(words) < 2:
+                raise ValueError('缺少匹配内容')
+            kind, pattern = words[0].lower(), words[1]
+            if kind not in TRIGGER_KINDS:
+                raise ValueError(f'未知类型 {kind}')
+            if not pattern:
+                raise ValueError('匹配内容不能为空')
+            rule = TriggerRule(line, source, kind, pattern)
+            for word in words[2:]:
+                name, _, value = word.partition('=')
+                name = name.lower()
+                if name == 'highlight' and not value:
+                    rule.highlight = True
+                elif name == 'send' and value.isdigit() and int(value) > 0:
+                    rule.send = int(value)
+                elif name == 'capture' and value in TRIGGER_CAPTURE_ACTIONS:
+                    rule.capture = value
+                elif name in ('save', 'holdoff') and re.fullmatch(r'\d+(\.\d*)?', value):
+                    setattr(rule, name, float(value))
+                else:
+                    raise ValueError(f'无效的动作 {word}')
+        except ValueError as e:
+            raise ValueError(f'第{line}行: {e}')
+        rules.append(rule)
+    return rules
+
+
+class TriggerEvent:
+    """一次执行动作的触发，交给on_trigger由宿主记录日志"""
+
+    def __init__(self, rule, text, timestamp):
+        self.rule = rule
+        self.text = text        # 命中的内容
+        self.time = timestamp   # time.time()
+        self.sent = None        # 快速字符串是否进入发送队列，不发送时为None
+        self.capture = None     # 开始或停止的CaptureWriter
+        self.saved_path = None  # 触发前数据保存到的文件
+        self.errors = []
+
+    def describe(self):
+        """命中内容和已执行动作的说明，不含错误"""
+        rule = self.rule
+        message = f"第{rule.line}行 命中: {self.text}"
+        if self.sent is not None:
+            message += f"，{'已发送' if self.sent else '发送失败: 未连接或队列已满'}快速字符串{rule.send}"
+        if self.saved_path:
+            message += f"，触发前{rule.save:g}秒数据已保存到 {self.saved_path}"
+        if self.capture is not None:
+            if rule.capture == 'start':
+                message += f"，开始录制: {self.capture.current_path}"
+            else:
+                message += f"，录制已停止，共写入 {self.capture.written} 字节"
+        return message
+
+
+class TriggerEngine:
+    """接收数据触发器，作为PortSession的观察者在接收线程中匹配每帧(不分帧时为每块数据)
+
+    regex按接收编码增量解码后匹配，窗口带上一块末尾TRIGGER_OVERLAP_CHARS个字符，
+    跨块的匹配也能找到；text和hex合成一个AhoCorasick自动机，状态跨块保留。
+    命中后按holdoff限制频率，在接收线程中执行动作：发送快速字符串、开始或停止录制、
+    把环形缓冲中触发前save秒的接收数据写入save_dir下的录制文件，然后回调
+    on_trigger(engine, TriggerEvent)。开始录制需要宿主设置capture_factory()，
+    返回已启动的CaptureWriter，录制文件命名和轮换设置由宿主决定。
+    show为True时发送的数据带TransactionTag((label, 显示文本))，否则不显示。
+    规则中的文本、十六进制和快速字符串在创建时按会话设置编码，错误时抛出ValueError。
+    """
+
+    def __init__(self, session, rules, show=False, save_dir='.', label='触发'):
+        self.session = session
+        self.rules = rules
+        self.show = show
+        self.save_dir = save_dir
+        self.label = label
+        self.on_trigger = None      # 在接收线程中调用on_trigger(engine, TriggerEvent)
+        self.capture_factory = None
+        encoding = session.settings['recv_encoding']
+        literals = []
+        self._literal_rules = []
+        self._regexes = []
+        self._sends = {}
+        for rule in rules:
+            try:
+                if rule.kind == 'regex':
+                    self._regexes.append((rule, re.compile(rule.pattern), [0]))
+                else:
+                    literals.append(parse_hex_bytes(rule.pattern) if rule.kind == 'hex'
+                                    else rule.pattern.encode(encoding))
+                    if not literals[-1]:
+                        raise ValueError('匹配内容不能为空')
+                    self._literal_rules.append(rule)
+                if rule.send:
+                    if not 1 <= rule.send <= len(session.quick_strings):
+                        raise ValueError(f'快速字符串编号超出范围: {rule.send}')
+                    item = session.quick_strings[rule.send - 1]
+                    if not item.get('content'):
+                        raise ValueError(f'快速字符串{rule.send}为空')
+                    _, data, display = session.encode(item['content'], item.get('hex', False))
+                    self._sends[rule] = (data, display)
+            except (ValueError, LookupError, re.error) as e:
+                raise ValueError(f'第{rule.line}行: {e}')
+        self._automaton = AhoCorasick(literals) if literals else None
+        self._state = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if self._regexes else None
+        self._tail = ''
+        self._text_pos = 0  # 已解码的字符数
+        save = max((rule.save for rule in rules), default=0)
+        self._ring = collections.deque() if save else None  # [(单调时间ns, 数据), ...]
+        self._ring_ns = int(save * 1e9)
+        self._ring_bytes = 0
+        self._fired_ns = {}
+
+    def start(self):
+        self.session.add_observer(self)
+
+    def stop(self):
+        self.session.remove_observer(self)
+
+    def on_sent(self, tag, sent_ns):
+        pass
+
+    def on_received(self, data, received_ns):
+        """接收线程回调"""
+        now_ns = time.monotonic_ns()
+        ring = self._ring
+        if ring is not None:
+            ring.append((now_ns, bytes(data)))
+            self._ring_bytes += len(data)
+            oldest = now_ns - self._ring_ns
+            while ring and (ring[0][0] < oldest or self._ring_bytes > TRIGGER_RING_MAX_BYTES):
+                self._ring_bytes -= len(ring.popleft()[1])
+
+        hits = []
+        if self._automaton is not None:
+            matches, self._state = self._automaton.search(data, self._state)
+            for _, index in matches:
+                rule = self._literal_rules[index]
+                hits.append((rule, rule.pattern))
+        if self._decoder is not None:
+            hits += self._match_text(self._decoder.decode(data))
+        for rule, text in hits:
+            self._fire(rule, text, now_ns)
+
+    def _match_text(self, text):
+        """在上一块末尾加本块文本的窗口中查找，只返回结束于本块、且在上次命中之后的匹配"""
+        if not text:
+            return []
+        tail = self._tail
+        window = tail + text
+        base = self._text_pos - len(tail)  # 窗口开头在文本流中的位置
+        hits = []
+        for rule, pattern, last_end in self._regexes:
+            for match in pattern.finditer(window, max(0, last_end[0] - base)):
+                if match.end() <= len(tail) or match.end() == match.start():
+                    continue
+                last_end[0] = base + match.end()
+                hits.append((rule, match.group()))
+        self._text_pos += len(text)
+        self._tail = window[-TRIGGER_OVERLAP_CHARS:]
+        return hits
+
+    def _fire(self, rule, text, now_ns):
+        rule.hits += 1
+        rule.last_text = text = text[:TRIGGER_TEXT_MAX]
+        rule.last_time = time.time()
+        last_ns = self._fired_ns.get(rule)
+        if last_ns is not None and now_ns - last_ns < rule.holdoff * 1e9:
+            return
+        self._fired_ns[rule] = now_ns
+        rule.fired += 1
+        event = TriggerEvent(rule, text, rule.last_time)
+        session = self.session
+
+        send = self._sends.get(rule)
+        if send is not None:
+            data, display = send
+            event.sent = session.send(data, TransactionTag((self.label, display) if self.show else ()))
+        if rule.save and self._ring is not None:
+            oldest = now_ns - int(rule.save * 1e9)
+            records = [(timestamp_ns, DIRECTION_RX, chunk) for timestamp_ns, chunk in self._ring
+                       if timestamp_ns >= oldest]
+            stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(event.time))
+            path = os.path.join(self.save_dir, f'trigger_port{session.index}_{stamp}_'
+                                               f'{int(event.time * 1000) % 1000:03d}_line{rule.line}.cap')
+            try:
+                write_capture_file(path, session.index, records)
+                event.saved_path = path
+            except OSError as e:
+                event.errors.append(f'保存触发前数据失败: {e}')
+        if rule.capture == 'start' and session.capture is None and self.capture_factory is not None:
+            try:
+                event.capture = self.capture_factory()
+                session.set_capture(event.capture)
+            except Exception as e:
+                event.errors.append(f'开始录制失败: {e}')
+        elif rule.capture == 'stop' and session.capture is not None:
+            event.capture = session.capture
+            session.set_capture(None)
+            event.capture.stop()
+
+        if self.on_trigger:
+            self.on_trigger(self, event)
+
+
+class LogBuffer:
+    """定长环形日志缓冲，元素为(文本, 颜色)
+
+    超过行数或字符数上限时从头部丢弃最早的行，追加和按下标访问都是O(1)。
+    """
+
+    def __init__(self, max_lines=DEFAULT_LOG_MAX_LINES, max_bytes=DEFAULT_LOG_MAX_BYTES):
+        self.max_lines = max(1, max_lines)
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        self._items = [None] * self.max_lines
+        self._start = 0
+        self._count = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._items[(self._start + index) % self.max_lines]
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def overflow(self, lines):
+        """追加lines之前需要从头部丢弃的行数"""
+        count = self._count + len(lines)
+        size = self.bytes + sum(len(text) for text, _ in lines)
+        drop = 0
+        while drop < self._count and (count > self.max_lines or size > self.max_bytes):
+            size -= len(self[drop][0])
+            count -= 1
+            drop += 1
+        return drop
+
+    def drop_front(self, n):
+        """丢弃最早的n行"""
+        for _ in range(min(n, self._count)):
+            self.bytes -= len(self._items[self._start][0])
+            self._items[self._start] = None
+            self._start = (self._start + 1) % self.max_lines
+            self._count -= 1
+
+    def extend(self, lines):
+        """追加多行，调用方需先用overflow()/drop_front()腾出空间"""
+        for line in lines[-self.max_lines:]:
+            if self._count == self.max_lines:
+                self.drop_front(1)
+            self._items[(self._start + self._count) % self.max_lines] = line
+            self._count += 1
+            self.bytes += len(line[0])
+
+    def set_max_lines(self, max_lines):
+        """修改行数上限，保留最新的内容"""
+        lines = list(self)[-max(1, max_lines):]
+        self.max_lines = max(1, max_lines)
+        self.clear()
+        self.extend(lines)
+
+
+def load_config(path=CONFIG_FILE):
+    """读取配置文件，文件不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_config(config, path=CONFIG_FILE):
+    """写入配置文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+class SocketPort(protocol_socket.Serial):
+    """socket://串口，in_waiting返回已到达的字节数
+
+    pyserial的socket://只报告是否可读(0或1)，read_chunk()每次只能多读1字节，
+    持续接收时吞吐只有每秒几百KB。这里窥视接收缓冲，一次读完已到达的数据。
+    """
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        if not select.select([self._socket], [], [], 0)[0]:
+            return 0
+        try:
+            return len(self._socket.recv(DEFAULT_BATCH_BYTES, socket.MSG_PEEK))
+        except OSError:
+            # 连接已断开，交给read()报告错误
+            return 1
+
+
+def open_serial_port(port, baud_rate=DEFAULT_BAUD_RATE, data_bits=8, stop_bits='1', parity='无',
+                     read_timeout_ms=DEFAULT_READ_TIMEOUT_MS):
+    """按配置文件中的参数文本打开串口
+
+    port也可以是pyserial的URL，如socket://host:port、rfc2217://host:port或loop://。
+    """
+    options = {
+        'baudrate': int(baud_rate),
+        'bytesize': int(data_bits),
+        'stopbits': STOP_BITS[str(stop_bits)],
+        'parity': PARITIES[parity],
+        'timeout': read_timeout_ms / 1000,
+    }
+    if port.startswith('socket://'):
+        serial_port = SocketPort(None, **options)
+        serial_port.port = port
+        serial_port.open()
+        return serial_port
+    return serial.serial_for_url(port, **options)
+
+
+def default_quick_strings(port_index):
+    """40个空词条，前4个为默认示例"""
+    quick_strings = [{"label": f"字符串{i+1}", "content": "", "hex": False}
+                     for i in range(QUICK_STRING_COUNT)]
+    if port_index == 1:
+        examples = [("Hello", False), ("World", False), ("48 65 6C 6C 6F", True), ("57 6F 72 6C 64", True)]
+    else:
+        examples = [("Test1", False), ("Test2", False), ("AA BB CC", True), ("DD EE FF", True)]
+    for i, (content, is_hex) in enumerate(examples):
+        quick_strings[i] = {"label": f"字符串{i+1}", "content": content, "hex": is_hex}
+    return quick_strings
+
+
+def pad_quick_strings(quick_strings):
+    """补足到40个词条"""
+    while len(quick_strings) < QUICK_STRING_COUNT:
+        quick_strings.append({"label": f"字符串{len(quick_strings)+1}", "content": "", "hex": False})
+    return quick_strings
+
+
+def encode_send_data(data, is_hex=False, encoding=DEFAULT_ENCODING, newline=False, checksum=None):
+    """把发送框文本编码为字节，返回(历史记录文本, 发送字节)
+
+    数据无效时抛出ValueError，异常信息可直接提示给用户。
+    十六进制发送时不添加换行符；指定checksum时校验值追加在数据之后、换行符之前。
+    """
+    if is_hex:
+        data = data.replace(' ', '')
+        if len(data) % 2 != 0:
+            raise ValueError('十六进制数据长度必须为偶数')
+        try:
+            send_bytes = bytes.fromhex(data)
+        except ValueError:
+            raise ValueError('无效的十六进制数据')
+    else:
+        try:
+            send_bytes = data.encode(encoding, errors='replace')
+        except LookupError:
+            raise ValueError(f'不支持的编码格式: {encoding}')
+        except Exception as e:
+            raise ValueError(f'编码失败: {str(e)}')
+    if checksum is not None:
+        send_bytes = checksum.append(send_bytes)
+    if newline and not is_hex:
+        send_bytes += b'\r\n'
+    return data, send_bytes
+
+
+def format_sent_data(send_bytes, is_hex=False, encoding=DEFAULT_ENCODING):
+    """发送数据的显示文本，文本发送时使用接收编码显示"""
+    if is_hex:
+        return format_hex(send_bytes)
+    try:
+        return send_bytes.decode(encoding, errors='replace')
+    except LookupError:
+        return send_bytes.decode('utf-8', errors='replace')
+
+
+def parse_sscom_quick_strings(file_path):
+    """解析SSCOM配置文件中的多条字符串，读取失败时抛出异常"""
+    quick_strings = []
+    with open(file_path, 'r', encoding='gbk') as f:  # SSCOM通常使用GBK编码
+        content = f.read()
+        
+    # 尝试解析新的SSCOM格式：N1xx定义词条信息，Nx定义词条内容
+    for i in range(1, 101):  # 支持最多100个快速字符串
+        # 查找词条信息行 N1xx=类型,名称,延时
+        info_match = re.search(rf'N1{i:02d}=(\d+),([^,]*),(\d+)', content)
+        if info_match:
+            # 查找对应的词条内容行 Nx=类型,内容
+            content_match = re.search(rf'N{i}=([HA]),([^\r\n]*)', content)
+            if content_match:
+                content_type = content_match.group(1)  # H=十六进制, A=ASCII
+                content_data = content_match.group(2).strip()
+                
+                if content_data:  # 只处理有内容的词条
+                    quick_strings.append({
+                        'content': content_data,          # 内容
+                        'hex': content_type == 'H',       # 是否十六进制
+                        'label': f'字符串{i}',            # 按钮标签
+                        'delay': int(info_match.group(3))  # 循环发送时发送后的延时(ms)
+                    })
+    
+    # 如果没有找到新格式，尝试解析旧格式
+    if not quick_strings:
+        for i in range(1, 41):  # 支持40个快速字符串
+            # 查找字符串内容
+            str_match = re.search(rf'Str{i}=(.+)', content)
+            if str_match:
+                str_content = str_match.group(1).strip()
+                if str_content:
+                    # 检查是否为十六进制
+                    hex_match = re.search(rf'Hex{i}=(\w+)', content)
+                    is_hex = bool(hex_match and hex_match.group(1).lower() == 'true')
+                    quick_strings.append({
+                        'content': str_content,  # 内容
+                        'hex': is_hex,           # 是否十六进制
+                        'label': f'字符串{i}'    # 按钮标签
+                    })
+    
+    return quick_strings
+
+
+MAX_SEND_HISTORY = 20            # 每种发送历史最多保留条数
+
+# 单个串口会话的设置，键与配置文件中serialN的键一致
+DEFAULT_PORT_SETTINGS = {
+    'port': '',
+    'baud': DEFAULT_BAUD_RATE,
+    'data_bits': 8,
+    'stop_bits': '1',
+    'parity': '无',
+    'read_mode': '阻塞',
+    'read_timeout': DEFAULT_READ_TIMEOUT_MS,
+    'min_bytes': DEFAULT_MIN_BYTES,
+    'send_encoding': DEFAULT_ENCODING,
+    'recv_encoding': DEFAULT_ENCODING,
+    'auto_newline': True,
+    'hex_display': False,
+    'hexdump': False,
+    'show_time': True,
+    'show_in_log': True,
+    'auto_reconnect': False,
+    'framer': '不分帧',
+    'frame_param': '',
+    'checksum': CHECKSUM_NONE,
+}
+
+
+class Backoff:
+    """指数退避：每次失败后等待时间翻倍，不超过上限"""
+
+    def __init__(self, initial=RECONNECT_INITIAL_DELAY, maximum=RECONNECT_MAX_DELAY, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self.delay = self.initial
+        self.attempts = 0
+
+    def next_delay(self):
+        """本次应等待的秒数"""
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        self.attempts += 1
+        return delay
+
+
+def scan_port_infos():
+    """同步枚举串口，返回port_info()字典列表；可能耗时数百毫秒，界面线程中应改用PortWatcher的缓存"""
+    return [port_info(info) for info in serial.tools.list_ports.comports()]
+
+
+def port_hardware_id(device, ports=None):
+    """USB串口的(VID, PID, 序列号)，不是USB设备时返回None
+
+    ports为port_info()字典列表(如PortWatcher.snapshot())，None时同步枚举。
+    """
+    for info in (scan_port_infos() if ports is None else ports):
+        if info['device'] == device and info.get('vid') is not None:
+            return (info['vid'], info.get('pid'), info.get('serial_number'))
+    return None
+
+
+def find_port(device, hardware_id=None, ports=None):
+    """重连时查找设备，找不到时返回None
+
+    已知USB硬件ID时按VID/PID/序列号匹配，设备重新枚举到其他路径也能找到；
+    否则使用原设备路径；pyserial的URL直接按原URL重连。
+    ports同port_hardware_id()，None时同步枚举。
+    """
+    if '://' in device:
+        return device
+    if hardware_id is not None:
+        for info in (scan_port_infos() if ports is None else ports):
+            if (info.get('vid'), info.get('pid'), info.get('serial_number')) == tuple(hardware_id):
+                return info['device']
+        return None
+    if os.path.exists(device):
+        return device
+    if any(info['device'] == device for info in (scan_port_infos() if ports is None else ports)):
+        return device
+    return None
+
+
+def port_info(info):
+    """comports()返回的串口信息转为可保存到配置文件的字典"""
+    return {
+        'device': info.device,
+        'description': info.description,
+        'vid': info.vid,
+        'pid': info.pid,
+        'serial_number': info.serial_number,
+    }
+
+
+class PortWatcher:
+    """后台线程监视串口插拔，缓存当前串口列表
+
+    Linux下每个周期只检查/dev目录的修改时间，有变化时才调用comports()重新枚举；
+    其他系统每个周期都枚举。串口列表变化时在监视线程中调用on_change(added, removed)，
+    added为新出现串口的信息字典列表，removed为消失的设备名列表；refresh()之后的那次
+    枚举无论有无变化都会回调。
+    """
+
+    def __init__(self, on_change=None, interval=PORT_WATCH_INTERVAL, full_scan=PORT_WATCH_FULL_SCAN):
+        self.on_change = on_change
+        self.interval = interval
+        self.full_scan = full_scan
+        self.ports = {}  # 设备名 -> 串口信息
+        self.scans = 0   # 实际枚举次数
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._force = True
+        self._dir_stamp = None
+        self._last_scan = 0.0
+        self._thread = None
+
+    def load(self, ports):
+        """用上次保存的列表预填缓存，启动时不必等待枚举"""
+        with self._lock:
+            self.ports = {port['device']: dict(port) for port in ports
+                          if isinstance(port, dict) and port.get('device')}
+
+    def snapshot(self):
+        """按设备名排序的串口信息列表"""
+        with self._lock:
+            return [dict(self.ports[device]) for device in sorted(self.ports)]
+
+    def devices(self):
+        with self._lock:
+            return sorted(self.ports)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def refresh(self):
+        """立即在后台重新枚举一次"""
+        self._force = True
+        self._wake.set()
+
+    def _dirs_changed(self):
+        if not sys.platform.startswith('linux'):
+            return True
+        stamp = []
+        for path in PORT_WATCH_DIRS:
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        stamp = tuple(stamp)
+        changed = stamp != self._dir_stamp
+        self._dir_stamp = stamp
+        return changed
+
+    def scan(self):
+        """枚举串口并更新缓存，返回(新增信息列表, 移除设备名列表)"""
+        ports = {info['device']: info for info in scan_port_infos()}
+        self.scans += 1
+        self._last_scan = time.monotonic()
+        with self._lock:
+            added = [ports[device] for device in sorted(ports) if ports[device] != self.ports.get(device)]
+            removed = sorted(device for device in self.ports if device not in ports)
+            self.ports = ports
+        return added, removed
+
+    def _run(self):
+        while self._running:
+            forced, self._force = self._force, False
+            changed = self._dirs_changed()
+            if forced or changed or time.monotonic() - self._last_scan >= self.full_scan:
+                try:
+                    added, removed = self.scan()
+                except Exception:
+                    added, removed = None, None
+                if added is not None and (forced or added or removed) and self.on_change:
+                    self.on_change(added, removed)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def config_port_sections(config):
+    """配置文件中按序号排列的串口配置[(序号, 配置), ...]"""
+    sections = []
+    for key, value in config.items():
+        match = re.fullmatch(r'serial(\d+)', key)
+        if match and isinstance(value, dict):
+            sections.append((int(match.group(1)), value))
+    return sorted(sections, key=lambda item: item[0])
+
+
+class PortSession:
+    """单个串口的会话：连接参数、收发线程、计数、发送历史、快速字符串、录制和自动发送
+
+    不依赖界面。接收、写出和错误通过回调通知，回调在收发线程中执行：
+      on_batch(session, chunks)      设置分帧时chunks中每块数据为一帧
+      on_written(session, 字节数, 时间戳, tag, 是否写完)
+      on_error(session, 错误信息)
+    """
+
+    def __init__(self, index, config=None):
+        config = config or {}
+        self.index = index
+        self.name = f'串口{index}'
+        self.settings = dict(DEFAULT_PORT_SETTINGS)
+        for key in DEFAULT_PORT_SETTINGS:
+            if key in config:
+                self.settings[key] = config[key]
+        self.send_history_text = list(config.get('send_history_text', []))
+        self.send_history_hex = list(config.get('send_history_hex', []))
+        self.quick_strings = pad_quick_strings(list(config.get('quick_strings') or
+                                                    default_quick_strings(index)))
+        self.sequence = config.get('sequence', '')  # 命令序列脚本，见parse_sequence()
+        self.triggers = config.get('triggers', '')  # 触发器脚本，见parse_triggers()
+        self.text_assembler = TextAssembler(DEFAULT_ENCODING)
+        try:
+            self.text_assembler.set_encoding(self.settings['recv_encoding'])
+        except LookupError:
+            pass
+        self.serial_port = None
+        self.reader = None
+        self.writer = None
+        self.capture = None
+        self.auto_sender = None
+        self.framer = None
+        self.bridge = None   # 桥接的另一个会话，收到的数据在接收线程中直接转发给它
+        self.redirect = None  # 接管接收数据的回调，见set_redirect()
+        self.metrics = None   # PortMetrics，启用性能统计时设置，见set_metrics()
+        self.observers = ()  # 收发线程的观察者，见PortReader/PortWriter
+        self.hardware_id = None  # 打开时记录的USB硬件ID，重连时用于匹配设备
+        self.port_cache = None   # 返回串口信息列表的函数(如PortWatcher.snapshot)，None时同步枚举
+        self.received_count = 0
+        self.received_total = 0  # 累计接收字节数，界面清除接收计数时不归零，回放据此判断完成
+        self.frame_count = 0
+        self.checksum_errors = 0
+        self.sent_count = 0
+        self.reconnects = 0   # 断线后重连成功的次数
+        self.on_batch = None
+        self.on_written = None
+        self.on_error = None
+        self._threads = []
+
+    @property
+    def is_open(self):
+        return self.serial_port is not None and self.serial_port.is_open
+
+    def open(self, flush_rate=DEFAULT_FLUSH_RATE, batch_bytes=DEFAULT_BATCH_BYTES, serial_port=None):
+        """按当前设置打开串口并启动收发线程，失败时抛出异常
+
+        serial_port为已打开的端口对象(如CapturePort)时直接使用，不再按设置打开串口。
+        """
+        settings = self.settings
+        framer = self.make_framer()
+        if serial_port is None:
+            if settings['auto_reconnect'] and self.hardware_id is None:
+                self.hardware_id = port_hardware_id(settings['port'], self.cached_ports())
+            serial_port = open_serial_port(settings['port'], settings['baud'], settings['data_bits'],
+                                           settings['stop_bits'], settings['parity'],
+                                           settings['read_timeout'])
+        self.serial_port = serial_port
+        self.reader = PortReader(self.serial_port, self._on_batch, READ_MODES[settings['read_mode']],
+                                 settings['min_bytes'], flush_rate, batch_bytes)
+        self.writer = PortWriter(self.serial_port, self._on_written)
+        self.reader.capture = self.writer.capture = self.capture
+        self.reader.framer = self.framer = framer
+        self.reader.observers = self.writer.observers = self.observers
+        self.reader.forward = self.bridge.forward if self.bridge else None
+        self.reader.redirect = self.redirect
+        self.reader.metrics = self.metrics
+        self._threads = [threading.Thread(target=self._read_loop, name=f'{self.name}接收', daemon=True),
+                         threading.Thread(target=self._write_loop, name=f'{self.name}发送', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def open_replay(self, path, speed=1.0, direction=DIRECTION_RX, flush_rate=DEFAULT_FLUSH_RATE,
+                    batch_bytes=DEFAULT_BATCH_BYTES):
+        """以录制文件代替串口启动收发线程，返回CapturePort；分帧、校验和回调与连接串口时相同"""
+        port = CapturePort(path, speed, direction, self.settings['read_timeout'] / 1000)
+        try:
+            self.open(flush_rate, batch_bytes, serial_port=port)
+        except Exception:
+            port.close()
+            raise
+        return port
+
+    @property
+    def replay(self):
+        """正在回放的CapturePort，连接的是串口或未连接时为None"""
+        port = self.serial_port
+        return port if isinstance(port, CapturePort) else None
+
+    def cached_ports(self):
+        """设置了port_cache时返回缓存的串口信息，否则返回None(由调用方同步枚举)"""
+        return self.port_cache() if self.port_cache is not None else None
+
+    def make_framer(self):
+        """按当前设置创建分帧器，不分帧时返回None，参数错误时抛出ValueError"""
+        settings = self.settings
+        bits = char_bits(settings['data_bits'], settings['stop_bits'], settings['parity'])
+        return make_framer(settings['framer'], settings['frame_param'], int(settings['baud']), bits)
+
+    def close(self):
+        """停止自动发送和收发线程并关闭串口，可重复调用"""
+        self.stop_auto_send()
+        if self.reader:
+            self.reader.stop()
+        if self.writer:
+            self.writer.stop()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+        if self.serial_port and self.serial_port.is_open:
+            try:
+                self.serial_port.close()
+            except Exception:
+                # 设备已拔出时关闭可能出错，句柄照样释放
+                pass
+        self.serial_port = None
+        self.reader = None
+        self.writer = None
+
+    def reconnect(self):
+        """断线后重新打开串口，录制继续写入同一个文件；找不到设备或打开失败时抛出异常"""
+        self.close()
+        device = find_port(self.settings['port'], self.hardware_id, self.cached_ports())
+        if device is None:
+            raise serial.SerialException(f"未找到设备 {self.settings['port']}")
+        self.settings['port'] = device
+        self.open()
+        self.reconnects += 1
+
+    def _read_loop(self):
+        try:
+            self.reader.run()
+        except Exception as e:
+            if self.reader.running and self.on_error:
+                self.on_error(self, f"串口读取错误: {str(e)}")
+
+    def _write_loop(self):
+        try:
+            self.writer.run()
+        except Exception as e:
+            if self.writer.running and self.on_error:
+                self.on_error(self, f"串口发送错误: {str(e)}")
+
+    def _on_batch(self, chunks, received):
+        self.received_count += received
+        self.received_total += received
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.on_batch(chunks)
+        if self.framer is not None:
+            self.frame_count += len(chunks)
+            checksum = self.checksum
+            if checksum is not None:
+                verify = checksum.verify
+                self.checksum_errors += sum(1 for _, frame in chunks if not verify(frame))
+        if self.on_batch:
+            self.on_batch(self, chunks)
+
+    def _on_written(self, written, sent_time, tag, finished):
+        self.sent_count += written
+        if self.on_written:
+            self.on_written(self, written, sent_time, tag, finished)
+
+    def send(self, data, tag=None):
+        """放入发送队列，未连接或队列已满时返回False"""
+        if not self.writer:
+            return False
+        if self.writer.send(data, tag):
+            return True
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.send_rejected += 1
+        return False
+
+    @property
+    def pending_bytes(self):
+        return self.writer.pending_bytes if self.writer else 0
+
+    def forward(self, data):
+        """桥接的另一个会话在其接收线程中调用，直接写出到本串口，未连接时丢弃"""
+        writer = self.writer
+        return writer is not None and writer.forward(data)
+
+    def set_redirect(self, handler):
+        """收到的数据只交给handler(数据)，不再回调on_batch显示(None为恢复)，在接收线程中调用"""
+        self.redirect = handler
+        if self.reader:
+            self.reader.redirect = handler
+
+    def set_metrics(self, metrics):
+        """启用(PortMetrics)或关闭(None)性能统计，正在接收时立即生效"""
+        self.metrics = metrics
+        if self.reader:
+            self.reader.metrics = metrics
+
+    def metrics_snapshot(self):
+        """性能统计快照，附带会话的累计计数；未启用时返回None"""
+        metrics = self.metrics
+        if metrics is None:
+            return None
+        record = {'port': self.name, 'device': self.settings['port']}
+        record.update(metrics.snapshot())
+        record.update({
+            'received_total': self.received_count,
+            'sent_total': self.sent_count,
+            'send_pending': self.pending_bytes,
+            'frames_total': self.frame_count,
+            'frame_errors': self.framer.errors if self.framer is not None else 0,
+            'checksum_errors': self.checksum_errors,
+            'capture_dropped': self.capture.dropped if self.capture else 0,
+        })
+        return record
+
+    def set_bridge(self, peer):
+        """把收到的数据转发给peer会话(None为停止转发)，正在接收时立即生效；双向桥接需两边都设置"""
+        self.bridge = peer
+        if self.reader:
+            self.reader.forward = peer.forward if peer else None
+
+    @property
+    def checksum(self):
+        """当前设置的校验算法，不校验时为None"""
+        return CHECKSUMS.get(self.settings['checksum'])
+
+    def encode(self, data, is_hex):
+        """按会话的编码、校验和换行设置编码发送数据，返回(历史记录文本, 发送字节, 显示文本)"""
+        data, send_bytes = encode_send_data(data, is_hex, self.settings['send_encoding'],
+                                            self.settings['auto_newline'], self.checksum)
+        return data, send_bytes, format_sent_data(send_bytes, is_hex, self.settings['recv_encoding'])
+
+    def set_capture(self, capture):
+        """开始或停止(capture为None)录制，收发线程随即写入新的录制文件"""
+        self.capture = capture
+        if self.reader:
+            self.reader.capture = capture
+        if self.writer:
+            self.writer.capture = capture
+
+    def add_observer(self, observer):
+        """添加收发观察者，需实现on_sent(tag, 纳秒)和on_received(数据, 纳秒)"""
+        self._set_observers(self.observers + (observer,))
+
+    def remove_observer(self, observer):
+        self._set_observers(tuple(item for item in self.observers if item is not observer))
+
+    def _set_observers(self, observers):
+        # 整体替换元组，收发线程无需加锁即可遍历
+        self.observers = observers
+        if self.reader:
+            self.reader.observers = observers
+        if self.writer:
+            self.writer.observers = observers
+
+    def start_auto_send(self, data, tag, interval, catch_up=CATCH_UP_SKIP):
+        sender = AutoSender(self.writer, data, tag, interval, catch_up)
+        sender.start()
+        self.auto_sender = sender
+        return sender
+
+    def stop_auto_send(self):
+        """停止自动发送，返回已停止的AutoSender，没有时返回None"""
+        sender = self.auto_sender
+        self.auto_sender = None
+        if sender:
+            sender.stop()
+        return sender
+
+    def add_history(self, data, is_hex=False):
+        """添加到发送历史开头，已存在时移到开头"""
+        history = self.send_history_hex if is_hex else self.send_history_text
+        if data in history:
+            history.remove(data)
+        history.insert(0, data)
+        del history[MAX_SEND_HISTORY:]
+
+    def to_config(self):
+        config = dict(self.settings)
+        config['send_history_text'] = self.send_history_text
+        config['send_history_hex'] = self.send_history_hex
+        config['quick_strings'] = self.quick_strings
+        config['sequence'] = self.sequence
+        config['triggers'] = self.triggers
+        return config
+
+
+def escape_label(value):
+    """OpenMetrics标签值转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# (指标名, 类型, 说明, 取值函数)，计数器在OpenMetrics格式中加_total后缀
+SESSION_METRICS = (
+    ('serial_up', 'gauge', '串口是否已连接', lambda s: int(s.is_open)),
+    ('serial_received_bytes', 'counter', '接收字节数', lambda s: s.received_count),
+    ('serial_sent_bytes', 'counter', '发送字节数', lambda s: s.sent_count),
+    ('serial_frames', 'counter', '分帧得到的帧数', lambda s: s.frame_count),
+    ('serial_frame_errors', 'counter', '分帧错误次数', lambda s: s.framer.errors if s.framer is not None else 0),
+    ('serial_checksum_errors', 'counter', '校验错误的帧数', lambda s: s.checksum_errors),
+    ('serial_reconnects', 'counter', '断线重连成功次数', lambda s: s.reconnects),
+    ('serial_send_queue_bytes', 'gauge', '发送队列中尚未写出的字节数', lambda s: s.pending_bytes),
+    ('serial_capture_bytes', 'counter', '写入录制文件的字节数', lambda s: s.capture.written if s.capture else 0),
+    ('serial_capture_dropped', 'counter', '录制队列已满丢弃的记录数', lambda s: s.capture.dropped if s.capture else 0),
+)
+
+
+def render_metrics(sessions, openmetrics=True):
+    """把会话的计数器和事务/序列的应答延迟直方图渲染为OpenMetrics(或Prometheus 0.0.4)文本
+
+    只读取现有计数，不在收发线程中增加任何开销；延迟来自会话observers中实现了
+    latency_stats()的事务测试和命令序列。
+    """
+    sessions = list(sessions)
+    lines = []
+    for name, kind, help_text, value in SESSION_METRICS:
+        sample = f'{name}_total' if kind == 'counter' else name
+        family = name if openmetrics else sample
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for session in sessions:
+            labels = f'port="{escape_label(session.name)}",device="{escape_label(session.settings["port"])}"'
+            lines.append(f'{sample}{{{labels}}} {value(session)}')
+
+    bounds_ns = [int(bound * 1e9) for bound in METRICS_LATENCY_BUCKETS]
+    latency = []
+    timeouts = []
+    for session in sessions:
+        for observer in session.observers:
+            if not hasattr(observer, 'latency_stats'):
+                continue
+            for request, histogram, timeout_count in observer.latency_stats():
+                labels = f'port="{escape_label(session.name)}",request="{escape_label(request)}"'
+                count, total = histogram.count, histogram.total
+                cumulative = histogram.cumulative(bounds_ns)
+                for bound, bucket in zip(METRICS_LATENCY_BUCKETS, cumulative):
+                    latency.append(f'serial_response_latency_seconds_bucket{{{labels},le="{bound}"}} {bucket}')
+                latency.append(f'serial_response_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                latency.append(f'serial_response_latency_seconds_count{{{labels}}} {count}')
+                latency.append(f'serial_response_latency_seconds_sum{{{labels}}} {total / 1e9}')
+                timeouts.append(f'serial_response_timeouts_total{{{labels}}} {timeout_count}')
+    lines.append('# HELP serial_response_latency_seconds 发送请求到收到应答的时间')
+    lines.append('# TYPE serial_response_latency_seconds histogram')
+    lines.extend(latency)
+    family = 'serial_response_timeouts' if openmetrics else 'serial_response_timeouts_total'
+    lines.append(f'# HELP {family} 等待应答超时次数')
+    lines.append(f'# TYPE {family} counter')
+    lines.extend(timeouts)
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """在后台线程中提供HTTP指标接口(GET /metrics)，供Prometheus等集中采集
+
+    sessions()在每次请求时于HTTP线程中调用，返回要导出的会话列表。
+    请求头Accept包含application/openmetrics-text时返回OpenMetrics格式，否则返回Prometheus文本格式。
+    只在被采集时读取计数，持续录制时也可以一直开启。
+    """
+
+    def __init__(self, sessions, port=DEFAULT_METRICS_PORT, host='127.0.0.1'):
+        self.sessions = sessions
+        self.scrapes = 0
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                body = render_metrics(exporter.sessions(), openmetrics).encode('utf-8')
+                exporter.scrapes += 1
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不向终端输出访问日志
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='指标接口', daemon=True)
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        if self._thread.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
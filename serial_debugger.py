@@ -6,17 +6,30 @@
 构建时间: 2024-12-19 15:30:00
 """
 
-import sys
 import os
-import json
 import re
+import sys
+import json
 import time
+import threading
+from collections import deque
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import serial
-import serial.tools.list_ports
+from serial_core import (READ_MODES, DEFAULT_READ_TIMEOUT_MS, DEFAULT_MIN_BYTES, DEFAULT_FLUSH_RATE,
+                         DEFAULT_LOG_MAX_LINES, DEFAULT_CAPTURE_ROTATE_BYTES, DEFAULT_TRANSACTION_TIMEOUT,
+                         DEFAULT_CAPTURE_ROTATE_SECONDS, LogBuffer, CaptureWriter,
+                         LINE_FLUSH_TIMEOUT_MS, CATCH_UP_POLICIES, format_hex, format_hexdump,
+                         load_config, save_config, parse_sscom_quick_strings,
+                         config_port_sections, PortSession, Backoff, PortWatcher,
+                         FRAMERS, FRAMER_PARAM_HINTS, decode_frame, CHECKSUMS, CHECKSUM_NONE,
+                         TransactionRunner, export_transaction_stats,
+                         SEQUENCE_HELP, parse_sequence, sequence_from_quick_strings, SequenceRunner,
+                         DEFAULT_FILE_CHUNK_SIZE, DEFAULT_FILE_WAIT_TIMEOUT, FileSender,
+                         MODEM_PROTOCOLS, ModemSender, REPLAY_SPEEDS, DIRECTION_RX, DIRECTION_TX,
+                         PortMetrics, METRICS_INTERVAL, MetricsExporter, DEFAULT_METRICS_PORT,
+                         TRIGGER_HELP, parse_triggers, TriggerEngine)
 
 # 导入版本信息
 try:
@@ -26,1434 +39,1082 @@ except ImportError:
     VERSION = "1.0.0"
     BUILD_TIME = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-CONFIG_FILE = 'serial_debugger_config.json'
+LOG_LINE_WIDTH = 200  # 日志单行最大字符数，超出部分折到下一行
+AUTO_SEND_LOG_MIN_INTERVAL = 100  # 自动发送间隔小于此值(ms)时不逐条显示发送内容
+DEFAULT_PORT_COUNT = 2  # 没有配置时创建的串口标签页数
+MAX_PORT_COUNT = 32     # 最多同时打开的串口标签页数
+BAUD_RATES = ['9600', '19200', '38400', '57600', '115200', '230400', '460800', '921600']
+ENCODINGS = ['UTF-8', 'GBK', 'GB2312', 'BIG5', 'ISO-8859-1', 'ASCII']
+FILE_PROTOCOL_RAW = '原始数据'  # 发送文件窗口中不使用传输协议
+REPLAY_MAX_BACKLOG = 16  # 界面线程待处理事件超过此数时暂停回放，尽快回放时不会积压
 
-class SerialThread(QThread):
-    """串口数据接收线程"""
-    data_received = pyqtSignal(bytes)
-    error_occurred = pyqtSignal(str)
+class UiDispatcher(QObject):
+    """收发线程向界面线程投递事件的共用通道
     
-    def __init__(self, serial_port):
-        super().__init__()
-        self.serial_port = serial_port
-        self.running = True
-        
-    def run(self):
-        while self.running and self.serial_port.is_open:
-            try:
-                if self.serial_port.in_waiting:
-                    data = self.serial_port.read(self.serial_port.in_waiting)
-                    if data:
-                        # 发送接收到的原始字节数据
-                        self.data_received.emit(data)
-                time.sleep(0.01)  # 10ms延时
-            except Exception as e:
-                self.error_occurred.emit(f"串口读取错误: {str(e)}")
-                break
-                
-    def stop(self):
-        self.running = False
+    所有串口的接收、写出和错误事件放入同一个队列，界面线程每秒最多处理rate次，
+    每次取出全部事件一起处理，界面刷新次数不随串口数量增加。
+    """
+    wake = pyqtSignal()
+    
+    def __init__(self, handler, rate=DEFAULT_FLUSH_RATE, parent=None):
+        super().__init__(parent)
+        self.handler = handler  # handler([(类型, 标签页, 数据), ...])
+        self.interval = 1.0 / rate
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.pending = False
+        self.last_drain = 0.0
+        self.drains = 0         # 界面线程处理次数
+        self.busy_time = 0.0    # 界面线程处理事件的累计耗时(秒)
+        self.handled = 0        # 累计处理的事件数
+        self.max_depth = 0      # 一次处理的最多事件数，由统计面板读取后清零
+        self.wake.connect(self.schedule, Qt.QueuedConnection)
+    
+    def post(self, event):
+        """投递事件，可在任意线程调用；队列为空时才唤醒界面线程"""
+        with self.lock:
+            self.events.append(event)
+            if self.pending:
+                return
+            self.pending = True
+        self.wake.emit()
+    
+    def schedule(self):
+        delay = self.last_drain + self.interval - time.monotonic()
+        QTimer.singleShot(max(0, int(delay * 1000)), self.drain)
+    
+    def drain(self):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            self.pending = False
+        start = time.monotonic()
+        self.last_drain = start
+        self.handled += len(events)
+        if len(events) > self.max_depth:
+            self.max_depth = len(events)
+        self.handler(events)
+        self.busy_time += time.monotonic() - start
+        self.drains += 1
 
-class SerialDebugger(QWidget):
-    def __init__(self):
+
+class LogModel(QAbstractListModel):
+    """程序日志数据模型，数据保存在环形缓冲中，视图只绘制可见行"""
+    COLORS = {'red': QColor('red'), 'green': QColor('green'), 'blue': QColor('blue'), 'trigger': QColor('darkRed')}
+    BACKGROUNDS = {'trigger': QColor('yellow')}  # 触发器高亮
+    
+    def __init__(self, max_lines=DEFAULT_LOG_MAX_LINES, parent=None):
+        super().__init__(parent)
+        self.buffer = LogBuffer(max_lines)
+        self.dropped = 0  # 超出上限被丢弃的行数
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.buffer)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text, color = self.buffer[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == Qt.ForegroundRole:
+            return self.COLORS.get(color)
+        if role == Qt.BackgroundRole:
+            return self.BACKGROUNDS.get(color)
+        return None
+    
+    def append_lines(self, lines):
+        """追加多行[(文本, 颜色), ...]，超出上限时丢弃最早的行"""
+        if len(lines) > self.buffer.max_lines:
+            self.dropped += len(lines) - self.buffer.max_lines
+            lines = lines[-self.buffer.max_lines:]
+        if not lines:
+            return
+        drop = self.buffer.overflow(lines)
+        if drop:
+            self.dropped += drop
+            self.beginRemoveRows(QModelIndex(), 0, drop - 1)
+            self.buffer.drop_front(drop)
+            self.endRemoveRows()
+        first = len(self.buffer)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.buffer.extend(lines)
+        self.endInsertRows()
+    
+    def clear(self):
+        self.beginResetModel()
+        self.buffer.clear()
+        self.endResetModel()
+    
+    def set_max_lines(self, max_lines):
+        self.beginResetModel()
+        self.buffer.set_max_lines(max_lines)
+        self.endResetModel()
+
+class PortTab(QWidget):
+    """单个串口的标签页，界面上的设置与PortSession.settings同步"""
+    
+    def __init__(self, session, debugger):
         super().__init__()
-        # 串口1
-        self.serial_port1 = None
-        self.serial_thread1 = None
-        self.received_count1 = 0
-        self.sent_count1 = 0
-        
-        # 串口2
-        self.serial_port2 = None
-        self.serial_thread2 = None
-        self.received_count2 = 0
-        self.sent_count2 = 0
-        
-        # 自动发送定时器
-        self.auto_send_timer1 = None
-        self.auto_send_timer2 = None
-        
-        # 记忆自动换行状态
-        self.newline_state1 = True  # 默认启用
-        self.newline_state2 = True  # 默认启用
-        
-        # 发送历史记录
-        self.send_history1_text = []    # 串口1文本发送历史
-        self.send_history1_hex = []     # 串口1十六进制发送历史
-        self.send_history2_text = []    # 串口2文本发送历史
-        self.send_history2_hex = []     # 串口2十六进制发送历史
-        self.max_history = 20           # 最大历史记录数量
-        
-        # 多条字符串功能
-        self.quick_strings1 = []  # 串口1快速字符串
-        self.quick_strings2 = []  # 串口2快速字符串
-        
-        # 初始化40个空词条
-        for i in range(40):
-            self.quick_strings1.append({"label": f"字符串{i+1}", "content": "", "hex": False})
-            self.quick_strings2.append({"label": f"字符串{i+1}", "content": "", "hex": False})
-        
-        # 设置一些默认词条
-        if len(self.quick_strings1) >= 4:
-            self.quick_strings1[0] = {"label": "字符串1", "content": "Hello", "hex": False}
-            self.quick_strings1[1] = {"label": "字符串2", "content": "World", "hex": False}
-            self.quick_strings1[2] = {"label": "字符串3", "content": "48 65 6C 6C 6F", "hex": True}
-            self.quick_strings1[3] = {"label": "字符串4", "content": "57 6F 72 6C 64", "hex": True}
-        
-        if len(self.quick_strings2) >= 4:
-            self.quick_strings2[0] = {"label": "字符串1", "content": "Test1", "hex": False}
-            self.quick_strings2[1] = {"label": "字符串2", "content": "Test2", "hex": False}
-            self.quick_strings2[2] = {"label": "字符串3", "content": "AA BB CC", "hex": True}
-            self.quick_strings2[3] = {"label": "字符串4", "content": "DD EE FF", "hex": True}
-        
-        self.quick_string_buttons1 = []        # 串口1快速发送按钮
-        self.quick_string_buttons2 = []        # 串口2快速发送按钮
+        self.session = session
+        self.debugger = debugger
+        self.quick_string_buttons = []  # 快速发送按钮
+        self.newline_state = True       # 记忆自动换行状态，默认启用
+        
+        # 收发线程的回调经共用通道转到界面线程批量处理
+        dispatcher = debugger.dispatcher
+        session.on_batch = lambda s, chunks: dispatcher.post(('received', self, chunks))
+        session.on_written = lambda s, *written: dispatcher.post(('written', self, written))
+        session.on_error = lambda s, message: dispatcher.post(('error', self, message))
+        
+        # 不完整的行等待后续数据，超时后直接显示
+        self.line_flush_timer = QTimer(self)
+        self.line_flush_timer.setSingleShot(True)
+        self.line_flush_timer.timeout.connect(self.flush_partial_line)
+        self.transaction_dialog = None
+        self.sequence_dialog = None
+        self.file_send_dialog = None
+        self.replay_dialog = None
+        self.trigger_dialog = None
+        
+        # 断线重连：按指数退避定时重新打开串口
+        self.backoff = Backoff()
+        self.reconnecting = False
+        self.resume_sender = None  # 断线前的自动发送参数，重连后恢复
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.attempt_reconnect)
         
         self.init_ui()
-        self.scan_ports()
-        self.load_config()
-        
-        # 显示版本信息
-        self.log_message(f"双串口调试器 v{VERSION} 启动成功", color='blue')
-        self.log_message(f"构建时间: {BUILD_TIME}", color='blue')
-        self.log_message(f"作者: logicsoft@qq.com", color='blue')
-        self.log_message("支持从SSCOM.ini文件导入词条配置", color='blue')
-        
+        self.load_settings()
+    
+    @property
+    def name(self):
+        return self.session.name
+    
+    def log_message(self, message, color='black'):
+        self.debugger.log_message(message, color)
+    
+    def log_messages(self, messages, color='black'):
+        self.debugger.log_messages(messages, color)
+    
     def init_ui(self):
-        """初始化用户界面"""
-        # 设置窗口标题
-        self.setWindowTitle(f'双串口调试器 v{VERSION} - {BUILD_TIME} - logicsoft@qq.com')
-        self.setGeometry(100, 100, 1200, 800)
-        
-        # 主布局
-        main_layout = QVBoxLayout()
-        
-        # 创建两个串口的标签页
-        tab_widget = QTabWidget()
+        """初始化标签页界面"""
+        tab_layout = QVBoxLayout()
+        name = self.name
         
-        # 串口1标签页
-        tab1 = QWidget()
-        tab1_layout = QVBoxLayout()
-        
-        # 串口1设置组
-        serial_group1 = QGroupBox('串口1设置')
-        serial_layout1 = QGridLayout()
+        # 串口设置组
+        serial_group = QGroupBox(f'{name}设置')
+        serial_layout = QGridLayout()
         
         # 串口选择
-        serial_layout1.addWidget(QLabel('串口:'), 0, 0)
-        self.combo_port1 = QComboBox()
-        self.combo_port1.setMinimumWidth(150)
-        serial_layout1.addWidget(self.combo_port1, 0, 1)
+        serial_layout.addWidget(QLabel('串口:'), 0, 0)
+        self.combo_port = QComboBox()
+        self.combo_port.setMinimumWidth(150)
+        serial_layout.addWidget(self.combo_port, 0, 1)
         
         # 刷新串口按钮
-        self.btn_refresh1 = QPushButton('刷新串口')
-        self.btn_refresh1.clicked.connect(self.scan_ports)
-        serial_layout1.addWidget(self.btn_refresh1, 0, 2)
+        self.btn_refresh = QPushButton('刷新串口')
+        self.btn_refresh.clicked.connect(self.debugger.scan_ports)
+        serial_layout.addWidget(self.btn_refresh, 0, 2)
         
         # 连接按钮（与刷新按钮同一行）
-        self.btn_connect1 = QPushButton('连接')
-        self.btn_connect1.clicked.connect(lambda: self.toggle_connection(1))
-        serial_layout1.addWidget(self.btn_connect1, 0, 3)
+        self.btn_connect = QPushButton('连接')
+        self.btn_connect.clicked.connect(self.toggle_connection)
+        serial_layout.addWidget(self.btn_connect, 0, 3)
         
         # 导入SSCOM配置按钮
-        self.btn_import_sscom1 = QPushButton('导入词条')
-        self.btn_import_sscom1.clicked.connect(lambda: self.import_sscom_config(1))
-        self.btn_import_sscom1.setMaximumWidth(80)
-        self.btn_import_sscom1.setToolTip('从SSCOM.ini文件导入词条配置')
-        serial_layout1.addWidget(self.btn_import_sscom1, 0, 4)
+        self.btn_import_sscom = QPushButton('导入词条')
+        self.btn_import_sscom.clicked.connect(self.import_sscom_config)
+        self.btn_import_sscom.setMaximumWidth(80)
+        self.btn_import_sscom.setToolTip('从SSCOM.ini文件导入词条配置')
+        serial_layout.addWidget(self.btn_import_sscom, 0, 4)
         
         # 波特率
-        serial_layout1.addWidget(QLabel('波特率:'), 0, 5)
-        self.combo_baud1 = QComboBox()
-        self.combo_baud1.addItems(['9600', '19200', '38400', '57600', '115200', '230400', '460800', '921600'])
-        self.combo_baud1.setCurrentText('115200')
-        serial_layout1.addWidget(self.combo_baud1, 0, 6)
+        serial_layout.addWidget(QLabel('波特率:'), 0, 5)
+        self.combo_baud = QComboBox()
+        self.combo_baud.addItems(BAUD_RATES)
+        self.combo_baud.setCurrentText('115200')
+        serial_layout.addWidget(self.combo_baud, 0, 6)
         
         # 数据位
-        serial_layout1.addWidget(QLabel('数据位:'), 1, 0)
-        self.combo_data1 = QComboBox()
-        self.combo_data1.addItems(['5', '6', '7', '8'])
-        self.combo_data1.setCurrentText('8')
-        serial_layout1.addWidget(self.combo_data1, 1, 1)
+        serial_layout.addWidget(QLabel('数据位:'), 1, 0)
+        self.combo_data = QComboBox()
+        self.combo_data.addItems(['5', '6', '7', '8'])
+        self.combo_data.setCurrentText('8')
+        serial_layout.addWidget(self.combo_data, 1, 1)
         
         # 停止位
-        serial_layout1.addWidget(QLabel('停止位:'), 1, 2)
-        self.combo_stop1 = QComboBox()
-        self.combo_stop1.addItems(['1', '1.5', '2'])
-        self.combo_stop1.setCurrentText('1')
-        serial_layout1.addWidget(self.combo_stop1, 1, 3)
+        serial_layout.addWidget(QLabel('停止位:'), 1, 2)
+        self.combo_stop = QComboBox()
+        self.combo_stop.addItems(['1', '1.5', '2'])
+        self.combo_stop.setCurrentText('1')
+        serial_layout.addWidget(self.combo_stop, 1, 3)
         
         # 校验位
-        serial_layout1.addWidget(QLabel('校验位:'), 1, 4)
-        self.combo_parity1 = QComboBox()
-        self.combo_parity1.addItems(['无', '奇校验', '偶校验'])
-        self.combo_parity1.setCurrentText('无')
-        serial_layout1.addWidget(self.combo_parity1, 1, 5)
-        
-        serial_group1.setLayout(serial_layout1)
-        tab1_layout.addWidget(serial_group1)
-        
-        # 串口1发送组
-        send_group1 = QGroupBox('串口1发送')
-        send_layout1 = QVBoxLayout()
+        serial_layout.addWidget(QLabel('校验位:'), 1, 4)
+        self.combo_parity = QComboBox()
+        self.combo_parity.addItems(['无', '奇校验', '偶校验'])
+        self.combo_parity.setCurrentText('无')
+        serial_layout.addWidget(self.combo_parity, 1, 5)
+        
+        # 读取模式：阻塞模式首字节即唤醒，轮询模式每10ms查询一次
+        serial_layout.addWidget(QLabel('读取模式:'), 2, 0)
+        self.combo_read_mode = QComboBox()
+        self.combo_read_mode.addItems(list(READ_MODES.keys()))
+        self.combo_read_mode.setCurrentText('阻塞')
+        self.combo_read_mode.setToolTip('阻塞: 数据到达立即唤醒，空闲时不占用CPU\n轮询: 每10ms查询一次接收缓冲')
+        serial_layout.addWidget(self.combo_read_mode, 2, 1)
+        
+        # 读超时
+        serial_layout.addWidget(QLabel('读超时(ms):'), 2, 2)
+        self.spin_read_timeout = QSpinBox()
+        self.spin_read_timeout.setRange(1, 5000)
+        self.spin_read_timeout.setValue(DEFAULT_READ_TIMEOUT_MS)
+        self.spin_read_timeout.setToolTip('阻塞模式下凑齐最小字节数的最长等待时间')
+        serial_layout.addWidget(self.spin_read_timeout, 2, 3)
+        
+        # 最小字节数
+        serial_layout.addWidget(QLabel('最小字节:'), 2, 4)
+        self.spin_min_bytes = QSpinBox()
+        self.spin_min_bytes.setRange(1, 4096)
+        self.spin_min_bytes.setValue(DEFAULT_MIN_BYTES)
+        self.spin_min_bytes.setToolTip('阻塞模式下一次唤醒至少等待的字节数，越大CPU占用越低、延迟越高')
+        serial_layout.addWidget(self.spin_min_bytes, 2, 5)
+        
+        # 断线重连
+        self.check_reconnect = QCheckBox('断线重连')
+        self.check_reconnect.setToolTip('读写出错时只断开本串口，并按0.5、1、2……秒(最长30秒)的间隔重新打开\n'
+                                        'USB串口按VID/PID/序列号匹配，重新枚举到其他端口号也能找到')
+        self.check_reconnect.toggled.connect(self.sync_settings)
+        serial_layout.addWidget(self.check_reconnect, 2, 6)
+        
+        # 分帧：接收线程按协议把数据流切成完整的帧，显示和统计按帧进行
+        serial_layout.addWidget(QLabel('分帧:'), 3, 0)
+        self.combo_framer = QComboBox()
+        self.combo_framer.addItems(list(FRAMERS.keys()))
+        self.combo_framer.setToolTip('不分帧: 按每次读到的数据显示，文本按行拼接\n'
+                                     '分隔符/定长/长度字段/SLIP/COBS: 按协议结构切分\n'
+                                     '空闲间隔: 字节间空闲超时即一帧结束，如Modbus RTU')
+        self.combo_framer.currentTextChanged.connect(self.on_framer_changed)
+        serial_layout.addWidget(self.combo_framer, 3, 1)
+        
+        serial_layout.addWidget(QLabel('分帧参数:'), 3, 2)
+        self.edit_frame_param = QLineEdit()
+        serial_layout.addWidget(self.edit_frame_param, 3, 3, 1, 4)
+        self.on_framer_changed(self.combo_framer.currentText())
+        
+        serial_group.setLayout(serial_layout)
+        tab_layout.addWidget(serial_group)
+        
+        # 发送组
+        send_group = QGroupBox(f'{name}发送')
+        send_layout = QVBoxLayout()
         
         # 发送输入
-        send_input_layout1 = QHBoxLayout()
-        send_input_layout1.addWidget(QLabel('发送数据:'))
-        self.edit_send1 = QLineEdit()
-        self.edit_send1.setPlaceholderText('输入要发送的数据')
-        send_input_layout1.addWidget(self.edit_send1)
+        send_input_layout = QHBoxLayout()
+        send_input_layout.addWidget(QLabel('发送数据:'))
+        self.edit_send = QLineEdit()
+        self.edit_send.setPlaceholderText('输入要发送的数据')
+        self.edit_send.textChanged.connect(self.refresh_auto_send_data)
+        send_input_layout.addWidget(self.edit_send)
         
         # 添加历史记录下拉框
-        self.combo_history1 = QComboBox()
-        self.combo_history1.setMaximumWidth(150)
-        self.combo_history1.setEditable(False)
-        self.combo_history1.setToolTip('发送历史记录')
-        self.combo_history1.currentTextChanged.connect(lambda text: self.on_history_selected(text, 1))
-        send_input_layout1.addWidget(self.combo_history1)
+        self.combo_history = QComboBox()
+        self.combo_history.setMaximumWidth(150)
+        self.combo_history.setEditable(False)
+        self.combo_history.setToolTip('发送历史记录')
+        self.combo_history.currentTextChanged.connect(self.on_history_selected)
+        send_input_layout.addWidget(self.combo_history)
         
         # 发送选项
-        self.check_hex_send1 = QCheckBox('十六进制发送')
-        self.check_hex_send1.toggled.connect(self.on_hex_send_toggled)
-        send_input_layout1.addWidget(self.check_hex_send1)
+        self.check_hex_send = QCheckBox('十六进制发送')
+        self.check_hex_send.toggled.connect(self.on_hex_send_toggled)
+        send_input_layout.addWidget(self.check_hex_send)
         
-        self.check_newline1 = QCheckBox('自动换行')
-        self.check_newline1.setChecked(True)
-        send_input_layout1.addWidget(self.check_newline1)
+        self.check_newline = QCheckBox('自动换行')
+        self.check_newline.setChecked(True)
+        send_input_layout.addWidget(self.check_newline)
         
         # 添加发送编码选择
-        send_input_layout1.addWidget(QLabel('编码:'))
-        self.combo_send_encoding1 = QComboBox()
-        self.combo_send_encoding1.addItems(['UTF-8', 'GBK', 'GB2312', 'BIG5', 'ISO-8859-1', 'ASCII'])
-        self.combo_send_encoding1.setCurrentText('UTF-8')
-        self.combo_send_encoding1.setMaximumWidth(100)
-        send_input_layout1.addWidget(self.combo_send_encoding1)
+        send_input_layout.addWidget(QLabel('编码:'))
+        self.combo_send_encoding = QComboBox()
+        self.combo_send_encoding.addItems(ENCODINGS)
+        self.combo_send_encoding.setCurrentText('UTF-8')
+        self.combo_send_encoding.setMaximumWidth(100)
+        send_input_layout.addWidget(self.combo_send_encoding)
+        
+        # 校验：发送时自动追加校验值，分帧接收时验证每帧末尾的校验值
+        send_input_layout.addWidget(QLabel('校验:'))
+        self.combo_checksum = QComboBox()
+        self.combo_checksum.addItems([CHECKSUM_NONE] + list(CHECKSUMS.keys()))
+        self.combo_checksum.setToolTip('发送时在数据末尾(换行符之前)追加校验值，CRC16-Modbus低字节在前\n'
+                                       '设置了分帧时验证接收到的每帧，校验错误的帧标红')
+        self.combo_checksum.currentTextChanged.connect(self.sync_settings)
+        self.combo_checksum.currentTextChanged.connect(self.refresh_auto_send_data)
+        send_input_layout.addWidget(self.combo_checksum)
         
         # 发送按钮
-        self.btn_send1 = QPushButton('发送')
-        self.btn_send1.clicked.connect(lambda: self.send_data(1))
-        send_input_layout1.addWidget(self.btn_send1)
-        
-        send_layout1.addLayout(send_input_layout1)
-        
-        # 自动发送
-        auto_send_layout1 = QHBoxLayout()
-        auto_send_layout1.addWidget(QLabel('自动发送间隔(ms):'))
-        self.spin_interval1 = QSpinBox()
-        self.spin_interval1.setRange(100, 10000)
-        self.spin_interval1.setValue(1000)
-        auto_send_layout1.addWidget(self.spin_interval1)
-        
-        self.check_auto_send1 = QCheckBox('启用自动发送')
-        auto_send_layout1.addWidget(self.check_auto_send1)
-        self.check_auto_send1.toggled.connect(lambda enabled: self.toggle_auto_send(enabled, 1))
-        
-        send_layout1.addLayout(auto_send_layout1)
-        
-        # 快速字符串按钮组
-        quick_strings_group1 = QGroupBox('快速字符串')
-        quick_strings_layout1 = QVBoxLayout()  # 改为垂直布局
-        
-        # 第一行按钮
-        quick_strings_row1 = QHBoxLayout()
-        for i in range(20):
-            btn = QPushButton(f'字符串{i+1}')
-            btn.setMaximumWidth(80)
-            btn.clicked.connect(lambda checked, idx=i, port=1: self.quick_send_string(idx, port))
-            # 添加右键菜单
-            btn.setContextMenuPolicy(Qt.CustomContextMenu)
-            btn.customContextMenuRequested.connect(lambda pos, idx=i, port=1: self.show_quick_string_menu(pos, idx, port))
-            self.quick_string_buttons1.append(btn)
-            quick_strings_row1.addWidget(btn)
-        
-        quick_strings_row1.addStretch()
-        quick_strings_layout1.addLayout(quick_strings_row1)
-        
-        # 第二行按钮
-        quick_strings_row2 = QHBoxLayout()
-        for i in range(20, 40):
-            btn = QPushButton(f'字符串{i+1}')
-            btn.setMaximumWidth(80)
-            btn.clicked.connect(lambda checked, idx=i, port=1: self.quick_send_string(idx, port))
-            # 添加右键菜单
-            btn.setContextMenuPolicy(Qt.CustomContextMenu)
-            btn.customContextMenuRequested.connect(lambda pos, idx=i, port=1: self.show_quick_string_menu(pos, idx, port))
-            self.quick_string_buttons1.append(btn)
-            quick_strings_row2.addWidget(btn)
-        
-        quick_strings_row2.addStretch()
-        quick_strings_layout1.addLayout(quick_strings_row2)
-        
-        quick_strings_group1.setLayout(quick_strings_layout1)
-        send_layout1.addWidget(quick_strings_group1)
-        
-        send_group1.setLayout(send_layout1)
-        tab1_layout.addWidget(send_group1)
-        
-        # 串口1接收组
-        receive_group1 = QGroupBox('串口1接收')
-        receive_layout1 = QVBoxLayout()
-        
-        # 接收控制按钮
-        receive_control_layout1 = QHBoxLayout()
-        self.btn_clear1 = QPushButton('清除接收')
-        self.btn_clear1.clicked.connect(lambda: self.clear_receive(1))
-        receive_control_layout1.addWidget(self.btn_clear1)
-        
-        self.check_hex_display1 = QCheckBox('十六进制显示')
-        self.check_hex_display1.toggled.connect(lambda: self.update_display_format(1))
-        receive_control_layout1.addWidget(self.check_hex_display1)
-        
-        # 添加编码选择
-        receive_control_layout1.addWidget(QLabel('编码:'))
-        self.combo_encoding1 = QComboBox()
-        self.combo_encoding1.addItems(['UTF-8', 'GBK', 'GB2312', 'BIG5', 'ISO-8859-1', 'ASCII'])
-        self.combo_encoding1.setCurrentText('UTF-8')
-        self.combo_encoding1.setMaximumWidth(100)
-        receive_control_layout1.addWidget(self.combo_encoding1)
-        
-        self.check_show_time1 = QCheckBox('显示时间戳')
-        self.check_show_time1.setChecked(True)
-        receive_control_layout1.addWidget(self.check_show_time1)
-        
-        self.check_auto_scroll1 = QCheckBox('自动滚动')
-        self.check_auto_scroll1.setChecked(True)
-        receive_control_layout1.addWidget(self.check_auto_scroll1)
-        
-        receive_layout1.addLayout(receive_control_layout1)
-        
-        # 接收数据显示
-        self.text_receive1 = QTextEdit()
-        self.text_receive1.setReadOnly(True)
-        self.text_receive1.setFont(QFont('Consolas', 10))
-        receive_layout1.addWidget(self.text_receive1)
+        self.btn_send = QPushButton('发送')
+        self.btn_send.clicked.connect(self.send_data)
+        send_input_layout.addWidget(self.btn_send)
         
-        # 统计信息
-        stats_layout1 = QHBoxLayout()
-        self.label_received1 = QLabel('接收: 0 字节')
-        stats_layout1.addWidget(self.label_received1)
-        self.label_sent1 = QLabel('发送: 0 字节')
-        stats_layout1.addWidget(self.label_sent1)
-        stats_layout1.addStretch()
-        
-        receive_layout1.addLayout(stats_layout1)
-        receive_group1.setLayout(receive_layout1)
-        tab1_layout.addWidget(receive_group1)
-        
-        tab1.setLayout(tab1_layout)
-        tab_widget.addTab(tab1, "串口1")
-        
-        # 串口2标签页
-        tab2 = QWidget()
-        tab2_layout = QVBoxLayout()
-        
-        # 串口2设置组
-        serial_group2 = QGroupBox('串口2设置')
-        serial_layout2 = QGridLayout()
-        
-        # 串口选择
-        serial_layout2.addWidget(QLabel('串口:'), 0, 0)
-        self.combo_port2 = QComboBox()
-        self.combo_port2.setMinimumWidth(150)
-        serial_layout2.addWidget(self.combo_port2, 0, 1)
-        
-        # 刷新串口按钮
-        self.btn_refresh2 = QPushButton('刷新串口')
-        self.btn_refresh2.clicked.connect(self.scan_ports)
-        serial_layout2.addWidget(self.btn_refresh2, 0, 2)
-        
-        # 连接按钮（与刷新按钮同一行）
-        self.btn_connect2 = QPushButton('连接')
-        self.btn_connect2.clicked.connect(lambda: self.toggle_connection(2))
-        serial_layout2.addWidget(self.btn_connect2, 0, 3)
-        
-        # 导入SSCOM配置按钮
-        self.btn_import_sscom2 = QPushButton('导入词条')
-        self.btn_import_sscom2.clicked.connect(lambda: self.import_sscom_config(2))
-        self.btn_import_sscom2.setMaximumWidth(80)
-        self.btn_import_sscom2.setToolTip('从SSCOM.ini文件导入词条配置')
-        serial_layout2.addWidget(self.btn_import_sscom2, 0, 4)
-        
-        # 波特率
-        serial_layout2.addWidget(QLabel('波特率:'), 0, 5)
-        self.combo_baud2 = QComboBox()
-        self.combo_baud2.addItems(['9600', '19200', '38400', '57600', '115200', '230400', '460800', '921600'])
-        self.combo_baud2.setCurrentText('115200')
-        serial_layout2.addWidget(self.combo_baud2, 0, 6)
-        
-        # 数据位
-        serial_layout2.addWidget(QLabel('数据位:'), 1, 0)
-        self.combo_data2 = QComboBox()
-        self.combo_data2.addItems(['5', '6', '7', '8'])
-        self.combo_data2.setCurrentText('8')
-        serial_layout2.addWidget(self.combo_data2, 1, 1)
-        
-        # 停止位
-        serial_layout2.addWidget(QLabel('停止位:'), 1, 2)
-        self.combo_stop2 = QComboBox()
-        self.combo_stop2.addItems(['1', '1.5', '2'])
-        self.combo_stop2.setCurrentText('1')
-        serial_layout2.addWidget(self.combo_stop2, 1, 3)
-        
-        # 校验位
-        serial_layout2.addWidget(QLabel('校验位:'), 1, 4)
-        self.combo_parity2 = QComboBox()
-        self.combo_parity2.addItems(['无', '奇校验', '偶校验'])
-        self.combo_parity2.setCurrentText('无')
-        serial_layout2.addWidget(self.combo_parity2, 1, 5)
-        
-        serial_group2.setLayout(serial_layout2)
-        tab2_layout.addWidget(serial_group2)
-        
-        # 串口2发送组
-        send_group2 = QGroupBox('串口2发送')
-        send_layout2 = QVBoxLayout()
-        
-        # 发送输入
-        send_input_layout2 = QHBoxLayout()
-        send_input_layout2.addWidget(QLabel('发送数据:'))
-        self.edit_send2 = QLineEdit()
-        self.edit_send2.setPlaceholderText('输入要发送的数据')
-        send_input_layout2.addWidget(self.edit_send2)
-        
-        # 添加历史记录下拉框
-        self.combo_history2 = QComboBox()
-        self.combo_history2.setMaximumWidth(150)
-        self.combo_history2.setEditable(False)
-        self.combo_history2.setToolTip('发送历史记录')
-        self.combo_history2.currentTextChanged.connect(lambda text: self.on_history_selected(text, 2))
-        send_input_layout2.addWidget(self.combo_history2)
-        
-        # 发送选项
-        self.check_hex_send2 = QCheckBox('十六进制发送')
-        self.check_hex_send2.toggled.connect(self.on_hex_send_toggled)
-        send_input_layout2.addWidget(self.check_hex_send2)
+        # 发送文件：固件、十六进制文本或大文本文件，分块流式发送
+        self.btn_send_file = QPushButton('发送文件')
+        self.btn_send_file.setToolTip('按块从磁盘流式发送文件，可设置块大小、块间延时、等待应答或CTS')
+        self.btn_send_file.clicked.connect(self.show_file_send_dialog)
+        send_input_layout.addWidget(self.btn_send_file)
         
-        self.check_newline2 = QCheckBox('自动换行')
-        self.check_newline2.setChecked(True)
-        send_input_layout2.addWidget(self.check_newline2)
+        send_layout.addLayout(send_input_layout)
         
-        # 添加发送编码选择
-        send_input_layout2.addWidget(QLabel('编码:'))
-        self.combo_send_encoding2 = QComboBox()
-        self.combo_send_encoding2.addItems(['UTF-8', 'GBK', 'GB2312', 'BIG5', 'ISO-8859-1', 'ASCII'])
-        self.combo_send_encoding2.setCurrentText('UTF-8')
-        self.combo_send_encoding2.setMaximumWidth(100)
-        send_input_layout2.addWidget(self.combo_send_encoding2)
+        # 自动发送
+        auto_send_layout = QHBoxLayout()
+        auto_send_layout.addWidget(QLabel('自动发送间隔(ms):'))
+        self.spin_interval = QSpinBox()
+        self.spin_interval.setRange(1, 60000)
+        self.spin_interval.setValue(1000)
+        auto_send_layout.addWidget(self.spin_interval)
+        
+        auto_send_layout.addWidget(QLabel('落后处理:'))
+        self.combo_catch_up = QComboBox()
+        self.combo_catch_up.addItems(list(CATCH_UP_POLICIES.keys()))
+        self.combo_catch_up.setToolTip('跳过: 错过的周期不再发送，保持原有节拍\n补发: 立即补发错过的周期')
+        auto_send_layout.addWidget(self.combo_catch_up)
+        
+        self.check_auto_send = QCheckBox('启用自动发送')
+        auto_send_layout.addWidget(self.check_auto_send)
+        self.check_auto_send.toggled.connect(self.toggle_auto_send)
+        
+        # 请求/应答事务测试
+        self.btn_transaction = QPushButton('事务测试')
+        self.btn_transaction.setToolTip('重复发送请求并等待应答，统计往返延迟的p50/p99/最大值')
+        self.btn_transaction.clicked.connect(self.show_transaction_dialog)
+        auto_send_layout.addWidget(self.btn_transaction)
+        self.btn_sequence = QPushButton('命令序列')
+        self.btn_sequence.setToolTip('按脚本发送、等待应答、延时、循环和分支，统计每一步的耗时')
+        self.btn_sequence.clicked.connect(self.show_sequence_dialog)
+        auto_send_layout.addWidget(self.btn_sequence)
+        
+        send_layout.addLayout(auto_send_layout)
+        
+        # 快速字符串按钮组，两行各20个
+        quick_strings_group = QGroupBox('快速字符串')
+        quick_strings_layout = QVBoxLayout()  # 改为垂直布局
+        
+        for row_start in (0, 20):
+            quick_strings_row = QHBoxLayout()
+            for i in range(row_start, row_start + 20):
+                btn = QPushButton(f'字符串{i+1}')
+                btn.setMaximumWidth(80)
+                btn.clicked.connect(lambda checked, idx=i: self.quick_send_string(idx))
+                # 添加右键菜单
+                btn.setContextMenuPolicy(Qt.CustomContextMenu)
+                btn.customContextMenuRequested.connect(lambda pos, idx=i: self.show_quick_string_menu(pos, idx))
+                self.quick_string_buttons.append(btn)
+                quick_strings_row.addWidget(btn)
+            
+            quick_strings_row.addStretch()
+            quick_strings_layout.addLayout(quick_strings_row)
         
-        # 发送按钮
-        self.btn_send2 = QPushButton('发送')
-        self.btn_send2.clicked.connect(lambda: self.send_data(2))
-        send_input_layout2.addWidget(self.btn_send2)
+        quick_strings_group.setLayout(quick_strings_layout)
+        send_layout.addWidget(quick_strings_group)
         
-        send_layout2.addLayout(send_input_layout2)
+        send_group.setLayout(send_layout)
+        tab_layout.addWidget(send_group)
         
-        # 自动发送
-        auto_send_layout2 = QHBoxLayout()
-        auto_send_layout2.addWidget(QLabel('自动发送间隔(ms):'))
-        self.spin_interval2 = QSpinBox()
-        self.spin_interval2.setRange(100, 10000)
-        self.spin_interval2.setValue(1000)
-        auto_send_layout2.addWidget(self.spin_interval2)
-        
-        self.check_auto_send2 = QCheckBox('启用自动发送')
-        auto_send_layout2.addWidget(self.check_auto_send2)
-        self.check_auto_send2.toggled.connect(lambda enabled: self.toggle_auto_send(enabled, 2))
-        
-        send_layout2.addLayout(auto_send_layout2)
-        
-        # 快速字符串按钮组
-        quick_strings_group2 = QGroupBox('快速字符串')
-        quick_strings_layout2 = QVBoxLayout()  # 改为垂直布局
-        
-        # 第一行按钮
-        quick_strings_row1_2 = QHBoxLayout()
-        for i in range(20):
-            btn = QPushButton(f'字符串{i+1}')
-            btn.setMaximumWidth(80)
-            btn.clicked.connect(lambda checked, idx=i, port=2: self.quick_send_string(idx, port))
-            # 添加右键菜单
-            btn.setContextMenuPolicy(Qt.CustomContextMenu)
-            btn.customContextMenuRequested.connect(lambda pos, idx=i, port=2: self.show_quick_string_menu(pos, idx, port))
-            self.quick_string_buttons2.append(btn)
-            quick_strings_row1_2.addWidget(btn)
-        
-        quick_strings_row1_2.addStretch()
-        quick_strings_layout2.addLayout(quick_strings_row1_2)
-        
-        # 第二行按钮
-        quick_strings_row2_2 = QHBoxLayout()
-        for i in range(20, 40):
-            btn = QPushButton(f'字符串{i+1}')
-            btn.setMaximumWidth(80)
-            btn.clicked.connect(lambda checked, idx=i, port=2: self.quick_send_string(idx, port))
-            # 添加右键菜单
-            btn.setContextMenuPolicy(Qt.CustomContextMenu)
-            btn.customContextMenuRequested.connect(lambda pos, idx=i, port=2: self.show_quick_string_menu(pos, idx, port))
-            self.quick_string_buttons2.append(btn)
-            quick_strings_row2_2.addWidget(btn)
-        
-        quick_strings_row2_2.addStretch()
-        quick_strings_layout2.addLayout(quick_strings_row2_2)
-        
-        quick_strings_group2.setLayout(quick_strings_layout2)
-        send_layout2.addWidget(quick_strings_group2)
-        
-        send_group2.setLayout(send_layout2)
-        tab2_layout.addWidget(send_group2)
-        
-        # 串口2接收组
-        receive_group2 = QGroupBox('串口2接收')
-        receive_layout2 = QVBoxLayout()
+        # 接收组
+        receive_group = QGroupBox(f'{name}接收')
+        receive_layout = QVBoxLayout()
         
         # 接收控制按钮
-        receive_control_layout2 = QHBoxLayout()
-        self.btn_clear2 = QPushButton('清除接收')
-        self.btn_clear2.clicked.connect(lambda: self.clear_receive(2))
-        receive_control_layout2.addWidget(self.btn_clear2)
-        
-        self.check_hex_display2 = QCheckBox('十六进制显示')
-        self.check_hex_display2.toggled.connect(lambda: self.update_display_format(2))
-        receive_control_layout2.addWidget(self.check_hex_display2)
-        
-        # 添加编码选择
-        receive_control_layout2.addWidget(QLabel('编码:'))
-        self.combo_encoding2 = QComboBox()
-        self.combo_encoding2.addItems(['UTF-8', 'GBK', 'GB2312', 'BIG5', 'ISO-8859-1', 'ASCII'])
-        self.combo_encoding2.setCurrentText('UTF-8')
-        self.combo_encoding2.setMaximumWidth(100)
-        receive_control_layout2.addWidget(self.combo_encoding2)
+        receive_control_layout = QHBoxLayout()
+        self.btn_clear = QPushButton('清除接收')
+        self.btn_clear.clicked.connect(self.clear_receive)
+        receive_control_layout.addWidget(self.btn_clear)
         
-        self.check_show_time2 = QCheckBox('显示时间戳')
-        self.check_show_time2.setChecked(True)
-        receive_control_layout2.addWidget(self.check_show_time2)
+        self.check_hex_display = QCheckBox('十六进制显示')
+        self.check_hex_display.toggled.connect(self.update_display_format)
+        receive_control_layout.addWidget(self.check_hex_display)
         
-        self.check_auto_scroll2 = QCheckBox('自动滚动')
-        self.check_auto_scroll2.setChecked(True)
-        receive_control_layout2.addWidget(self.check_auto_scroll2)
+        self.check_hexdump = QCheckBox('Hexdump排版')
+        self.check_hexdump.setToolTip('十六进制显示时按"偏移 十六进制 ASCII"分行排版')
+        self.check_hexdump.toggled.connect(self.sync_settings)
+        receive_control_layout.addWidget(self.check_hexdump)
         
-        receive_layout2.addLayout(receive_control_layout2)
+        # 添加编码选择
+        receive_control_layout.addWidget(QLabel('编码:'))
+        self.combo_encoding = QComboBox()
+        self.combo_encoding.addItems(ENCODINGS)
+        self.combo_encoding.setCurrentText('UTF-8')
+        self.combo_encoding.setMaximumWidth(100)
+        self.combo_encoding.currentTextChanged.connect(self.on_receive_encoding_changed)
+        receive_control_layout.addWidget(self.combo_encoding)
+        
+        self.check_show_time = QCheckBox('显示时间戳')
+        self.check_show_time.setChecked(True)
+        self.check_show_time.toggled.connect(self.sync_settings)
+        receive_control_layout.addWidget(self.check_show_time)
+        
+        self.check_auto_scroll = QCheckBox('自动滚动')
+        self.check_auto_scroll.setChecked(True)
+        receive_control_layout.addWidget(self.check_auto_scroll)
+        
+        self.check_record = QCheckBox('录制')
+        self.check_record.setToolTip('将收发的原始数据连同时间戳持续写入录制文件')
+        self.check_record.toggled.connect(self.toggle_capture)
+        receive_control_layout.addWidget(self.check_record)
+        
+        self.btn_replay = QPushButton('回放')
+        self.btn_replay.setToolTip('把录制文件中的数据按原速、倍速或尽快送入本串口的接收显示，无需连接设备')
+        self.btn_replay.clicked.connect(self.show_replay_dialog)
+        receive_control_layout.addWidget(self.btn_replay)
+        
+        self.btn_trigger = QPushButton('触发器')
+        self.btn_trigger.setToolTip('在接收线程中匹配正则或字节串，命中时高亮、发送快速字符串、开始/停止录制或保存触发前的数据')
+        self.btn_trigger.clicked.connect(self.show_trigger_dialog)
+        receive_control_layout.addWidget(self.btn_trigger)
+        
+        receive_layout.addLayout(receive_control_layout)
         
         # 接收数据显示
-        self.text_receive2 = QTextEdit()
-        self.text_receive2.setReadOnly(True)
-        self.text_receive2.setFont(QFont('Consolas', 10))
-        receive_layout2.addWidget(self.text_receive2)
+        self.text_receive = QTextEdit()
+        self.text_receive.setReadOnly(True)
+        self.text_receive.setFont(QFont('Consolas', 10))
+        receive_layout.addWidget(self.text_receive)
         
         # 统计信息
-        stats_layout2 = QHBoxLayout()
-        self.label_received2 = QLabel('接收: 0 字节')
-        stats_layout2.addWidget(self.label_received2)
-        self.label_sent2 = QLabel('发送: 0 字节')
-        stats_layout2.addWidget(self.label_sent2)
-        stats_layout2.addStretch()
-        
-        receive_layout2.addLayout(stats_layout2)
-        receive_group2.setLayout(receive_layout2)
-        tab2_layout.addWidget(receive_group2)
-        
-        tab2.setLayout(tab2_layout)
-        tab_widget.addTab(tab2, "串口2")
-        
-        main_layout.addWidget(tab_widget)
-        
-        # 日志区域
-        log_group = QGroupBox('程序日志')
-        log_layout = QVBoxLayout()
-        
-        # 日志控制按钮
-        log_control_layout = QHBoxLayout()
-        
-        # 串口选择复选框
-        self.check_log_port1 = QCheckBox('串口1')
-        self.check_log_port1.setChecked(True)
-        log_control_layout.addWidget(self.check_log_port1)
-        
-        self.check_log_port2 = QCheckBox('串口2')
-        self.check_log_port2.setChecked(True)
-        log_control_layout.addWidget(self.check_log_port2)
+        stats_layout = QHBoxLayout()
+        self.label_received = QLabel('接收: 0 字节')
+        stats_layout.addWidget(self.label_received)
+        self.label_sent = QLabel('发送: 0 字节')
+        stats_layout.addWidget(self.label_sent)
+        stats_layout.addStretch()
+        
+        receive_layout.addLayout(stats_layout)
+        receive_group.setLayout(receive_layout)
+        tab_layout.addWidget(receive_group)
+        
+        self.setLayout(tab_layout)
+        
+        # 日志区域的串口选择复选框，由主窗口放入日志控制栏
+        self.check_log_port = QCheckBox(name)
+        self.check_log_port.setChecked(True)
+        self.check_log_port.toggled.connect(self.sync_settings)
+    
+    def load_settings(self):
+        """把会话设置显示到界面上"""
+        # 控件的信号会回写设置，先取一份副本
+        settings = dict(self.session.settings)
+        self.combo_baud.setCurrentText(str(settings['baud']))
+        self.combo_data.setCurrentText(str(settings['data_bits']))
+        self.combo_stop.setCurrentText(str(settings['stop_bits']))
+        self.combo_parity.setCurrentText(settings['parity'])
+        self.combo_read_mode.setCurrentText(settings['read_mode'])
+        self.spin_read_timeout.setValue(int(settings['read_timeout']))
+        self.spin_min_bytes.setValue(int(settings['min_bytes']))
+        self.combo_send_encoding.setCurrentText(settings['send_encoding'])
+        self.combo_encoding.setCurrentText(settings['recv_encoding'])
+        self.check_newline.setChecked(settings['auto_newline'])
+        self.check_hex_display.setChecked(settings['hex_display'])
+        self.check_hexdump.setChecked(settings['hexdump'])
+        self.check_show_time.setChecked(settings['show_time'])
+        self.check_log_port.setChecked(settings['show_in_log'])
+        self.check_reconnect.setChecked(settings['auto_reconnect'])
+        self.combo_framer.setCurrentText(settings['framer'])
+        self.edit_frame_param.setText(settings['frame_param'])
+        self.combo_checksum.setCurrentText(settings['checksum'])
+        self.update_history_combo()
+        self.update_quick_strings_buttons()
+        self.sync_settings()
+    
+    def sync_settings(self):
+        """把界面上的设置写回会话"""
+        settings = self.session.settings
+        settings['port'] = self.combo_port.currentText() or settings['port']
+        settings['baud'] = int(self.combo_baud.currentText())
+        settings['data_bits'] = int(self.combo_data.currentText())
+        settings['stop_bits'] = self.combo_stop.currentText()
+        settings['parity'] = self.combo_parity.currentText()
+        settings['read_mode'] = self.combo_read_mode.currentText()
+        settings['read_timeout'] = self.spin_read_timeout.value()
+        settings['min_bytes'] = self.spin_min_bytes.value()
+        settings['send_encoding'] = self.combo_send_encoding.currentText()
+        settings['recv_encoding'] = self.combo_encoding.currentText()
+        # 十六进制发送时自动换行被临时取消，保存记忆的状态
+        if self.check_hex_send.isChecked():
+            settings['auto_newline'] = self.newline_state
+        else:
+            settings['auto_newline'] = self.check_newline.isChecked()
+        settings['hex_display'] = self.check_hex_display.isChecked()
+        settings['hexdump'] = self.check_hexdump.isChecked()
+        settings['show_time'] = self.check_show_time.isChecked()
+        settings['show_in_log'] = self.check_log_port.isChecked()
+        settings['auto_reconnect'] = self.check_reconnect.isChecked()
+        settings['framer'] = self.combo_framer.currentText()
+        settings['frame_param'] = self.edit_frame_param.text().strip()
+        settings['checksum'] = self.combo_checksum.currentText()
+    
+    def on_framer_changed(self, name):
+        """切换分帧方式时提示参数格式"""
+        hint = FRAMER_PARAM_HINTS[FRAMERS[name]]
+        self.edit_frame_param.setPlaceholderText(hint or '无需参数')
+        self.edit_frame_param.setToolTip(hint)
+        self.edit_frame_param.setEnabled(bool(hint) and not self.session.is_open)
+    
+    def set_ports(self, ports):
+        """用串口信息列表重建可选串口，保留当前选择"""
+        current = self.combo_port.currentText() or self.session.settings['port']
+        self.combo_port.clear()
+        self.update_ports(ports, [])
+        if self.combo_port.findText(current) >= 0:
+            self.combo_port.setCurrentText(current)
+    
+    def update_ports(self, added, removed):
+        """串口插拔时增量更新列表，正在使用的串口拔出后仍保留在列表中"""
+        current = self.combo_port.currentText()
+        in_use = self.session.is_open or self.reconnecting
+        for device in removed:
+            index = self.combo_port.findText(device)
+            if index >= 0 and not (in_use and device == current):
+                self.combo_port.removeItem(index)
+        for port in added:
+            device = port['device']
+            index = self.combo_port.findText(device)
+            if index < 0:
+                # 按设备名顺序插入
+                index = 0
+                while index < self.combo_port.count() and self.combo_port.itemText(index) < device:
+                    index += 1
+                self.combo_port.insertItem(index, device)
+            self.combo_port.setItemData(index, port['description'], Qt.ToolTipRole)
+        
+        # 断线重连中有新串口出现时立即重试，不必等到退避时间
+        if self.reconnecting and added:
+            self.reconnect_timer.start(0)
+    
+    def toggle_connection(self):
+        """切换串口连接状态，重连过程中点击则停止重连"""
+        if self.reconnecting:
+            self.disconnect_serial()
+        elif not self.session.is_open:
+            self.connect_serial()
+        else:
+            self.disconnect_serial()
+    
+    def set_settings_enabled(self, enabled):
+        """连接后禁止修改串口参数"""
+        for widget in (self.combo_port, self.combo_baud, self.combo_data, self.combo_stop,
+                       self.combo_parity, self.combo_read_mode, self.spin_read_timeout,
+                       self.spin_min_bytes, self.btn_refresh, self.combo_framer):
+            widget.setEnabled(enabled)
+        # 分帧参数只在所选分帧方式需要参数时可编辑
+        hint = FRAMER_PARAM_HINTS[FRAMERS[self.combo_framer.currentText()]]
+        self.edit_frame_param.setEnabled(enabled and bool(hint))
+        self.btn_connect.setText('连接' if enabled else '断开')
+    
+    def connect_serial(self):
+        """连接串口"""
+        port = self.combo_port.currentText()
+        if not port:
+            QMessageBox.warning(self, '警告', f'请选择{self.name}')
+            return
         
-        log_control_layout.addStretch()
+        self.sync_settings()
+        # 可能换了串口，重新记录USB硬件ID
+        self.session.hardware_id = None
+        try:
+            # 打开串口，启动接收和发送线程
+            self.session.open()
+        except Exception as e:
+            self.session.close()
+            QMessageBox.critical(self, '错误', f'连接串口失败: {str(e)}')
+            self.log_message(f"{self.name}连接失败: {str(e)}", color='red')
+            return
         
-        # 清除日志按钮
-        self.btn_clear_log = QPushButton('清除日志')
-        self.btn_clear_log.clicked.connect(self.clear_log)
-        log_control_layout.addWidget(self.btn_clear_log)
+        # 更新界面状态
+        self.set_settings_enabled(False)
+        self.log_message(f"{self.name} {port} 连接成功")
         
-        # 保存日志按钮
-        self.btn_save_log = QPushButton('保存日志')
-        self.btn_save_log.clicked.connect(self.save_log)
-        log_control_layout.addWidget(self.btn_save_log)
+        # 保存当前串口配置
+        self.debugger.save_config()
+    
+    def disconnect_serial(self):
+        """断开串口连接"""
+        self.reconnect_timer.stop()
+        self.reconnecting = False
+        if self.transaction_dialog:
+            self.transaction_dialog.stop()
+        if self.sequence_dialog:
+            self.sequence_dialog.stop()
+        if self.file_send_dialog:
+            self.file_send_dialog.stop()
+        if self.check_auto_send.isChecked():
+            self.check_auto_send.setChecked(False)
+        self.resume_sender = None
+        self.session.close()
+        if self.replay_dialog:
+            self.replay_dialog.finish()
+        
+        # 恢复界面状态
+        self.set_settings_enabled(True)
+        self.log_message(f"{self.name}已断开")
+    
+    def on_port_error(self, error_msg):
+        """本串口读写出错，只断开本串口；启用断线重连时按指数退避重新打开"""
+        if not self.session.is_open:
+            # 接收和发送线程可能先后报告同一次故障
+            return
+        self.log_message(f"[错误] {self.name}: {error_msg}", color='red')
+        if not self.check_reconnect.isChecked():
+            self.disconnect_serial()
+            return
         
-        # 关于按钮
-        self.btn_about = QPushButton('关于')
-        self.btn_about.clicked.connect(self.show_about)
-        log_control_layout.addWidget(self.btn_about)
+        # 记下自动发送参数，关闭串口但保留录制，重连后继续写入同一文件
+        sender = self.session.auto_sender
+        if sender:
+            self.resume_sender = (sender.data, sender.tag, sender.interval, sender.catch_up)
+        self.session.close()
+        self.reconnecting = True
+        self.backoff.reset()
+        self.btn_connect.setText('停止重连')
+        self.schedule_reconnect()
+    
+    def schedule_reconnect(self):
+        delay = self.backoff.next_delay()
+        self.log_message(f"{self.name}连接断开，{delay:g}秒后第{self.backoff.attempts}次重连", color='red')
+        self.reconnect_timer.start(int(delay * 1000))
+    
+    def attempt_reconnect(self):
+        """重新打开串口，失败时等待更长时间再试"""
+        if not self.reconnecting:
+            return
+        try:
+            self.session.reconnect()
+        except Exception as e:
+            self.log_message(f"{self.name}重连失败: {str(e)}", color='red')
+            self.schedule_reconnect()
+            return
         
-        log_layout.addLayout(log_control_layout)
+        self.reconnecting = False
+        self.btn_connect.setText('断开')
+        port = self.session.settings['port']
+        if self.combo_port.findText(port) < 0:
+            self.combo_port.addItem(port)
+        self.combo_port.setCurrentText(port)
+        if self.resume_sender:
+            self.session.start_auto_send(*self.resume_sender)
+            self.resume_sender = None
+        self.log_message(f"{self.name} {port} 重连成功，共尝试 {self.backoff.attempts} 次")
+    
+    def send_data(self):
+        """发送数据"""
+        if not self.session.is_open:
+            QMessageBox.warning(self, '警告', f'请先连接{self.name}')
+            return
         
-        # 日志显示区域
-        self.text_log = QTextEdit()
-        self.text_log.setReadOnly(True)
-        self.text_log.setMinimumHeight(400)  # 增大最小高度
-        self.text_log.setMaximumHeight(600)  # 增大最大高度
-        self.text_log.setFont(QFont('Consolas', 9))
-        log_layout.addWidget(self.text_log)
+        prepared = self.prepare_send_data()
+        if not prepared:
+            return
+        data, send_bytes, display_data = prepared
         
-        log_group.setLayout(log_layout)
-        main_layout.addWidget(log_group)
+        try:
+            # 交给发送线程写出，写完后再显示；根据串口选择复选框决定是否显示
+            tag = (f'{self.name}发送', display_data) if self.check_log_port.isChecked() else None
+            if not self.queue_send(send_bytes, tag):
+                return
+            
+            # 添加到发送历史
+            self.add_to_history(data, self.check_hex_send.isChecked())
         
-        self.setLayout(main_layout)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'发送数据失败: {str(e)}')
+    
+    def prepare_send_data(self, quiet=False):
+        """按发送设置编码输入框内容，返回(历史记录文本, 发送字节, 显示文本)
         
-        # 设置默认焦点
-        self.edit_send1.setFocus()
+        数据无效时提示并返回None，quiet为True时不弹出提示。
+        """
+        data = self.edit_send.text().strip()
+        if not data:
+            return None
         
-    def scan_ports(self):
-        """扫描可用串口"""
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.combo_port1.clear()
-        self.combo_port1.addItems(ports)
-        self.combo_port2.clear()
-        self.combo_port2.addItems(ports)
-        if ports:
-            self.log_message(f"发现 {len(ports)} 个串口: {', '.join(ports)}")
+        self.sync_settings()
+        try:
+            return self.session.encode(data, self.check_hex_send.isChecked())
+        except ValueError as e:
+            if not quiet:
+                QMessageBox.warning(self, '警告', str(e))
+            return None
+    
+    def queue_send(self, send_bytes, tag):
+        """把数据放入串口的发送队列，队列已满时提示并返回False"""
+        if not self.session.send(send_bytes, tag):
+            self.log_message(f"{self.name}发送队列已满，本次数据未发送", color='red')
+            return False
+        self.update_counters()
+        return True
+    
+    def update_counters(self):
+        """更新收发统计，显示尚未写出的排队字节数"""
+        session = self.session
+        if session.framer is not None:
+            text = f'接收: {session.received_count} 字节 / {session.frame_count} 帧'
+            if session.checksum is not None:
+                text += f' / 校验错误 {session.checksum_errors} 帧'
+            self.label_received.setText(text)
         else:
-            self.log_message("未发现可用串口")
-            
-    def toggle_connection(self, port_index):
-        """切换串口连接状态"""
-        if port_index == 1:
-            if self.serial_port1 is None or not self.serial_port1.is_open:
-                self.connect_serial(1)
-            else:
-                self.disconnect_serial(1)
-        elif port_index == 2:
-            if self.serial_port2 is None or not self.serial_port2.is_open:
-                self.connect_serial(2)
-            else:
-                self.disconnect_serial(2)
-            
-    def connect_serial(self, port_index):
-        """连接串口"""
-        if port_index == 1:
-            port = self.combo_port1.currentText()
-            if not port:
-                QMessageBox.warning(self, '警告', '请选择串口1')
-                return
+            self.label_received.setText(f'接收: {session.received_count} 字节')
+        pending = session.pending_bytes
+        if pending:
+            self.label_sent.setText(f'发送: {session.sent_count} 字节 (排队 {pending} 字节)')
         else:
-            port = self.combo_port2.currentText()
-            if not port:
-                QMessageBox.warning(self, '警告', '请选择串口2')
-                return
-            
-        try:
-            # 获取串口参数
-            if port_index == 1:
-                baud_rate = int(self.combo_baud1.currentText())
-                data_bits = int(self.combo_data1.currentText())
-                stop_bits_map = {'1': serial.STOPBITS_ONE, '1.5': serial.STOPBITS_ONE_POINT_FIVE, '2': serial.STOPBITS_TWO}
-                stop_bits = stop_bits_map[self.combo_stop1.currentText()]
-                parity_map = {'无': serial.PARITY_NONE, '奇校验': serial.PARITY_ODD, '偶校验': serial.PARITY_EVEN}
-                parity = parity_map[self.combo_parity1.currentText()]
-            else:
-                baud_rate = int(self.combo_baud2.currentText())
-                data_bits = int(self.combo_data2.currentText())
-                stop_bits_map = {'1': serial.STOPBITS_ONE, '1.5': serial.STOPBITS_ONE_POINT_FIVE, '2': serial.STOPBITS_TWO}
-                stop_bits = stop_bits_map[self.combo_stop2.currentText()]
-                parity_map = {'无': serial.PARITY_NONE, '奇校验': serial.PARITY_ODD, '偶校验': serial.PARITY_EVEN}
-                parity = parity_map[self.combo_parity2.currentText()]
-            
-            # 打开串口
-            if port_index == 1:
-                self.serial_port1 = serial.Serial(
-                    port=port,
-                    baudrate=baud_rate,
-                    bytesize=data_bits,
-                    stopbits=stop_bits,
-                    parity=parity,
-                    timeout=1
-                )
-                
-                # 启动接收线程
-                self.serial_thread1 = SerialThread(self.serial_port1)
-                self.serial_thread1.data_received.connect(lambda data: self.on_data_received(data, 1))
-                self.serial_thread1.error_occurred.connect(self.on_serial_error)
-                self.serial_thread1.start()
-                
-                # 更新界面状态
-                self.btn_connect1.setText('断开')
-                self.combo_port1.setEnabled(False)
-                self.combo_baud1.setEnabled(False)
-                self.combo_data1.setEnabled(False)
-                self.combo_stop1.setEnabled(False)
-                self.combo_parity1.setEnabled(False)
-                self.btn_refresh1.setEnabled(False)
+            self.label_sent.setText(f'发送: {session.sent_count} 字节')
+    
+    def on_trigger(self, event):
+        """触发器执行了动作，返回日志[(消息, 颜色), ...]；录制已在接收线程中开始或停止，这里同步复选框"""
+        if event.capture is not None:
+            self.check_record.blockSignals(True)
+            self.check_record.setChecked(event.rule.capture == 'start')
+            self.check_record.blockSignals(False)
+        timestamp = datetime.fromtimestamp(event.time).strftime('%H:%M:%S.%f')[:-3]
+        entries = [(f"[{self.name}触发] {timestamp} {event.describe()}", 'trigger' if event.rule.highlight else 'black')]
+        entries += [(f"[{self.name}触发] {error}", 'red') for error in event.errors]
+        return entries
+    
+    def on_data_written(self, written, sent_time, tag, finished):
+        """发送线程写出数据，计数以实际写出的字节为准，返回日志[(消息, 颜色), ...]"""
+        if not (finished and tag):
+            return []
+        label, display_data = tag
+        timestamp = datetime.fromtimestamp(sent_time).strftime('%H:%M:%S.%f')[:-3] if self.session.settings['show_time'] else ''
+        return [(f"[{label}] {timestamp} {display_data}", 'blue')]
+    
+    def on_data_received(self, chunks):
+        """接收数据，chunks为接收线程批量投递的[(时间戳, 字节数据), ...]，返回日志[(消息, 颜色), ...]"""
+        settings = self.session.settings
+        # 根据串口选择复选框决定是否显示
+        if not settings['show_in_log']:
+            return []
+        show_time = settings['show_time']
+        
+        # 启用性能统计时记录排队延迟和各阶段耗时
+        metrics = self.session.metrics
+        if metrics is not None:
+            if chunks:
+                metrics.on_queued(chunks[0][0])
+            start_ns = time.perf_counter_ns()
+        
+        # 分帧时验证每帧的校验值
+        checksum = self.session.checksum if self.session.framer is not None else None
+        
+        def receive_message(received_time, display_data, data=None):
+            # 时间戳使用接收线程读到数据的时间
+            timestamp = datetime.fromtimestamp(received_time).strftime('%H:%M:%S.%f')[:-3] if show_time else ''
+            if checksum is not None and not checksum.verify(data):
+                return (f"[{self.name}接收] {timestamp} [校验错误] {display_data}", 'red')
+            return (f"[{self.name}接收] {timestamp} {display_data}", 'green')
+        
+        # 先把数据转为显示文本[(时间戳, 文本, 用于校验的数据), ...]，再组成日志行
+        items = []
+        if settings['hex_display']:
+            for received_time, data in chunks:
+                # 格式化显示数据
+                if settings['hexdump']:
+                    display_data = '\n' + format_hexdump(data)
+                else:
+                    display_data = format_hex(data)
+                items.append((received_time, display_data, data))
+        elif self.session.framer is not None:
+            # 已分帧，每帧显示为一行
+            encoding = self.session.text_assembler.encoding
+            for received_time, frame in chunks:
+                items.append((received_time, decode_frame(frame, encoding), frame))
+        else:
+            # 根据选择的编码增量解码，按完整的行显示
+            assembler = self.session.text_assembler
+            for received_time, data in chunks:
+                for line_time, line in assembler.feed(data, received_time):
+                    items.append((line_time, line, None))
+            # 不完整的行等待后续数据，超时后直接显示
+            if assembler.partial:
+                self.line_flush_timer.start(LINE_FLUSH_TIMEOUT_MS)
             else:
-                self.serial_port2 = serial.Serial(
-                    port=port,
-                    baudrate=baud_rate,
-                    bytesize=data_bits,
-                    stopbits=stop_bits,
-                    parity=parity,
-                    timeout=1
-                )
-                
-                # 启动接收线程
-                self.serial_thread2 = SerialThread(self.serial_port2)
-                self.serial_thread2.data_received.connect(lambda data: self.on_data_received(data, 2))
-                self.serial_thread2.error_occurred.connect(self.on_serial_error)
-                self.serial_thread2.start()
-                
-                # 更新界面状态
-                self.btn_connect2.setText('断开')
-                self.combo_port2.setEnabled(False)
-                self.combo_baud2.setEnabled(False)
-                self.combo_data2.setEnabled(False)
-                self.combo_stop2.setEnabled(False)
-                self.combo_parity2.setEnabled(False)
-                self.btn_refresh2.setEnabled(False)
-            
-            self.log_message(f"串口{port_index} {port} 连接成功")
+                self.line_flush_timer.stop()
+        
+        if metrics is None:
+            return [receive_message(*item) for item in items]
+        decoded_ns = time.perf_counter_ns()
+        messages = [receive_message(*item) for item in items]
+        metrics.decode_ns += decoded_ns - start_ns
+        metrics.format_ns += time.perf_counter_ns() - decoded_ns
+        metrics.lines += len(messages)
+        return messages
+    
+    def flush_partial_line(self):
+        """显示等待换行符的不完整行"""
+        pending = self.session.text_assembler.flush()
+        self.line_flush_timer.stop()
+        if pending:
+            received_time, line = pending
+            timestamp = datetime.fromtimestamp(received_time).strftime('%H:%M:%S.%f')[:-3] if self.session.settings['show_time'] else ''
+            self.log_message(f"[{self.name}接收] {timestamp} {line}", color='green')
+    
+    def on_receive_encoding_changed(self, encoding):
+        """接收编码切换时重置增量解码器"""
+        self.flush_partial_line()
+        self.session.settings['recv_encoding'] = encoding
+        try:
+            self.session.text_assembler.set_encoding(encoding)
+        except LookupError:
+            self.log_message(f"不支持的编码格式: {encoding}", color='red')
+    
+    def toggle_auto_send(self, enabled):
+        """切换自动发送"""
+        if enabled:
+            if not self.session.is_open:
+                QMessageBox.warning(self, '警告', f'请先连接{self.name}')
+                self.check_auto_send.setChecked(False)
+                return
             
-            # 保存当前串口配置
-            self.save_config()
+            prepared = self.prepare_send_data()
+            if not prepared:
+                self.check_auto_send.setChecked(False)
+                return
+            _, send_bytes, display_data = prepared
             
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'连接串口失败: {str(e)}')
-            self.log_message(f"串口{port_index}连接失败: {str(e)}", color='red')
-        
-    def disconnect_serial(self, port_index):
-        """断开串口连接"""
-        if port_index == 1:
-            if self.auto_send_timer1:
-                self.auto_send_timer1.stop()
-                self.check_auto_send1.setChecked(False)
-                
-            if self.serial_thread1:
-                self.serial_thread1.stop()
-                self.serial_thread1.wait()
-                self.serial_thread1 = None
-                
-            if self.serial_port1 and self.serial_port1.is_open:
-                self.serial_port1.close()
-                self.serial_port1 = None
-                
-            # 恢复界面状态
-            self.btn_connect1.setText('连接')
-            self.combo_port1.setEnabled(True)
-            self.combo_baud1.setEnabled(True)
-            self.combo_data1.setEnabled(True)
-            self.combo_stop1.setEnabled(True)
-            self.combo_parity1.setEnabled(True)
-            self.btn_refresh1.setEnabled(True)
+            # 在独立线程中按单调时钟定时发送，不受界面繁忙影响
+            interval = self.spin_interval.value()
+            self.session.start_auto_send(send_bytes, self.auto_send_tag(display_data), interval / 1000,
+                                         CATCH_UP_POLICIES[self.combo_catch_up.currentText()])
+            self.spin_interval.setEnabled(False)
+            self.combo_catch_up.setEnabled(False)
+            # 根据串口选择复选框决定是否显示
+            if self.check_log_port.isChecked():
+                self.log_message(f"{self.name}自动发送已启用，间隔: {interval}ms")
         else:
-            if self.auto_send_timer2:
-                self.auto_send_timer2.stop()
-                self.check_auto_send2.setChecked(False)
-                
-            if self.serial_thread2:
-                self.serial_thread2.stop()
-                self.serial_thread2.wait()
-                self.serial_thread2 = None
-                
-            if self.serial_port2 and self.serial_port2.is_open:
-                self.serial_port2.close()
-                self.serial_port2 = None
-                
-            # 恢复界面状态
-            self.btn_connect2.setText('连接')
-            self.combo_port2.setEnabled(True)
-            self.combo_baud2.setEnabled(True)
-            self.combo_data2.setEnabled(True)
-            self.combo_stop2.setEnabled(True)
-            self.combo_parity2.setEnabled(True)
-            self.btn_refresh2.setEnabled(True)
-        
-        self.log_message(f"串口{port_index}已断开")
-        
-    def send_data(self, port_index):
-        """发送数据"""
-        if port_index == 1:
-            if not self.serial_port1 or not self.serial_port1.is_open:
-                QMessageBox.warning(self, '警告', '请先连接串口1')
+            sender = self.session.stop_auto_send()
+            self.resume_sender = None
+            self.spin_interval.setEnabled(True)
+            self.combo_catch_up.setEnabled(True)
+            if not sender:
                 return
-                
-            data = self.edit_send1.text().strip()
-            if not data:
+            # 根据串口选择复选框决定是否显示
+            if self.check_log_port.isChecked():
+                self.log_message(f"{self.name}自动发送已禁用，共发送 {sender.fired} 次，"
+                                 f"跳过 {sender.missed} 次，队列满丢弃 {sender.dropped} 次")
+                self.log_message(f"{self.name}自动发送定时抖动: {sender.stats.summary()}")
+    
+    def auto_send_tag(self, display_data):
+        """自动发送的显示信息，间隔过短时不逐条显示"""
+        if not self.check_log_port.isChecked() or self.spin_interval.value() < AUTO_SEND_LOG_MIN_INTERVAL:
+            return None
+        return (f'{self.name}发送', display_data)
+    
+    def show_transaction_dialog(self):
+        """打开事务测试窗口，不阻塞主窗口"""
+        if self.transaction_dialog is None:
+            self.transaction_dialog = TransactionDialog(self)
+        self.transaction_dialog.refresh_requests()
+        self.transaction_dialog.show()
+        self.transaction_dialog.raise_()
+    
+    def show_sequence_dialog(self):
+        """打开命令序列窗口，不阻塞主窗口"""
+        if self.sequence_dialog is None:
+            self.sequence_dialog = SequenceDialog(self)
+        self.sequence_dialog.show()
+        self.sequence_dialog.raise_()
+    
+    def show_file_send_dialog(self):
+        """打开发送文件窗口，不阻塞主窗口"""
+        if self.file_send_dialog is None:
+            self.file_send_dialog = FileSendDialog(self)
+        self.file_send_dialog.show()
+        self.file_send_dialog.raise_()
+    
+    def show_replay_dialog(self):
+        """打开回放窗口，不阻塞主窗口"""
+        if self.replay_dialog is None:
+            self.replay_dialog = ReplayDialog(self)
+        self.replay_dialog.show()
+        self.replay_dialog.raise_()
+    
+    def show_trigger_dialog(self):
+        """打开触发器窗口，不阻塞主窗口"""
+        if self.trigger_dialog is None:
+            self.trigger_dialog = TriggerDialog(self)
+        self.trigger_dialog.show()
+        self.trigger_dialog.raise_()
+    
+    def refresh_auto_send_data(self):
+        """自动发送过程中修改了发送内容，更新下一次发送的数据"""
+        sender = self.session.auto_sender
+        if not sender:
+            return
+        prepared = self.prepare_send_data(quiet=True)
+        if prepared:
+            _, send_bytes, display_data = prepared
+            sender.tag = self.auto_send_tag(display_data)
+            sender.data = send_bytes
+    
+    def toggle_capture(self, enabled):
+        """切换录制"""
+        if enabled:
+            current_time = QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss')
+            default_filename = f"capture_port{self.session.index}_{current_time}.cap"
+            file_path, _ = QFileDialog.getSaveFileName(
+                self,
+                f"选择录制文件 - {self.name}",
+                default_filename,
+                "录制文件 (*.cap);;所有文件 (*)"
+            )
+            if not file_path:
+                self.check_record.setChecked(False)
                 return
-                
+            
             try:
-                if self.check_hex_send1.isChecked():
-                    # 十六进制发送
-                    data = data.replace(' ', '')
-                    if len(data) % 2 != 0:
-                        QMessageBox.warning(self, '警告', '十六进制数据长度必须为偶数')
-                        return
-                    try:
-                        send_bytes = bytes.fromhex(data)
-                    except ValueError:
-                        QMessageBox.warning(self, '警告', '无效的十六进制数据')
-                        return
-                else:
-                    # 文本发送 - 根据选择的编码编码数据
-                    encoding = self.combo_send_encoding1.currentText()
-                    try:
-                        send_bytes = data.encode(encoding, errors='replace')
-                    except LookupError:
-                        QMessageBox.warning(self, '警告', f'不支持的编码格式: {encoding}')
-                        return
-                    except Exception as e:
-                        QMessageBox.warning(self, '警告', f'编码失败: {str(e)}')
-                        return
-                        
-                if self.check_hex_send1.isChecked():
-                    # 十六进制发送时不添加换行符
-                    pass
-                elif self.check_newline1.isChecked():
-                    send_bytes += b'\r\n'
-                    
-                self.serial_port1.write(send_bytes)
-                self.sent_count1 += len(send_bytes)
-                self.label_sent1.setText(f'发送: {self.sent_count1} 字节')
-                
-                # 添加到发送历史
-                self.add_to_history(data, 1, self.check_hex_send1.isChecked())
-                
-                # 显示发送的数据
-                if self.check_hex_send1.isChecked():
-                    display_data = ' '.join([f'{b:02X}' for b in send_bytes])
-                else:
-                    # 显示发送的数据（使用接收编码显示）
-                    receive_encoding = self.combo_encoding1.currentText()
-                    try:
-                        display_data = send_bytes.decode(receive_encoding, errors='replace')
-                    except:
-                        display_data = send_bytes.decode('utf-8', errors='replace')
-                    
-                timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3] if self.check_show_time1.isChecked() else ''
-                send_msg = f"[串口1发送] {timestamp} {display_data}"
-                # 根据串口1选择复选框决定是否显示
-                if self.check_log_port1.isChecked():
-                    self.log_message(send_msg, color='blue')
-                
+                writer = CaptureWriter(file_path, self.session.index, self.debugger.capture_rotate_bytes,
+                                       self.debugger.capture_rotate_seconds)
+                writer.start()
             except Exception as e:
-                QMessageBox.critical(self, '错误', f'发送数据失败: {str(e)}')
-        else:
-            if not self.serial_port2 or not self.serial_port2.is_open:
-                QMessageBox.warning(self, '警告', '请先连接串口2')
+                self.check_record.setChecked(False)
+                self.log_message(f"{self.name}开始录制失败: {str(e)}", color='red')
                 return
-                
-            data = self.edit_send2.text().strip()
-            if not data:
-                return
-                
-            try:
-                if self.check_hex_send2.isChecked():
-                    # 十六进制发送
-                    data = data.replace(' ', '')
-                    if len(data) % 2 != 0:
-                        QMessageBox.warning(self, '警告', '十六进制数据长度必须为偶数')
-                        return
-                    try:
-                        send_bytes = bytes.fromhex(data)
-                    except ValueError:
-                        QMessageBox.warning(self, '警告', '无效的十六进制数据')
-                        return
-                else:
-                    # 文本发送 - 根据选择的编码编码数据
-                    encoding = self.combo_send_encoding2.currentText()
-                    try:
-                        send_bytes = data.encode(encoding, errors='replace')
-                    except LookupError:
-                        QMessageBox.warning(self, '警告', f'不支持的编码格式: {encoding}')
-                        return
-                    except Exception as e:
-                        QMessageBox.warning(self, '警告', f'编码失败: {str(e)}')
-                        return
-                        
-                if self.check_hex_send2.isChecked():
-                    # 十六进制发送时不添加换行符
-                    pass
-                elif self.check_newline2.isChecked():
-                    send_bytes += b'\r\n'
-                    
-                self.serial_port2.write(send_bytes)
-                self.sent_count2 += len(send_bytes)
-                self.label_sent2.setText(f'发送: {self.sent_count2} 字节')
-                
-                # 添加到发送历史
-                self.add_to_history(data, 2, self.check_hex_send2.isChecked())
-                
-                # 显示发送的数据
-                if self.check_hex_send2.isChecked():
-                    display_data = ' '.join([f'{b:02X}' for b in send_bytes])
-                else:
-                    # 显示发送的数据（使用接收编码显示）
-                    receive_encoding = self.combo_encoding2.currentText()
-                    try:
-                        display_data = send_bytes.decode(receive_encoding, errors='replace')
-                    except:
-                        display_data = send_bytes.decode('utf-8', errors='replace')
-                    
-                timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3] if self.check_show_time2.isChecked() else ''
-                send_msg = f"[串口2发送] {timestamp} {display_data}"
-                # 根据串口2选择复选框决定是否显示
-                if self.check_log_port2.isChecked():
-                    self.log_message(send_msg, color='blue')
-                
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'发送数据失败: {str(e)}')
             
-    def on_data_received(self, data, port_index):
-        """接收数据回调"""
-        if port_index == 1:
-            self.received_count1 += len(data)
-            self.label_received1.setText(f'接收: {self.received_count1} 字节')
-            
-            # 格式化显示数据
-            if self.check_hex_display1.isChecked():
-                display_data = ' '.join([f'{b:02X}' for b in data])
-            else:
-                # 根据选择的编码解码数据
-                encoding = self.combo_encoding1.currentText()
-                try:
-                    decoded_data = data.decode(encoding, errors='replace')
-                    # 将换行符替换为HTML换行标签
-                    display_data = decoded_data.replace('\n', '<br>').replace('\r', '')
-                except Exception as e:
-                    display_data = ' '.join([f'{b:02X}' for b in data]) + f' (解码失败: {e})'
-            
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3] if self.check_show_time1.isChecked() else ''
-            receive_msg = f"[串口1接收] {timestamp} {display_data}"
-            # 根据串口1选择复选框决定是否显示
-            if self.check_log_port1.isChecked():
-                self.log_message(receive_msg, color='green')
+            self.session.set_capture(writer)
+            self.log_message(f"{self.name}开始录制: {writer.current_path}")
         else:
-            self.received_count2 += len(data)
-            self.label_received2.setText(f'接收: {self.received_count2} 字节')
-            
-            # 格式化显示数据
-            if self.check_hex_display2.isChecked():
-                display_data = ' '.join([f'{b:02X}' for b in data])
-            else:
-                # 根据选择的编码解码数据
-                encoding = self.combo_encoding2.currentText()
-                try:
-                    decoded_data = data.decode(encoding, errors='replace')
-                    # 将换行符替换为HTML换行标签
-                    display_data = decoded_data.replace('\n', '<br>').replace('\r', '')
-                except Exception as e:
-                    display_data = ' '.join([f'{b:02X}' for b in data]) + f' (解码失败: {e})'
-            
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3] if self.check_show_time2.isChecked() else ''
-            receive_msg = f"[串口2接收] {timestamp} {display_data}"
-            # 根据串口2选择复选框决定是否显示
-            if self.check_log_port2.isChecked():
-                self.log_message(receive_msg, color='green')
-        
-    def on_serial_error(self, error_msg):
-        """串口错误回调"""
-        self.log_message(f"[错误] {error_msg}", color='red')
-        self.disconnect_serial(1)
-        self.disconnect_serial(2)
-        
-    def toggle_auto_send(self, enabled, port_index):
-        """切换自动发送"""
-        if enabled:
-            if port_index == 1:
-                if not self.serial_port1 or not self.serial_port1.is_open:
-                    QMessageBox.warning(self, '警告', '请先连接串口1')
-                    self.check_auto_send1.setChecked(False)
-                    return
-                    
-                interval = self.spin_interval1.value()
-                self.auto_send_timer1 = QTimer()
-                self.auto_send_timer1.timeout.connect(lambda: self.send_data(1))
-                self.auto_send_timer1.start(interval)
-            else:
-                if not self.serial_port2 or not self.serial_port2.is_open:
-                    QMessageBox.warning(self, '警告', '请先连接串口2')
-                    self.check_auto_send2.setChecked(False)
-                    return
-                    
-                interval = self.spin_interval2.value()
-                self.auto_send_timer2 = QTimer()
-                self.auto_send_timer2.timeout.connect(lambda: self.send_data(2))
-                self.auto_send_timer2.start(interval)
-            # 根据串口选择复选框决定是否显示
-            if (port_index == 1 and self.check_log_port1.isChecked()) or (port_index == 2 and self.check_log_port2.isChecked()):
-                self.log_message(f"串口{port_index}自动发送已启用，间隔: {interval}ms")
-        else:
-            if port_index == 1:
-                if self.auto_send_timer1:
-                    self.auto_send_timer1.stop()
-                    self.auto_send_timer1 = None
-            else:
-                if self.auto_send_timer2:
-                    self.auto_send_timer2.stop()
-                    self.auto_send_timer2 = None
-            # 根据串口选择复选框决定是否显示
-            if (port_index == 1 and self.check_log_port1.isChecked()) or (port_index == 2 and self.check_log_port2.isChecked()):
-                self.log_message(f"串口{port_index}自动发送已禁用")
-            
-    def update_display_format(self, port_index):
+            writer = self.session.capture
+            self.session.set_capture(None)
+            if writer:
+                writer.stop()
+                msg = f"{self.name}录制已停止，共写入 {writer.written} 字节，{writer.file_index} 个文件"
+                if writer.dropped:
+                    msg += f"，丢弃 {writer.dropped} 条记录"
+                if writer.error:
+                    self.log_message(f"{msg}，写入错误: {writer.error}", color='red')
+                else:
+                    self.log_message(msg)
+    
+    def update_display_format(self):
         """更新显示格式"""
-        # 这个方法可以用于实时更新显示格式，目前暂不实现
-        pass
-        
-    def clear_receive(self, port_index):
+        # 切换到十六进制显示前先显示文本模式下未完成的行
+        self.flush_partial_line()
+        self.sync_settings()
+    
+    def clear_receive(self):
         """清除接收区域"""
-        if port_index == 1:
-            self.text_receive1.clear()
-            self.received_count1 = 0
-            self.label_received1.setText('接收: 0 字节')
-        else:
-            self.text_receive2.clear()
-            self.received_count2 = 0
-            self.label_received2.setText('接收: 0 字节')
-        
-    def log_message(self, message, color='black'):
-        """添加日志消息"""
-        from PyQt5.QtCore import QDateTime
-        
-        # 获取当前时间
-        current_time = QDateTime.currentDateTime().toString('hh:mm:ss.zzz')
-        
-        # 格式化消息
-        formatted_message = f'[{current_time}] {message}'
-        
-        # 设置颜色
-        if color == 'red':
-            formatted_message = f'<span style="color: red;">{formatted_message}</span>'
-        elif color == 'green':
-            formatted_message = f'<span style="color: green;">{formatted_message}</span>'
-        elif color == 'blue':
-            formatted_message = f'<span style="color: blue;">{formatted_message}</span>'
-        
-        # 添加到日志区域
-        self.text_log.append(formatted_message)
-        
-        # 自动滚动到底部
-        scrollbar = self.text_log.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-
-    def clear_log(self):
-        """清除日志"""
-        from PyQt5.QtWidgets import QMessageBox
-        
-        reply = QMessageBox.question(
-            self, 
-            '确认清除', 
-            '确定要清除所有日志内容吗？',
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
-            self.text_log.clear()
-            self.log_message("日志已清除")
-
-    def save_log(self):
-        """保存日志到文件"""
-        from PyQt5.QtWidgets import QFileDialog
-        from PyQt5.QtCore import QDateTime
-        
-        # 获取当前时间作为默认文件名
-        current_time = QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss')
-        default_filename = f"serial_debug_log_{current_time}.txt"
-        
-        # 选择保存文件
-        file_path, _ = QFileDialog.getSaveFileName(
-            self,
-            "保存日志文件",
-            default_filename,
-            "文本文件 (*.txt);;所有文件 (*)"
-        )
-        
-        if file_path:
-            try:
-                # 获取日志内容（纯文本）
-                log_content = self.text_log.toPlainText()
-                
-                # 保存到文件
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(log_content)
-                
-                self.log_message(f"日志已保存到: {file_path}", color='green')
-                
-            except Exception as e:
-                self.log_message(f"保存日志失败: {str(e)}", color='red')
-                QMessageBox.critical(self, '错误', f'保存日志失败: {str(e)}')
-
-    def save_config(self):
-        """保存配置"""
-        try:
-            config = {
-                'serial1': {
-                    'port': self.combo_port1.currentText(),
-                    'baud': int(self.combo_baud1.currentText()),
-                    'data_bits': int(self.combo_data1.currentText()),
-                    'stop_bits': self.combo_stop1.currentText(),
-                    'parity': self.combo_parity1.currentText(),
-                    'send_encoding': self.combo_send_encoding1.currentText(),
-                    'recv_encoding': self.combo_encoding1.currentText(),
-                    'auto_newline': self.check_newline1.isChecked(),
-                    'send_history_text': self.send_history1_text,
-                    'send_history_hex': self.send_history1_hex,
-                    'quick_strings': self.quick_strings1
-                },
-                'serial2': {
-                    'port': self.combo_port2.currentText(),
-                    'baud': int(self.combo_baud2.currentText()),
-                    'data_bits': int(self.combo_data2.currentText()),
-                    'stop_bits': self.combo_stop2.currentText(),
-                    'parity': self.combo_parity2.currentText(),
-                    'send_encoding': self.combo_send_encoding2.currentText(),
-                    'recv_encoding': self.combo_encoding2.currentText(),
-                    'auto_newline': self.check_newline2.isChecked(),
-                    'send_history_text': self.send_history2_text,
-                    'send_history_hex': self.send_history2_hex,
-                    'quick_strings': self.quick_strings2
-                }
-            }
-            
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            self.log_message(f"保存配置失败: {e}")
-
-    def load_config(self):
-        """加载配置"""
-        try:
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    
-                    # 加载串口1配置
-                    if 'serial1' in config:
-                        serial1_config = config['serial1']
-                        if 'port' in serial1_config:
-                            self.combo_port1.setCurrentText(serial1_config['port'])
-                        if 'baud' in serial1_config:
-                            self.combo_baud1.setCurrentText(str(serial1_config['baud']))
-                        if 'data_bits' in serial1_config:
-                            self.combo_data1.setCurrentText(str(serial1_config['data_bits']))
-                        if 'stop_bits' in serial1_config:
-                            self.combo_stop1.setCurrentText(str(serial1_config['stop_bits']))
-                        if 'parity' in serial1_config:
-                            self.combo_parity1.setCurrentText(serial1_config['parity'])
-                        if 'send_encoding' in serial1_config:
-                            self.combo_send_encoding1.setCurrentText(serial1_config['send_encoding'])
-                        if 'recv_encoding' in serial1_config:
-                            self.combo_encoding1.setCurrentText(serial1_config['recv_encoding'])
-                        if 'auto_newline' in serial1_config:
-                            self.check_newline1.setChecked(serial1_config['auto_newline'])
-                        if 'send_history_text' in serial1_config:
-                            self.send_history1_text = serial1_config['send_history_text']
-                        if 'send_history_hex' in serial1_config:
-                            self.send_history1_hex = serial1_config['send_history_hex']
-                        if 'quick_strings' in serial1_config:
-                            self.quick_strings1 = serial1_config['quick_strings']
-                            # 确保列表有40个元素
-                            while len(self.quick_strings1) < 40:
-                                self.quick_strings1.append({"label": f"字符串{len(self.quick_strings1)+1}", "content": "", "hex": False})
-                            self.update_quick_strings_buttons(1)
-                    
-                    # 加载串口2配置
-                    if 'serial2' in config:
-                        serial2_config = config['serial2']
-                        if 'port' in serial2_config:
-                            self.combo_port2.setCurrentText(serial2_config['port'])
-                        if 'baud' in serial2_config:
-                            self.combo_baud2.setCurrentText(str(serial2_config['baud']))
-                        if 'data_bits' in serial2_config:
-                            self.combo_data2.setCurrentText(str(serial2_config['data_bits']))
-                        if 'stop_bits' in serial2_config:
-                            self.combo_stop2.setCurrentText(str(serial2_config['stop_bits']))
-                        if 'parity' in serial2_config:
-                            self.combo_parity2.setCurrentText(serial2_config['parity'])
-                        if 'send_encoding' in serial2_config:
-                            self.combo_send_encoding2.setCurrentText(serial2_config['send_encoding'])
-                        if 'recv_encoding' in serial2_config:
-                            self.combo_encoding2.setCurrentText(serial2_config['recv_encoding'])
-                        if 'auto_newline' in serial2_config:
-                            self.check_newline2.setChecked(serial2_config['auto_newline'])
-                        if 'send_history_text' in serial2_config:
-                            self.send_history2_text = serial2_config['send_history_text']
-                        if 'send_history_hex' in serial2_config:
-                            self.send_history2_hex = serial2_config['send_history_hex']
-                        if 'quick_strings' in serial2_config:
-                            self.quick_strings2 = serial2_config['quick_strings']
-                            # 确保列表有40个元素
-                            while len(self.quick_strings2) < 40:
-                                self.quick_strings2.append({"label": f"字符串{len(self.quick_strings2)+1}", "content": "", "hex": False})
-                            self.update_quick_strings_buttons(2)
-                
-                # 更新历史记录下拉框
-                self.update_history_combo(1)
-                self.update_history_combo(2)
-                
-        except Exception as e:
-            self.log_message(f"加载配置失败: {e}")
-            
-    def closeEvent(self, event):
-        """程序关闭事件"""
-        # 断开串口连接
-        if self.serial_port1 and self.serial_port1.is_open:
-            self.disconnect_serial(1)
-        if self.serial_port2 and self.serial_port2.is_open:
-            self.disconnect_serial(2)
-        
-        # 保存配置
-        self.save_config()
-        event.accept()
-
+        self.text_receive.clear()
+        self.session.text_assembler.reset()
+        self.line_flush_timer.stop()
+        self.session.received_count = 0
+        self.session.frame_count = 0
+        self.session.checksum_errors = 0
+        self.update_counters()
+    
     def on_hex_send_toggled(self, checked):
         """十六进制发送选项切换事件"""
-        # 获取发送信号的控件
-        sender = self.sender()
-        
-        if sender == self.check_hex_send1:
-            if checked:
-                # 选择十六进制发送时，记住当前自动换行状态并禁用
-                self.newline_state1 = self.check_newline1.isChecked()
-                self.check_newline1.setChecked(False)
-                self.check_newline1.setEnabled(False)
-            else:
-                # 取消十六进制发送时，恢复自动换行状态
-                self.check_newline1.setEnabled(True)
-                self.check_newline1.setChecked(self.newline_state1)
-        elif sender == self.check_hex_send2:
-            if checked:
-                # 选择十六进制发送时，记住当前自动换行状态并禁用
-                self.newline_state2 = self.check_newline2.isChecked()
-                self.check_newline2.setChecked(False)
-                self.check_newline2.setEnabled(False)
-            else:
-                # 取消十六进制发送时，恢复自动换行状态
-                self.check_newline2.setEnabled(True)
-                self.check_newline2.setChecked(self.newline_state2)
-                
-    def add_to_history(self, data, port_index, is_hex=False):
-        """添加数据到发送历史"""
-        if port_index == 1:
-            if is_hex:
-                history = self.send_history1_hex
-            else:
-                history = self.send_history1_text
-            combo = self.combo_history1
+        if checked:
+            # 选择十六进制发送时，记住当前自动换行状态并禁用
+            self.newline_state = self.check_newline.isChecked()
+            self.check_newline.setChecked(False)
+            self.check_newline.setEnabled(False)
         else:
-            if is_hex:
-                history = self.send_history2_hex
-            else:
-                history = self.send_history2_text
-            combo = self.combo_history2
-            
-        # 如果数据已存在，先移除
-        if data in history:
-            history.remove(data)
-            
-        # 添加到开头
-        history.insert(0, data)
-        
-        # 限制历史记录数量
-        if len(history) > self.max_history:
-            history.pop()
-            
+            # 取消十六进制发送时，恢复自动换行状态
+            self.check_newline.setEnabled(True)
+            self.check_newline.setChecked(self.newline_state)
+    
+    def add_to_history(self, data, is_hex=False):
+        """添加数据到发送历史"""
+        self.session.add_history(data, is_hex)
         # 更新下拉框
-        self.update_history_combo(port_index)
-        
-    def update_history_combo(self, port_index):
+        self.update_history_combo()
+    
+    def update_history_combo(self):
         """更新历史记录下拉框"""
-        if port_index == 1:
-            combo = self.combo_history1
-            text_history = self.send_history1_text
-            hex_history = self.send_history1_hex
-        else:
-            combo = self.combo_history2
-            text_history = self.send_history2_text
-            hex_history = self.send_history2_hex
-            
+        combo = self.combo_history
         combo.clear()
         
         # 添加文本历史记录
-        if text_history:
+        if self.session.send_history_text:
             combo.addItem("--- 文本历史 ---")
-            for item in text_history:
+            for item in self.session.send_history_text:
                 combo.addItem(item)
-                
+        
         # 添加十六进制历史记录
-        if hex_history:
+        if self.session.send_history_hex:
             combo.addItem("--- 十六进制历史 ---")
-            for item in hex_history:
+            for item in self.session.send_history_hex:
                 combo.addItem(item)
-
-    def on_history_selected(self, text, port_index):
+    
+    def on_history_selected(self, text):
         """历史记录下拉框选择事件"""
         # 忽略分隔符
         if text.startswith("---") or not text:
             return
-            
-        if port_index == 1:
-            self.edit_send1.setText(text)
-        else:
-            self.edit_send2.setText(text)
-            
-    def quick_send_string(self, string_index, port_index):
+        self.edit_send.setText(text)
+    
+    def quick_send_string(self, string_index):
         """快速发送预设字符串"""
-        if port_index == 1:
-            if not self.serial_port1 or not self.serial_port1.is_open:
-                QMessageBox.warning(self, '警告', '请先连接串口1')
-                return
-            # 检查索引是否有效
-            if string_index >= len(self.quick_strings1):
-                QMessageBox.warning(self, '警告', f'词条{string_index+1}不存在')
-                return
-            string_info = self.quick_strings1[string_index]
-            edit_send = self.edit_send1
-            check_hex = self.check_hex_send1
-            check_newline = self.check_newline1
-            combo_encoding = self.combo_send_encoding1
-            combo_receive_encoding = self.combo_encoding1
-            check_show_time = self.check_show_time1
-            serial_port = self.serial_port1
-            sent_count = self.sent_count1
-            label_sent = self.label_sent1
-        else:
-            if not self.serial_port2 or not self.serial_port2.is_open:
-                QMessageBox.warning(self, '警告', '请先连接串口2')
-                return
-            # 检查索引是否有效
-            if string_index >= len(self.quick_strings2):
-                QMessageBox.warning(self, '警告', f'词条{string_index+1}不存在')
-                return
-            string_info = self.quick_strings2[string_index]
-            edit_send = self.edit_send2
-            check_hex = self.check_hex_send2
-            check_newline = self.check_newline2
-            combo_encoding = self.combo_send_encoding2
-            combo_receive_encoding = self.combo_encoding2
-            check_show_time = self.check_show_time2
-            serial_port = self.serial_port2
-            sent_count = self.sent_count2
-            label_sent = self.label_sent2
-            
+        if not self.session.is_open:
+            QMessageBox.warning(self, '警告', f'请先连接{self.name}')
+            return
+        quick_strings = self.session.quick_strings
+        # 检查索引是否有效
+        if string_index >= len(quick_strings):
+            QMessageBox.warning(self, '警告', f'词条{string_index+1}不存在')
+            return
+        string_info = quick_strings[string_index]
+        
         # 检查词条内容是否为空
         if not string_info['content']:
             QMessageBox.warning(self, '警告', f'词条{string_index+1}内容为空')
             return
-            
-        # 获取字符串内容
-        data = string_info["content"]
-        is_hex = string_info["hex"]
         
+        is_hex = string_info["hex"]
         try:
-            if is_hex:
-                # 十六进制发送
-                data = data.replace(' ', '')
-                if len(data) % 2 != 0:
-                    QMessageBox.warning(self, '警告', '十六进制数据长度必须为偶数')
-                    return
-                try:
-                    send_bytes = bytes.fromhex(data)
-                except ValueError:
-                    QMessageBox.warning(self, '警告', '无效的十六进制数据')
-                    return
-            else:
-                # 文本发送
-                encoding = combo_encoding.currentText()
-                try:
-                    send_bytes = data.encode(encoding, errors='replace')
-                except LookupError:
-                    QMessageBox.warning(self, '警告', f'不支持的编码格式: {encoding}')
-                    return
-                except Exception as e:
-                    QMessageBox.warning(self, '警告', f'编码失败: {str(e)}')
-                    return
-                    
-            # 根据当前设置决定是否添加换行符
-            if is_hex:
-                # 十六进制发送时不添加换行符
-                pass
-            elif check_newline.isChecked():
-                send_bytes += b'\r\n'
-                
-            # 发送数据
-            serial_port.write(send_bytes)
-            sent_count += len(send_bytes)
-            label_sent.setText(f'发送: {sent_count} 字节')
+            # 根据当前设置决定是否添加换行符，文本使用接收编码显示
+            self.sync_settings()
+            try:
+                data, send_bytes, display_data = self.session.encode(string_info["content"], is_hex)
+            except ValueError as e:
+                QMessageBox.warning(self, '警告', str(e))
+                return
             
-            # 更新计数
-            if port_index == 1:
-                self.sent_count1 = sent_count
-            else:
-                self.sent_count2 = sent_count
+            # 交给发送线程写出，写完后再显示
+            if not self.queue_send(send_bytes, (f'{self.name}快速发送', display_data)):
+                return
             
             # 添加到发送历史
-            self.add_to_history(data, port_index, is_hex)
-            
-            # 显示发送的数据
-            if is_hex:
-                display_data = ' '.join([f'{b:02X}' for b in send_bytes])
-            else:
-                # 显示发送的数据（使用接收编码显示）
-                receive_encoding = combo_receive_encoding.currentText()
-                try:
-                    display_data = send_bytes.decode(receive_encoding, errors='replace')
-                except:
-                    display_data = send_bytes.decode('utf-8', errors='replace')
-                
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3] if check_show_time.isChecked() else ''
-            send_msg = f"[串口{port_index}快速发送] {timestamp} {display_data}"
-            self.log_message(send_msg, color='blue')
-            
+            self.add_to_history(data, is_hex)
+        
         except Exception as e:
             QMessageBox.critical(self, '错误', f'快速发送失败: {str(e)}')
-            
-    def update_quick_strings_buttons(self, port_index):
+    
+    def update_quick_strings_buttons(self):
         """更新快速字符串按钮的标签"""
-        if port_index == 1:
-            # 更新串口1的按钮
-            for i, button in enumerate(self.quick_string_buttons1):
-                if i < len(self.quick_strings1) and self.quick_strings1[i]['content']:
-                    content = self.quick_strings1[i]['content']
-                    is_hex = self.quick_strings1[i].get('hex', False)
-                    if len(content) > 10:
-                        display_text = content[:8] + ".."
-                    else:
-                        display_text = content
-                    type_text = "十六进制" if is_hex else "文本"
-                    button.setText(display_text)
-                    button.setToolTip(f"词条{i+1}: {content}\n类型: {type_text}\n右键点击可编辑词条")
-                    button.setVisible(True)
-                else:
-                    button.setVisible(False)
-        else:
-            # 更新串口2的按钮
-            for i, button in enumerate(self.quick_string_buttons2):
-                if i < len(self.quick_strings2) and self.quick_strings2[i]['content']:
-                    content = self.quick_strings2[i]['content']
-                    is_hex = self.quick_strings2[i].get('hex', False)
-                    if len(content) > 10:
-                        display_text = content[:8] + ".."
-                    else:
-                        display_text = content
-                    type_text = "十六进制" if is_hex else "文本"
-                    button.setText(display_text)
-                    button.setToolTip(f"词条{i+1}: {content}\n类型: {type_text}\n右键点击可编辑词条")
-                    button.setVisible(True)
+        quick_strings = self.session.quick_strings
+        for i, button in enumerate(self.quick_string_buttons):
+            if i < len(quick_strings) and quick_strings[i]['content']:
+                content = quick_strings[i]['content']
+                is_hex = quick_strings[i].get('hex', False)
+                if len(content) > 10:
+                    display_text = content[:8] + ".."
                 else:
-                    button.setVisible(False)
-
-    def import_sscom_config(self, port_num):
+                    display_text = content
+                type_text = "十六进制" if is_hex else "文本"
+                button.setText(display_text)
+                button.setToolTip(f"词条{i+1}: {content}\n类型: {type_text}\n右键点击可编辑词条")
+                button.setVisible(True)
+            else:
+                button.setVisible(False)
+    
+    def import_sscom_config(self):
         """导入SSCOM配置文件"""
-        from PyQt5.QtWidgets import QFileDialog
-        
         # 选择SSCOM配置文件
         file_path, _ = QFileDialog.getOpenFileName(
             self,
-            f"选择SSCOM.ini配置文件 - 串口{port_num}",
+            f"选择SSCOM.ini配置文件 - {self.name}",
             "",
             "SSCOM配置文件 (*.ini);;所有文件 (*)"
         )
@@ -1465,117 +1126,52 @@ class SerialDebugger(QWidget):
                 
                 if quick_strings:
                     # 只导入多条字符串配置
-                    if port_num == 1:
-                        self.quick_strings1 = quick_strings
-                        self.update_quick_strings_buttons(1)
-                    else:
-                        self.quick_strings2 = quick_strings
-                        self.update_quick_strings_buttons(2)
+                    self.session.quick_strings = quick_strings
+                    self.update_quick_strings_buttons()
                     
                     # 立即保存配置
-                    self.save_config()
+                    self.debugger.save_config()
                     
-                    self.log_message(f"串口{port_num}：成功从SSCOM.ini导入{len(quick_strings)}个词条")
+                    self.log_message(f"{self.name}：成功从SSCOM.ini导入{len(quick_strings)}个词条")
                 else:
-                    self.log_message(f"串口{port_num}：未在SSCOM.ini文件中找到有效的词条配置")
-                    
+                    self.log_message(f"{self.name}：未在SSCOM.ini文件中找到有效的词条配置")
+            
             except Exception as e:
-                self.log_message(f"串口{port_num}：导入SSCOM.ini词条失败 - {e}")
-
+                self.log_message(f"{self.name}：导入SSCOM.ini词条失败 - {e}")
+    
     def parse_sscom_quick_strings(self, file_path):
         """解析SSCOM配置文件中的多条字符串"""
-        quick_strings = []
         try:
-            with open(file_path, 'r', encoding='gbk') as f:  # SSCOM通常使用GBK编码
-                content = f.read()
-                
-            # 尝试解析新的SSCOM格式：N1xx定义词条信息，Nx定义词条内容
-            for i in range(1, 101):  # 支持最多100个快速字符串
-                # 查找词条信息行 N1xx=类型,名称,延时
-                info_match = re.search(rf'N1{i:02d}=(\d+),([^,]*),(\d+)', content)
-                if info_match:
-                    # 查找对应的词条内容行 Nx=类型,内容
-                    content_match = re.search(rf'N{i}=([HA]),([^\r\n]*)', content)
-                    if content_match:
-                        content_type = content_match.group(1)  # H=十六进制, A=ASCII
-                        content_data = content_match.group(2).strip()
-                        name = info_match.group(2).strip()
-                        
-                        if content_data:  # 只处理有内容的词条
-                            # 判断是否为十六进制
-                            is_hex = (content_type == 'H')
-                            
-                            # 创建与程序期望格式一致的数据结构
-                            quick_strings.append({
-                                'content': content_data,  # 内容
-                                'hex': is_hex,           # 是否十六进制
-                                'label': f'字符串{i}'    # 按钮标签
-                            })
-            
-            # 如果没有找到新格式，尝试解析旧格式
-            if not quick_strings:
-                for i in range(1, 41):  # 支持40个快速字符串
-                    # 查找字符串内容
-                    str_match = re.search(rf'Str{i}=(.+)', content)
-                    if str_match:
-                        str_content = str_match.group(1).strip()
-                        if str_content:
-                            # 检查是否为十六进制
-                            is_hex = False
-                            hex_match = re.search(rf'Hex{i}=(\w+)', content)
-                            if hex_match and hex_match.group(1).lower() == 'true':
-                                is_hex = True
-                            
-                            # 创建与程序期望格式一致的数据结构
-                            quick_strings.append({
-                                'content': str_content,  # 内容
-                                'hex': is_hex,           # 是否十六进制
-                                'label': f'字符串{i}'    # 按钮标签
-                            })
-            
-            return quick_strings
-            
+            return parse_sscom_quick_strings(file_path)
         except Exception as e:
             self.log_message(f"解析SSCOM快速字符串失败: {e}")
             return []
-
-    def show_quick_string_menu(self, pos, string_index, port_index):
+    
+    def show_quick_string_menu(self, pos, string_index):
         """显示快速字符串右键菜单"""
-        from PyQt5.QtWidgets import QMenu
-        
         menu = QMenu()
         
         # 编辑词条
         edit_action = menu.addAction("编辑词条")
-        edit_action.triggered.connect(lambda: self.edit_quick_string(string_index, port_index))
+        edit_action.triggered.connect(lambda: self.edit_quick_string(string_index))
         
         # 删除词条
         delete_action = menu.addAction("删除词条")
-        delete_action.triggered.connect(lambda: self.delete_quick_string(string_index, port_index))
+        delete_action.triggered.connect(lambda: self.delete_quick_string(string_index))
         
         # 显示菜单
-        if port_index == 1:
-            button = self.quick_string_buttons1[string_index]
-        else:
-            button = self.quick_string_buttons2[string_index]
-        
+        button = self.quick_string_buttons[string_index]
         menu.exec_(button.mapToGlobal(pos))
-
-    def edit_quick_string(self, string_index, port_index):
+    
+    def edit_quick_string(self, string_index):
         """编辑快速字符串"""
-        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QCheckBox, QPushButton
+        quick_strings = self.session.quick_strings
         
         # 获取当前词条信息
-        if port_index == 1:
-            if string_index < len(self.quick_strings1):
-                current_string = self.quick_strings1[string_index]
-            else:
-                current_string = {'content': '', 'hex': False, 'label': f'字符串{string_index+1}'}
+        if string_index < len(quick_strings):
+            current_string = quick_strings[string_index]
         else:
-            if string_index < len(self.quick_strings2):
-                current_string = self.quick_strings2[string_index]
-            else:
-                current_string = {'content': '', 'hex': False, 'label': f'字符串{string_index+1}'}
+            current_string = {'content': '', 'hex': False, 'label': f'字符串{string_index+1}'}
         
         # 创建编辑对话框
         dialog = QDialog(self)
@@ -1597,6 +1193,16 @@ class SerialDebugger(QWidget):
         hex_check.setChecked(current_string['hex'])
         layout.addWidget(hex_check)
         
+        # 命令序列由词条生成时，发送后延时
+        delay_layout = QHBoxLayout()
+        delay_layout.addWidget(QLabel("发送后延时(ms):"))
+        delay_spin = QSpinBox()
+        delay_spin.setRange(0, 3600000)
+        delay_spin.setValue(int(current_string.get('delay', 0)))
+        delay_layout.addWidget(delay_spin)
+        delay_layout.addStretch()
+        layout.addLayout(delay_layout)
+        
         # 按钮
         button_layout = QHBoxLayout()
         ok_button = QPushButton("确定")
@@ -1613,71 +1219,1388 @@ class SerialDebugger(QWidget):
         
         # 显示对话框
         if dialog.exec_() == QDialog.Accepted:
-            # 保存修改
-            new_content = content_edit.text().strip()
-            new_hex = hex_check.isChecked()
+            # 确保列表长度足够
+            while len(quick_strings) <= string_index:
+                quick_strings.append({'content': '', 'hex': False, 'label': f'字符串{len(quick_strings)+1}'})
             
-            if port_index == 1:
-                # 确保列表长度足够
-                while len(self.quick_strings1) <= string_index:
-                    self.quick_strings1.append({'content': '', 'hex': False, 'label': f'字符串{len(self.quick_strings1)+1}'})
-                
-                self.quick_strings1[string_index] = {
-                    'content': new_content,
-                    'hex': new_hex,
-                    'label': f'字符串{string_index+1}'
-                }
-                self.update_quick_strings_buttons(1)
-            else:
-                # 确保列表长度足够
-                while len(self.quick_strings2) <= string_index:
-                    self.quick_strings2.append({'content': '', 'hex': False, 'label': f'字符串{len(self.quick_strings2)+1}'})
-                
-                self.quick_strings2[string_index] = {
-                    'content': new_content,
-                    'hex': new_hex,
-                    'label': f'字符串{string_index+1}'
-                }
-                self.update_quick_strings_buttons(2)
+            # 保存修改
+            quick_strings[string_index] = {
+                'content': content_edit.text().strip(),
+                'hex': hex_check.isChecked(),
+                'label': f'字符串{string_index+1}',
+                'delay': delay_spin.value()
+            }
+            self.update_quick_strings_buttons()
             
             # 保存配置
-            self.save_config()
+            self.debugger.save_config()
             
-            self.log_message(f"串口{port_index}：词条{string_index+1}已更新")
-
-    def delete_quick_string(self, string_index, port_index):
+            self.log_message(f"{self.name}：词条{string_index+1}已更新")
+    
+    def delete_quick_string(self, string_index):
         """删除快速字符串"""
-        from PyQt5.QtWidgets import QMessageBox
-        
         reply = QMessageBox.question(
-            self, 
-            '确认删除', 
+            self,
+            '确认删除',
             f'确定要删除词条{string_index+1}吗？',
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
         
         if reply == QMessageBox.Yes:
-            if port_index == 1:
-                if string_index < len(self.quick_strings1):
-                    # 删除当前词条，后面的词条自动递进
-                    del self.quick_strings1[string_index]
-                    # 在末尾添加一个空词条，保持列表长度
-                    self.quick_strings1.append({'content': '', 'hex': False, 'label': f'字符串{len(self.quick_strings1)+1}'})
-                    self.update_quick_strings_buttons(1)
-            else:
-                if string_index < len(self.quick_strings2):
-                    # 删除当前词条，后面的词条自动递进
-                    del self.quick_strings2[string_index]
-                    # 在末尾添加一个空词条，保持列表长度
-                    self.quick_strings2.append({'content': '', 'hex': False, 'label': f'字符串{len(self.quick_strings2)+1}'})
-                    self.update_quick_strings_buttons(2)
+            quick_strings = self.session.quick_strings
+            if string_index < len(quick_strings):
+                # 删除当前词条，后面的词条自动递进
+                del quick_strings[string_index]
+                # 在末尾添加一个空词条，保持列表长度
+                quick_strings.append({'content': '', 'hex': False, 'label': f'字符串{len(quick_strings)+1}'})
+                self.update_quick_strings_buttons()
             
             # 保存配置
-            self.save_config()
+            self.debugger.save_config()
             
-            self.log_message(f"串口{port_index}：词条{string_index+1}已删除，后续词条已递进")
+            self.log_message(f"{self.name}：词条{string_index+1}已删除，后续词条已递进")
 
+class TransactionDialog(QDialog):
+    """请求/应答事务测试窗口：选择请求，重复发送并统计每条命令的往返延迟"""
+    
+    COLUMNS = ['命令', '成功', '超时', '最小(ms)', 'p50(ms)', 'p99(ms)', '最大(ms)']
+    
+    def __init__(self, tab):
+        super().__init__(tab)
+        self.tab = tab
+        self.runner = None
+        self.setWindowTitle(f'事务测试 - {tab.name}')
+        self.resize(640, 480)
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel('请求(可多选，每轮依次发送):'))
+        self.list_requests = QListWidget()
+        layout.addWidget(self.list_requests)
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel('轮数:'))
+        self.spin_rounds = QSpinBox()
+        self.spin_rounds.setRange(1, 1000000)
+        self.spin_rounds.setValue(100)
+        options_layout.addWidget(self.spin_rounds)
+        options_layout.addWidget(QLabel('间隔(ms):'))
+        self.spin_interval = QSpinBox()
+        self.spin_interval.setRange(0, 60000)
+        self.spin_interval.setValue(100)
+        options_layout.addWidget(self.spin_interval)
+        options_layout.addWidget(QLabel('超时(ms):'))
+        self.spin_timeout = QSpinBox()
+        self.spin_timeout.setRange(1, 60000)
+        self.spin_timeout.setValue(int(DEFAULT_TRANSACTION_TIMEOUT * 1000))
+        options_layout.addWidget(self.spin_timeout)
+        self.check_show = QCheckBox('日志显示请求')
+        options_layout.addWidget(self.check_show)
+        layout.addLayout(options_layout)
+        
+        pattern_layout = QHBoxLayout()
+        pattern_layout.addWidget(QLabel('应答匹配:'))
+        self.edit_pattern = QLineEdit()
+        self.edit_pattern.setPlaceholderText('正则表达式，留空时请求后收到的第一帧即应答(需设置分帧)')
+        pattern_layout.addWidget(self.edit_pattern)
+        layout.addLayout(pattern_layout)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        button_layout = QHBoxLayout()
+        self.label_progress = QLabel('')
+        button_layout.addWidget(self.label_progress)
+        button_layout.addStretch()
+        self.btn_start = QPushButton('开始')
+        self.btn_start.clicked.connect(self.toggle_run)
+        button_layout.addWidget(self.btn_start)
+        self.btn_export = QPushButton('导出')
+        self.btn_export.clicked.connect(self.export_results)
+        button_layout.addWidget(self.btn_export)
+        btn_close = QPushButton('关闭')
+        btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        
+        # 测试过程中定时刷新统计表
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.update_results)
+    
+    def refresh_requests(self):
+        """列出发送框、快速字符串和发送历史中的内容，保留已勾选的项"""
+        checked = {self.list_requests.item(i).data(Qt.UserRole) for i in range(self.list_requests.count())
+                   if self.list_requests.item(i).checkState() == Qt.Checked}
+        session = self.tab.session
+        candidates = []
+        text = self.tab.edit_send.text().strip()
+        if text:
+            candidates.append(('发送框', text, self.tab.check_hex_send.isChecked()))
+        for string_info in session.quick_strings:
+            if string_info['content']:
+                candidates.append((string_info['label'], string_info['content'], string_info.get('hex', False)))
+        candidates += [('历史', data, False) for data in session.send_history_text]
+        candidates += [('历史(HEX)', data, True) for data in session.send_history_hex]
+        
+        self.list_requests.clear()
+        seen = set()
+        for source, content, is_hex in candidates:
+            key = (content, is_hex)
+            if key in seen:
+                continue
+            seen.add(key)
+            item = QListWidgetItem(f'{source}: {content}')
+            item.setData(Qt.UserRole, key)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if key in checked else Qt.Unchecked)
+            self.list_requests.addItem(item)
+    
+    def toggle_run(self):
+        if self.runner and not self.runner.finished:
+            self.stop()
+        else:
+            self.start()
+    
+    def start(self):
+        tab = self.tab
+        session = tab.session
+        if not session.is_open:
+            QMessageBox.warning(self, '警告', f'请先连接{tab.name}')
+            return
+        
+        tab.sync_settings()
+        requests = []
+        for i in range(self.list_requests.count()):
+            item = self.list_requests.item(i)
+            if item.checkState() != Qt.Checked:
+                continue
+            content, is_hex = item.data(Qt.UserRole)
+            try:
+                _, send_bytes, display_data = session.encode(content, is_hex)
+            except ValueError as e:
+                QMessageBox.warning(self, '警告', f'{content}: {e}')
+                return
+            requests.append((content, send_bytes, display_data if self.check_show.isChecked() else None))
+        if not requests:
+            QMessageBox.warning(self, '警告', '请勾选至少一条请求')
+            return
+        
+        pattern = None
+        if self.edit_pattern.text():
+            try:
+                pattern = re.compile(self.edit_pattern.text().encode(session.settings['recv_encoding']))
+            except (re.error, LookupError) as e:
+                QMessageBox.warning(self, '警告', f'应答匹配表达式无效: {e}')
+                return
+        
+        self.runner = TransactionRunner(session, requests, self.spin_rounds.value(),
+                                        self.spin_interval.value() / 1000, self.spin_timeout.value() / 1000,
+                                        pattern, f'{tab.name}事务')
+        self.runner.start()
+        self.btn_start.setText('停止')
+        self.update_timer.start()
+        tab.log_message(f"{tab.name}开始事务测试: {len(requests)} 条请求 × {self.spin_rounds.value()} 轮")
+    
+    def stop(self):
+        """停止测试，可重复调用"""
+        if self.runner and not self.runner.finished:
+            self.runner.stop()
+        if self.update_timer.isActive():
+            self.update_results()
+    
+    def update_results(self):
+        runner = self.runner
+        if not runner:
+            return
+        stats = list(runner.stats.values())
+        self.table.setRowCount(len(stats))
+        for row, item in enumerate(stats):
+            histogram = item.histogram
+            values = [item.name, str(histogram.count), str(item.timeouts)]
+            if histogram.count:
+                values += [f'{histogram.min / 1e6:.3f}', f'{histogram.percentile(50) / 1e6:.3f}',
+                           f'{histogram.percentile(99) / 1e6:.3f}', f'{histogram.max / 1e6:.3f}']
+            else:
+                values += ['-'] * 4
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        self.label_progress.setText(f'进度: {runner.completed}/{runner.total}')
+        
+        if runner.finished:
+            self.update_timer.stop()
+            self.btn_start.setText('开始')
+            self.tab.log_messages([f"{self.tab.name}事务测试结束 {item.summary()}" for item in stats])
+    
+    def export_results(self):
+        """导出各命令的延迟统计"""
+        if not self.runner:
+            QMessageBox.warning(self, '警告', '还没有测试结果')
+            return
+        current_time = QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss')
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            f"导出事务统计 - {self.tab.name}",
+            f"transactions_port{self.tab.session.index}_{current_time}.json",
+            "JSON文件(含直方图) (*.json);;CSV文件 (*.csv)"
+        )
+        if not file_path:
+            return
+        try:
+            export_transaction_stats(list(self.runner.stats.values()), file_path)
+            self.tab.log_message(f"事务统计已导出到: {file_path}", color='green')
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'导出失败: {str(e)}')
+
+class SequenceDialog(QDialog):
+    """命令序列窗口：编辑脚本，在后台线程中按步骤执行并统计每一步的耗时"""
+    
+    COLUMNS = ['行', '步骤', '次数', '超时', 'p50(ms)', 'p99(ms)', '最大(ms)']
+    
+    def __init__(self, tab):
+        super().__init__(tab)
+        self.tab = tab
+        self.runner = None
+        self.setWindowTitle(f'命令序列 - {tab.name}')
+        self.resize(720, 560)
+        
+        layout = QVBoxLayout()
+        self.edit_script = QPlainTextEdit()
+        self.edit_script.setFont(QFont('Consolas', 9))
+        self.edit_script.setPlainText(tab.session.sequence or SEQUENCE_HELP)
+        layout.addWidget(self.edit_script)
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel('轮数:'))
+        self.spin_repeat = QSpinBox()
+        self.spin_repeat.setRange(0, 100000000)
+        self.spin_repeat.setSpecialValueText('无限')
+        self.spin_repeat.setValue(1)
+        options_layout.addWidget(self.spin_repeat)
+        self.check_show = QCheckBox('日志显示发送')
+        self.check_show.setChecked(True)
+        options_layout.addWidget(self.check_show)
+        options_layout.addStretch()
+        btn_generate = QPushButton('由快速字符串生成')
+        btn_generate.setToolTip('按词条顺序生成发送步骤，从SSCOM导入的延时转为delay步骤')
+        btn_generate.clicked.connect(self.generate_from_quick_strings)
+        options_layout.addWidget(btn_generate)
+        layout.addLayout(options_layout)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        button_layout = QHBoxLayout()
+        self.label_progress = QLabel('')
+        button_layout.addWidget(self.label_progress)
+        button_layout.addStretch()
+        self.btn_start = QPushButton('开始')
+        self.btn_start.clicked.connect(self.toggle_run)
+        button_layout.addWidget(self.btn_start)
+        btn_close = QPushButton('关闭')
+        btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        
+        # 执行过程中定时刷新统计表
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.update_results)
+    
+    def generate_from_quick_strings(self):
+        self.edit_script.setPlainText(sequence_from_quick_strings(self.tab.session.quick_strings))
+    
+    def save_script(self):
+        """脚本保存到串口配置中"""
+        script = self.edit_script.toPlainText()
+        if script != self.tab.session.sequence:
+            self.tab.session.sequence = script
+            self.tab.debugger.save_config()
+    
+    def toggle_run(self):
+        if self.runner and not self.runner.finished:
+            self.stop()
+        else:
+            self.start()
+    
+    def start(self):
+        tab = self.tab
+        session = tab.session
+        if not session.is_open:
+            QMessageBox.warning(self, '警告', f'请先连接{tab.name}')
+            return
+        
+        tab.sync_settings()
+        self.save_script()
+        try:
+            steps = parse_sequence(self.edit_script.toPlainText())
+            if not steps:
+                raise ValueError('脚本中没有步骤')
+            self.runner = SequenceRunner(session, steps, self.spin_repeat.value(),
+                                         self.check_show.isChecked(), f'{tab.name}序列')
+        except ValueError as e:
+            QMessageBox.warning(self, '警告', str(e))
+            return
+        self.runner.start()
+        self.btn_start.setText('停止')
+        self.update_timer.start()
+        tab.log_message(f"{tab.name}开始执行命令序列: {len(steps)} 步 × {self.spin_repeat.text()} 轮")
+    
+    def stop(self):
+        """停止执行，可重复调用"""
+        if self.runner and not self.runner.finished:
+            self.runner.stop()
+        if self.update_timer.isActive():
+            self.update_results()
+    
+    def closeEvent(self, event):
+        self.save_script()
+        super().closeEvent(event)
+    
+    def update_results(self):
+        runner = self.runner
+        if not runner:
+            return
+        self.table.setRowCount(len(runner.stats))
+        for row, item in enumerate(runner.stats):
+            histogram = item.histogram
+            values = [str(item.step.line), item.step.text, str(item.count), str(item.timeouts)]
+            if histogram.count:
+                values += [f'{histogram.percentile(50) / 1e6:.3f}', f'{histogram.percentile(99) / 1e6:.3f}',
+                           f'{histogram.max / 1e6:.3f}']
+            else:
+                values += ['-'] * 3
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        progress = f'已完成 {runner.iterations} 轮'
+        if runner.current is not None:
+            progress += f'，当前第 {runner.steps[runner.current].line} 行'
+        self.label_progress.setText(progress)
+        
+        if runner.finished:
+            self.update_timer.stop()
+            self.btn_start.setText('开始')
+            self.tab.log_messages([f"{self.tab.name}命令序列结束，共 {runner.iterations} 轮"] +
+                                  [f"{self.tab.name}序列 {item.summary()}" for item in runner.stats
+                                   if item.histogram.count or item.timeouts or item.errors])
+
+class FileSendDialog(QDialog):
+    """发送文件窗口：选择文件和分块参数，在后台线程中发送并显示进度和速度"""
+    
+    def __init__(self, tab):
+        super().__init__(tab)
+        self.tab = tab
+        self.file_sender = None
+        self.setWindowTitle(f'发送文件 - {tab.name}')
+        self.resize(560, 260)
+        
+        layout = QVBoxLayout()
+        path_layout = QHBoxLayout()
+        path_layout.addWidget(QLabel('文件:'))
+        self.edit_path = QLineEdit()
+        path_layout.addWidget(self.edit_path)
+        btn_browse = QPushButton('浏览')
+        btn_browse.clicked.connect(self.browse)
+        path_layout.addWidget(btn_browse)
+        layout.addLayout(path_layout)
+        
+        protocol_layout = QHBoxLayout()
+        protocol_layout.addWidget(QLabel('协议:'))
+        self.combo_protocol = QComboBox()
+        self.combo_protocol.addItems([FILE_PROTOCOL_RAW] + list(MODEM_PROTOCOLS))
+        self.combo_protocol.setToolTip('原始数据: 按下面的分块参数直接发送\n'
+                                       'XMODEM/XMODEM-1K/YMODEM: 按协议分块、校验和重发，传输期间接收数据不显示')
+        self.combo_protocol.currentTextChanged.connect(self.on_protocol_changed)
+        protocol_layout.addWidget(self.combo_protocol)
+        protocol_layout.addStretch()
+        layout.addLayout(protocol_layout)
+        
+        options_layout = QGridLayout()
+        options_layout.addWidget(QLabel('块大小(字节):'), 0, 0)
+        self.spin_chunk = QSpinBox()
+        self.spin_chunk.setRange(1, 1024 * 1024)
+        self.spin_chunk.setValue(DEFAULT_FILE_CHUNK_SIZE)
+        options_layout.addWidget(self.spin_chunk, 0, 1)
+        options_layout.addWidget(QLabel('块间延时(ms):'), 0, 2)
+        self.spin_delay = QSpinBox()
+        self.spin_delay.setRange(0, 60000)
+        options_layout.addWidget(self.spin_delay, 0, 3)
+        self.check_hex_text = QCheckBox('十六进制文本文件')
+        self.check_hex_text.setToolTip('文件内容为空白或逗号分隔的十六进制数，如"01 03 00 00"，转换后发送')
+        options_layout.addWidget(self.check_hex_text, 0, 4)
+        options_layout.addWidget(QLabel('每块等待应答:'), 1, 0)
+        self.edit_ack = QLineEdit()
+        self.edit_ack.setPlaceholderText('正则表达式，留空不等待')
+        options_layout.addWidget(self.edit_ack, 1, 1, 1, 3)
+        self.check_cts = QCheckBox('发送前等待CTS')
+        options_layout.addWidget(self.check_cts, 1, 4)
+        options_layout.addWidget(QLabel('等待超时(ms):'), 2, 0)
+        self.spin_timeout = QSpinBox()
+        self.spin_timeout.setRange(1, 600000)
+        self.spin_timeout.setValue(int(DEFAULT_FILE_WAIT_TIMEOUT * 1000))
+        options_layout.addWidget(self.spin_timeout, 2, 1)
+        layout.addLayout(options_layout)
+        
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 1000)
+        self.progress.setTextVisible(False)
+        layout.addWidget(self.progress)
+        self.label_progress = QLabel('')
+        layout.addWidget(self.label_progress)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.btn_start = QPushButton('开始')
+        self.btn_start.clicked.connect(self.toggle_run)
+        button_layout.addWidget(self.btn_start)
+        btn_close = QPushButton('关闭')
+        btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        
+        # 发送过程中定时刷新进度
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.update_progress)
+    
+    def browse(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, f"选择要发送的文件 - {self.tab.name}", "",
+                                                   "所有文件 (*);;二进制文件 (*.bin);;十六进制文本 (*.txt *.hex)")
+        if file_path:
+            self.edit_path.setText(file_path)
+    
+    def on_protocol_changed(self, protocol):
+        """传输协议自带分块和应答，原始数据的分块参数不可用"""
+        raw = protocol == FILE_PROTOCOL_RAW
+        for widget in (self.spin_chunk, self.spin_delay, self.check_hex_text, self.edit_ack, self.check_cts):
+            widget.setEnabled(raw)
+    
+    def toggle_run(self):
+        if self.file_sender and not self.file_sender.finished:
+            self.stop()
+        else:
+            self.start()
+    
+    def start(self):
+        tab = self.tab
+        session = tab.session
+        if not session.is_open:
+            QMessageBox.warning(self, '警告', f'请先连接{tab.name}')
+            return
+        
+        protocol = self.combo_protocol.currentText()
+        if protocol != FILE_PROTOCOL_RAW:
+            try:
+                self.file_sender = ModemSender(session, self.edit_path.text(), protocol,
+                                               self.spin_timeout.value() / 1000)
+            except OSError as e:
+                QMessageBox.warning(self, '警告', f'无法读取文件: {e}')
+                return
+            self.file_sender.start()
+            self.btn_start.setText('停止')
+            self.update_timer.start()
+            tab.log_message(f"{tab.name}开始{protocol}发送: {self.file_sender.path} ({self.file_sender.total} 字节)，"
+                            f"等待接收方开始")
+            return
+        
+        ack = None
+        if self.edit_ack.text():
+            try:
+                ack = re.compile(self.edit_ack.text().encode(session.settings['recv_encoding']))
+            except (re.error, LookupError) as e:
+                QMessageBox.warning(self, '警告', f'应答匹配表达式无效: {e}')
+                return
+        try:
+            self.file_sender = FileSender(session, self.edit_path.text(), self.spin_chunk.value(),
+                                     self.spin_delay.value() / 1000, self.check_hex_text.isChecked(),
+                                     ack, self.check_cts.isChecked(), self.spin_timeout.value() / 1000)
+        except OSError as e:
+            QMessageBox.warning(self, '警告', f'无法读取文件: {e}')
+            return
+        self.file_sender.start()
+        self.btn_start.setText('停止')
+        self.update_timer.start()
+        tab.log_message(f"{tab.name}开始发送文件: {self.file_sender.path} ({self.file_sender.total} 字节)")
+    
+    def stop(self):
+        """停止发送，可重复调用"""
+        if self.file_sender and not self.file_sender.finished:
+            self.file_sender.stop()
+        if self.update_timer.isActive():
+            self.update_progress()
+    
+    def update_progress(self):
+        sender = self.file_sender
+        if not sender:
+            return
+        self.progress.setValue(int(sender.position * 1000 / sender.total) if sender.total else 1000)
+        text = sender.summary()
+        self.label_progress.setText(text)
+        
+        if sender.finished:
+            self.update_timer.stop()
+            self.btn_start.setText('开始')
+            if sender.error:
+                self.tab.log_message(f"{self.tab.name}文件发送失败: {sender.error}，{text}", color='red')
+            elif sender.position < sender.total:
+                self.tab.log_message(f"{self.tab.name}文件发送已停止，{text}")
+            else:
+                self.tab.log_message(f"{self.tab.name}文件发送完成，{text}", color='green')
+
+class ReplayDialog(QDialog):
+    """回放窗口：以录制文件代替串口，数据经本标签页的分帧、解码和显示"""
+    
+    def __init__(self, tab):
+        super().__init__(tab)
+        self.tab = tab
+        self.port = None  # 正在回放的CapturePort
+        self.busy_time = 0.0  # 开始时界面线程的累计处理耗时
+        self.received_start = 0  # 开始时会话的累计接收字节数
+        self.setWindowTitle(f'回放 - {tab.name}')
+        self.resize(520, 160)
+        
+        layout = QVBoxLayout()
+        path_layout = QHBoxLayout()
+        path_layout.addWidget(QLabel('录制文件:'))
+        self.edit_path = QLineEdit()
+        path_layout.addWidget(self.edit_path)
+        btn_browse = QPushButton('浏览')
+        btn_browse.clicked.connect(self.browse)
+        path_layout.addWidget(btn_browse)
+        layout.addLayout(path_layout)
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel('速度:'))
+        self.combo_speed = QComboBox()
+        self.combo_speed.addItems(list(REPLAY_SPEEDS))
+        self.combo_speed.setToolTip('按录制时的时间间隔回放；最快为不等待，可用来测量显示处理能力')
+        options_layout.addWidget(self.combo_speed)
+        options_layout.addWidget(QLabel('数据:'))
+        self.combo_direction = QComboBox()
+        self.combo_direction.addItems(['接收', '发送'])
+        self.combo_direction.setToolTip('回放录制中收到的数据，或当时发出的数据')
+        options_layout.addWidget(self.combo_direction)
+        options_layout.addStretch()
+        layout.addLayout(options_layout)
+        
+        self.label_progress = QLabel('')
+        layout.addWidget(self.label_progress)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.btn_start = QPushButton('开始')
+        self.btn_start.clicked.connect(self.toggle_run)
+        button_layout.addWidget(self.btn_start)
+        btn_close = QPushButton('关闭')
+        btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        
+        # 回放过程中定时刷新进度
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.update_progress)
+    
+    def browse(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, f"选择录制文件 - {self.tab.name}", "",
+                                                   "录制文件 (*.cap);;所有文件 (*)")
+        if file_path:
+            self.edit_path.setText(file_path)
+    
+    def toggle_run(self):
+        if self.port:
+            self.tab.disconnect_serial()
+        else:
+            self.start()
+    
+    def start(self):
+        tab = self.tab
+        session = tab.session
+        if session.is_open or tab.reconnecting:
+            QMessageBox.warning(self, '警告', f'请先断开{tab.name}，回放数据显示在本串口的接收区')
+            return
+        
+        tab.sync_settings()
+        direction = DIRECTION_RX if self.combo_direction.currentText() == '接收' else DIRECTION_TX
+        # 打开后接收线程立即开始回放，须在打开前记录起点
+        self.received_start = session.received_total
+        try:
+            port = session.open_replay(self.edit_path.text(), REPLAY_SPEEDS[self.combo_speed.currentText()],
+                                       direction)
+        except Exception as e:
+            session.close()
+            QMessageBox.warning(self, '警告', f'无法回放: {e}')
+            return
+        
+        # 界面线程处理不过来时暂停读取，尽快回放时不在队列中积压
+        dispatcher = tab.debugger.dispatcher
+        port.throttle = lambda: len(dispatcher.events) >= REPLAY_MAX_BACKLOG
+        self.port = port
+        self.busy_time = dispatcher.busy_time
+        tab.set_settings_enabled(False)
+        for widget in (self.combo_speed, self.combo_direction):
+            widget.setEnabled(False)
+        self.btn_start.setText('停止')
+        self.update_timer.start()
+        tab.log_message(f"{tab.name}开始回放: {port.path} ({self.combo_speed.currentText()})")
+    
+    def finish(self):
+        """标签页断开后调用，记录回放结果，可重复调用"""
+        port = self.port
+        if port is None:
+            return
+        self.port = None
+        self.update_timer.stop()
+        for widget in (self.combo_speed, self.combo_direction):
+            widget.setEnabled(True)
+        self.btn_start.setText('开始')
+        text = port.summary()
+        self.label_progress.setText(text)
+        busy = self.tab.debugger.dispatcher.busy_time - self.busy_time
+        state = '完成' if port.finished else '已停止'
+        self.tab.log_message(f"{self.tab.name}回放{state}，{text}，界面线程处理耗时 {busy:.2f} 秒",
+                             color='green' if port.finished else 'black')
+    
+    def update_progress(self):
+        port = self.port
+        if not port:
+            return
+        self.label_progress.setText(port.summary())
+        # 文件读完且最后一批数据已显示后断开；按累计接收字节判断，回放中清除接收计数不影响
+        if (port.finished and self.tab.session.received_total - self.received_start >= port.replayed
+                and not self.tab.debugger.dispatcher.events):
+            self.tab.disconnect_serial()
+
+class TriggerDialog(QDialog):
+    """触发器窗口：编辑触发器脚本，在接收线程中匹配并执行动作；断开和重连期间保持启用"""
+    
+    COLUMNS = ['行', '触发器', '命中', '执行', '最近命中']
+    
+    def __init__(self, tab):
+        super().__init__(tab)
+        self.tab = tab
+        self.engine = None
+        self.setWindowTitle(f'触发器 - {tab.name}')
+        self.resize(720, 560)
+        
+        layout = QVBoxLayout()
+        self.edit_script = QPlainTextEdit()
+        self.edit_script.setFont(QFont('Consolas', 9))
+        self.edit_script.setPlainText(tab.session.triggers or TRIGGER_HELP)
+        layout.addWidget(self.edit_script)
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel('保存目录:'))
+        self.edit_dir = QLineEdit()
+        self.edit_dir.setPlaceholderText('当前目录')
+        self.edit_dir.setToolTip('save保存的触发前数据和capture=start开始的录制文件放在此目录')
+        options_layout.addWidget(self.edit_dir)
+        btn_browse = QPushButton('浏览')
+        btn_browse.clicked.connect(self.browse)
+        options_layout.addWidget(btn_browse)
+        self.check_show = QCheckBox('日志显示发送')
+        self.check_show.setChecked(True)
+        options_layout.addWidget(self.check_show)
+        layout.addLayout(options_layout)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.btn_start = QPushButton('启用')
+        self.btn_start.clicked.connect(self.toggle_run)
+        button_layout.addWidget(self.btn_start)
+        btn_close = QPushButton('关闭')
+        btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        
+        # 启用期间定时刷新命中统计
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(200)
+        self.update_timer.timeout.connect(self.update_results)
+    
+    def browse(self):
+        directory = QFileDialog.getExistingDirectory(self, '选择保存目录', self.edit_dir.text())
+        if directory:
+            self.edit_dir.setText(directory)
+    
+    def save_script(self):
+        """脚本保存到串口配置中"""
+        script = self.edit_script.toPlainText()
+        if script != self.tab.session.triggers:
+            self.tab.session.triggers = script
+            self.tab.debugger.save_config()
+    
+    def toggle_run(self):
+        if self.engine:
+            self.stop()
+        else:
+            self.start()
+    
+    def start(self):
+        tab = self.tab
+        tab.sync_settings()
+        self.save_script()
+        try:
+            rules = parse_triggers(self.edit_script.toPlainText())
+            if not rules:
+                raise ValueError('脚本中没有触发器')
+            engine = TriggerEngine(tab.session, rules, self.check_show.isChecked(),
+                                   self.edit_dir.text() or '.', f'{tab.name}触发')
+        except ValueError as e:
+            QMessageBox.warning(self, '警告', str(e))
+            return
+        dispatcher = tab.debugger.dispatcher
+        engine.on_trigger = lambda engine, event: dispatcher.post(('trigger', tab, event))
+        engine.capture_factory = lambda: self.new_capture(engine.save_dir)
+        engine.start()
+        self.engine = engine
+        self.edit_script.setReadOnly(True)
+        self.btn_start.setText('停用')
+        self.update_results()
+        self.update_timer.start()
+        tab.log_message(f"{tab.name}触发器已启用: {len(rules)} 条")
+    
+    def stop(self):
+        """停用触发器，可重复调用"""
+        engine = self.engine
+        if not engine:
+            return
+        engine.stop()
+        self.update_timer.stop()
+        self.update_results()
+        self.engine = None
+        self.edit_script.setReadOnly(False)
+        self.btn_start.setText('启用')
+        self.tab.log_messages([f"{self.tab.name}触发器已停用"] +
+                              [f"{self.tab.name}触发 {rule.summary()}" for rule in engine.rules if rule.hits])
+    
+    def new_capture(self, directory):
+        """capture=start时在接收线程中调用，按录制设置创建并启动录制"""
+        tab = self.tab
+        current_time = time.strftime('%Y%m%d_%H%M%S')
+        file_path = os.path.join(directory, f"capture_port{tab.session.index}_{current_time}.cap")
+        writer = CaptureWriter(file_path, tab.session.index, tab.debugger.capture_rotate_bytes,
+                               tab.debugger.capture_rotate_seconds)
+        writer.start()
+        return writer
+    
+    def closeEvent(self, event):
+        self.save_script()
+        super().closeEvent(event)
+    
+    def update_results(self):
+        engine = self.engine
+        if not engine:
+            return
+        self.table.setRowCount(len(engine.rules))
+        for row, rule in enumerate(engine.rules):
+            last = '-'
+            if rule.last_time is not None:
+                last = f"{datetime.fromtimestamp(rule.last_time).strftime('%H:%M:%S')} {rule.last_text}"
+            values = [str(rule.line), rule.text, str(rule.hits), str(rule.fired), last]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+class StatsDialog(QDialog):
+    """性能统计窗口：每秒显示各串口的收包速率和处理耗时，以及界面线程的负载，可导出为JSON行"""
+    COLUMNS = ('串口', '字节/秒', '读取/秒', '平均读取', '读取大小分布', '块/批次', '行/秒',
+               '解码ms/秒', '格式化ms/秒', '排队延迟ms', '发送拒绝')
+    
+    def __init__(self, debugger):
+        super().__init__(debugger)
+        self.debugger = debugger
+        self.export_file = None
+        self.exporter = None
+        self.last = None  # 上次刷新时的界面线程计数
+        self.setWindowTitle('性能统计')
+        self.resize(900, 260)
+        
+        layout = QVBoxLayout()
+        control_layout = QHBoxLayout()
+        self.check_enable = QCheckBox('启用统计')
+        self.check_enable.setToolTip('关闭时接收线程只多一次判断，几乎没有额外开销')
+        self.check_enable.toggled.connect(self.toggle_enabled)
+        control_layout.addWidget(self.check_enable)
+        self.check_export = QCheckBox('导出JSON行')
+        self.check_export.setToolTip('每秒为每个串口和界面线程各追加一行JSON记录')
+        self.check_export.toggled.connect(self.toggle_export)
+        control_layout.addWidget(self.check_export)
+        self.check_http = QCheckBox('HTTP指标')
+        self.check_http.setToolTip('在后台线程提供 /metrics 接口(Prometheus/OpenMetrics格式)，只在被采集时读取计数')
+        self.check_http.toggled.connect(self.toggle_http)
+        control_layout.addWidget(self.check_http)
+        control_layout.addWidget(QLabel('端口:'))
+        self.spin_http_port = QSpinBox()
+        self.spin_http_port.setRange(1, 65535)
+        self.spin_http_port.setValue(DEFAULT_METRICS_PORT)
+        control_layout.addWidget(self.spin_http_port)
+        control_layout.addStretch()
+        layout.addLayout(control_layout)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+        self.label_ui = QLabel('')
+        layout.addWidget(self.label_ui)
+        self.setLayout(layout)
+        
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(int(METRICS_INTERVAL * 1000))
+        self.update_timer.timeout.connect(self.update_stats)
+    
+    def toggle_enabled(self, enabled):
+        self.debugger.set_metrics_enabled(enabled)
+        if enabled:
+            self.last = None
+            self.update_ui_stats()
+            self.update_timer.start()
+        else:
+            self.update_timer.stop()
+            self.check_export.setChecked(False)
+    
+    def toggle_export(self, enabled):
+        if not enabled:
+            if self.export_file:
+                self.export_file.close()
+                self.export_file = None
+                self.debugger.log_message("性能统计导出已停止")
+            return
+        current_time = QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss')
+        file_path, _ = QFileDialog.getSaveFileName(self, '导出性能统计', f'stats_{current_time}.jsonl',
+                                                   'JSON行 (*.jsonl);;所有文件 (*)')
+        if not file_path:
+            self.check_export.setChecked(False)
+            return
+        try:
+            self.export_file = open(file_path, 'a', encoding='utf-8')
+        except OSError as e:
+            self.check_export.setChecked(False)
+            self.debugger.log_message(f"无法导出性能统计: {str(e)}", color='red')
+            return
+        self.check_enable.setChecked(True)
+        self.debugger.log_message(f"性能统计导出到: {file_path}")
+    
+    def toggle_http(self, enabled):
+        if not enabled:
+            if self.exporter:
+                self.exporter.stop()
+                self.exporter = None
+                self.debugger.log_message("HTTP指标接口已关闭")
+            self.spin_http_port.setEnabled(True)
+            return
+        tabs = self.debugger.tabs
+        try:
+            self.exporter = MetricsExporter(lambda: [tab.session for tab in list(tabs)],
+                                            self.spin_http_port.value())
+        except OSError as e:
+            self.check_http.setChecked(False)
+            self.debugger.log_message(f"无法启动HTTP指标接口: {str(e)}", color='red')
+            return
+        self.exporter.start()
+        self.spin_http_port.setEnabled(False)
+        self.debugger.log_message(f"HTTP指标接口: {self.exporter.address}")
+    
+    def update_ui_stats(self):
+        """界面线程自上次刷新以来的负载，第一次调用只记录基准"""
+        debugger = self.debugger
+        dispatcher = debugger.dispatcher
+        now = time.monotonic()
+        current = (now, dispatcher.drains, dispatcher.handled, dispatcher.busy_time, debugger.render_ns,
+                   debugger.log_model.dropped)
+        last, self.last = self.last, current
+        max_depth = dispatcher.max_depth
+        dispatcher.max_depth = 0
+        if last is None:
+            return None
+        interval = max(now - last[0], 1e-9)
+        drains = current[1] - last[1]
+        handled = current[2] - last[2]
+        return {
+            'port': '界面',
+            'interval_s': round(interval, 3),
+            'drains_per_s': drains / interval,
+            'events_per_drain': handled / drains if drains else 0.0,
+            'queue_depth_max': max_depth,
+            'queue_depth_now': len(dispatcher.events),
+            'busy_pct': (current[3] - last[3]) / interval * 100,
+            'render_ms_per_s': (current[4] - last[4]) / 1e6 / interval,
+            'log_dropped': current[5] - last[5],
+        }
+    
+    def update_stats(self):
+        records = [record for record in (tab.session.metrics_snapshot() for tab in self.debugger.tabs) if record]
+        ui = self.update_ui_stats()
+        
+        self.table.setRowCount(len(records))
+        for row, record in enumerate(records):
+            histogram = ' '.join(f'{size}×{count}' for size, count in record['read_size_histogram'].items())
+            values = (record['port'], f"{record['bytes_per_s']:.0f}", f"{record['reads_per_s']:.1f}",
+                      f"{record['read_size_mean']:.1f}", histogram, f"{record['chunks_per_batch']:.1f}",
+                      f"{record['lines_per_s']:.1f}", f"{record['decode_ms_per_s']:.2f}",
+                      f"{record['format_ms_per_s']:.2f}", f"{record['queue_latency_ms_max']:.1f}",
+                      str(record['send_rejected']))
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        if ui:
+            self.label_ui.setText(
+                f"界面线程: 处理 {ui['drains_per_s']:.1f} 次/秒，每次平均 {ui['events_per_drain']:.1f} 个事件，"
+                f"最多 {ui['queue_depth_max']} 个，占用 {ui['busy_pct']:.1f}%，"
+                f"渲染 {ui['render_ms_per_s']:.2f} ms/秒，日志丢弃 {ui['log_dropped']} 行")
+            records.append(ui)
+        
+        if self.export_file:
+            timestamp = datetime.now().isoformat(timespec='milliseconds')
+            try:
+                for record in records:
+                    self.export_file.write(json.dumps({'time': timestamp, **record}, ensure_ascii=False) + '\n')
+                self.export_file.flush()
+            except OSError as e:
+                self.debugger.log_message(f"性能统计导出失败: {str(e)}", color='red')
+                self.check_export.setChecked(False)
+
+class SerialDebugger(QWidget):
+    ports_changed = pyqtSignal(list, list)  # 监视线程发现串口变化(新增信息列表, 移除设备名列表)
+    
+    def __init__(self):
+        super().__init__()
+        # 每个串口一个标签页，标签页持有PortSession
+        self.tabs = []
+        
+        # 录制文件轮换设置
+        self.capture_rotate_bytes = DEFAULT_CAPTURE_ROTATE_BYTES
+        self.capture_rotate_seconds = DEFAULT_CAPTURE_ROTATE_SECONDS
+        
+        # 所有串口的收发事件经同一通道批量送到界面线程
+        self.dispatcher = UiDispatcher(self.on_ui_events, DEFAULT_FLUSH_RATE, self)
+        self.render_ns = 0  # 追加日志和刷新视图的累计耗时
+        
+        # 性能统计，启用时每个会话设置PortMetrics
+        self.metrics_enabled = False
+        self.stats_dialog = None
+        
+        # 串口列表由后台线程监视，界面只读取缓存，启动时先显示上次保存的列表
+        self.port_watcher = PortWatcher(self.ports_changed.emit)
+        self.ports_changed.connect(self.on_ports_changed)
+        
+        self.init_ui()
+        self.load_config()
+        self.port_watcher.start()
+        
+        # 显示版本信息
+        self.log_message(f"双串口调试器 v{VERSION} 启动成功", color='blue')
+        self.log_message(f"构建时间: {BUILD_TIME}", color='blue')
+        self.log_message(f"作者: logicsoft@qq.com", color='blue')
+        self.log_message("支持从SSCOM.ini文件导入词条配置", color='blue')
+    
+    def init_ui(self):
+        """初始化用户界面"""
+        # 设置窗口标题
+        self.setWindowTitle(f'双串口调试器 v{VERSION} - {BUILD_TIME} - logicsoft@qq.com')
+        self.setGeometry(100, 100, 1200, 800)
+        
+        # 主布局
+        main_layout = QVBoxLayout()
+        
+        # 串口标签页，按配置动态创建
+        self.tab_widget = QTabWidget()
+        self.tab_widget.setTabsClosable(True)
+        self.tab_widget.tabCloseRequested.connect(self.remove_port)
+        
+        # 添加串口按钮
+        self.btn_add_port = QPushButton('添加串口')
+        self.btn_add_port.setToolTip(f'新建一个串口标签页，最多{MAX_PORT_COUNT}个')
+        self.btn_add_port.clicked.connect(lambda: self.add_port())
+        self.tab_widget.setCornerWidget(self.btn_add_port)
+        
+        main_layout.addWidget(self.tab_widget)
+        
+        # 日志区域
+        log_group = QGroupBox('程序日志')
+        log_layout = QVBoxLayout()
+        
+        # 日志控制按钮，串口选择复选框在添加串口时插入到伸缩项之前
+        self.log_control_layout = QHBoxLayout()
+        log_control_layout = self.log_control_layout
+        
+        log_control_layout.addStretch()
+        
+        # 前两个串口双向桥接
+        self.check_bridge = QCheckBox('双向桥接')
+        self.check_bridge.setToolTip('前两个串口收到的数据在接收线程中直接转发给对方，用于串在设备和主机之间监听；'
+                                     '数据仍照常显示和录制')
+        self.check_bridge.toggled.connect(self.toggle_bridge)
+        log_control_layout.addWidget(self.check_bridge)
+        
+        self.btn_stats = QPushButton('性能统计')
+        self.btn_stats.setToolTip('显示每个串口的接收速率、读取大小、排队延迟和各处理阶段耗时，可导出为JSON行')
+        self.btn_stats.clicked.connect(self.show_stats_dialog)
+        log_control_layout.addWidget(self.btn_stats)
+        
+        # 日志行数上限
+        log_control_layout.addWidget(QLabel('日志上限(行):'))
+        self.spin_log_lines = QSpinBox()
+        self.spin_log_lines.setRange(1000, 1000000)
+        self.spin_log_lines.setSingleStep(10000)
+        self.spin_log_lines.setValue(DEFAULT_LOG_MAX_LINES)
+        self.spin_log_lines.setToolTip('超过上限时自动丢弃最早的日志')
+        self.spin_log_lines.editingFinished.connect(
+            lambda: self.log_model.set_max_lines(self.spin_log_lines.value()))
+        log_control_layout.addWidget(self.spin_log_lines)
+        
+        # 清除日志按钮
+        self.btn_clear_log = QPushButton('清除日志')
+        self.btn_clear_log.clicked.connect(self.clear_log)
+        log_control_layout.addWidget(self.btn_clear_log)
+        
+        # 保存日志按钮
+        self.btn_save_log = QPushButton('保存日志')
+        self.btn_save_log.clicked.connect(self.save_log)
+        log_control_layout.addWidget(self.btn_save_log)
+        
+        # 关于按钮
+        self.btn_about = QPushButton('关于')
+        self.btn_about.clicked.connect(self.show_about)
+        log_control_layout.addWidget(self.btn_about)
+        
+        log_layout.addLayout(log_control_layout)
+        
+        # 日志显示区域（模型/视图，固定行高，只绘制可见行）
+        self.log_model = LogModel(DEFAULT_LOG_MAX_LINES, self)
+        self.view_log = QTableView()
+        self.view_log.setModel(self.log_model)
+        self.view_log.setFont(QFont('Consolas', 9))
+        self.view_log.horizontalHeader().hide()
+        self.view_log.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.view_log.verticalHeader().hide()
+        self.view_log.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view_log.verticalHeader().setDefaultSectionSize(self.view_log.fontMetrics().height() + 2)
+        self.view_log.setShowGrid(False)
+        self.view_log.setWordWrap(False)
+        self.view_log.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view_log.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view_log.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view_log.setMinimumHeight(400)  # 增大最小高度
+        self.view_log.setMaximumHeight(600)  # 增大最大高度
+        copy_shortcut = QShortcut(QKeySequence.Copy, self.view_log)
+        copy_shortcut.setContext(Qt.WidgetShortcut)
+        copy_shortcut.activated.connect(self.copy_log_selection)
+        log_layout.addWidget(self.view_log)
+        
+        log_group.setLayout(log_layout)
+        main_layout.addWidget(log_group)
+        
+        self.setLayout(main_layout)
+    
+    def add_port(self, config=None):
+        """新建一个串口会话和对应的标签页"""
+        if len(self.tabs) >= MAX_PORT_COUNT:
+            QMessageBox.warning(self, '警告', f'最多支持{MAX_PORT_COUNT}个串口')
+            return None
+        index = max((tab.session.index for tab in self.tabs), default=0) + 1
+        tab = PortTab(PortSession(index, config), self)
+        # 连接和重连在界面线程中执行，查找USB设备只读监视线程的缓存，不同步枚举
+        tab.session.port_cache = self.port_watcher.snapshot
+        if self.metrics_enabled:
+            tab.session.set_metrics(PortMetrics())
+        self.tabs.append(tab)
+        self.tab_widget.addTab(tab, tab.name)
+        self.log_control_layout.insertWidget(len(self.tabs) - 1, tab.check_log_port)
+        tab.set_ports(self.port_list())
+        return tab
+    
+    def remove_port(self, tab_index):
+        """关闭串口标签页，至少保留一个"""
+        tab = self.tab_widget.widget(tab_index)
+        if len(self.tabs) <= 1:
+            return
+        if tab.session.is_open or tab.reconnecting:
+            reply = QMessageBox.question(
+                self,
+                '确认关闭',
+                f'{tab.name}正在连接，确定要断开并关闭吗？',
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+            tab.disconnect_serial()
+        if tab in self.tabs[:2]:
+            self.check_bridge.setChecked(False)
+        tab.check_record.setChecked(False)
+        if tab.trigger_dialog:
+            tab.trigger_dialog.stop()
+        self.tabs.remove(tab)
+        self.tab_widget.removeTab(tab_index)
+        self.log_control_layout.removeWidget(tab.check_log_port)
+        tab.check_log_port.deleteLater()
+        tab.deleteLater()
+        self.save_config()
+    
+    def toggle_bridge(self, checked):
+        """开启或停止前两个串口之间的双向转发"""
+        if checked and len(self.tabs) < 2:
+            QMessageBox.warning(self, '警告', '桥接需要两个串口')
+            self.check_bridge.setChecked(False)
+            return
+        if checked:
+            first, second = self.tabs[0].session, self.tabs[1].session
+            first.set_bridge(second)
+            second.set_bridge(first)
+            self.log_message(f"已桥接 {first.name} ⇄ {second.name}，收到的数据直接转发给对方", color='blue')
+        else:
+            bridged = [tab.session for tab in self.tabs if tab.session.bridge is not None]
+            for session in bridged:
+                session.set_bridge(None)
+            if bridged:
+                self.log_message("已停止桥接", color='blue')
+    
+    def show_stats_dialog(self):
+        """打开性能统计窗口，不阻塞主窗口"""
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+    
+    def set_metrics_enabled(self, enabled):
+        """启用或关闭所有串口的性能统计，关闭后热路径上只剩一次判断"""
+        self.metrics_enabled = enabled
+        for tab in self.tabs:
+            tab.session.set_metrics(PortMetrics() if enabled else None)
+    
+    def port_list(self):
+        """缓存的可用串口信息列表"""
+        return self.port_watcher.snapshot()
+    
+    def scan_ports(self):
+        """在后台重新扫描可用串口，结果由on_ports_changed显示"""
+        self.port_watcher.refresh()
+    
+    def on_ports_changed(self, added, removed):
+        """串口插拔后增量更新各标签页的串口列表"""
+        for tab in self.tabs:
+            tab.update_ports(added, removed)
+        if added:
+            self.log_message("发现串口: " + ', '.join(f"{port['device']}({port['description']})"
+                                                    for port in added))
+        if removed:
+            self.log_message(f"串口已移除: {', '.join(removed)}")
+        if not added and not removed:
+            ports = self.port_watcher.devices()
+            if ports:
+                self.log_message(f"共 {len(ports)} 个串口: {', '.join(ports)}")
+            else:
+                self.log_message("未发现可用串口")
+    
+    def on_ui_events(self, events):
+        """界面线程批量处理所有串口的收发事件，日志一次追加"""
+        entries = []
+        errors = []
+        touched = set()
+        for kind, tab, payload in events:
+            # 标签页已关闭时丢弃残留事件
+            if tab not in self.tabs:
+                continue
+            if kind == 'received':
+                entries.extend(tab.on_data_received(payload))
+            elif kind == 'written':
+                entries.extend(tab.on_data_written(*payload))
+            elif kind == 'trigger':
+                entries.extend(tab.on_trigger(payload))
+            else:
+                errors.append((tab, payload))
+            touched.add(tab)
+        for tab in touched:
+            tab.update_counters()
+        start_ns = time.perf_counter_ns()
+        self.log_entries(entries)
+        self.render_ns += time.perf_counter_ns() - start_ns
+        # 错误只影响出错的串口，其他串口继续收发和录制
+        for tab, error_msg in errors:
+            tab.on_port_error(error_msg)
+    
+    def log_message(self, message, color='black'):
+        """添加日志消息"""
+        self.log_messages([message], color)
+    
+    def log_messages(self, messages, color='black'):
+        """批量添加同一颜色的日志消息"""
+        self.log_entries([(message, color) for message in messages])
+    
+    def log_entries(self, entries):
+        """批量添加日志[(消息, 颜色), ...]，多行消息按行拆分"""
+        if not entries:
+            return
+        
+        # 获取当前时间
+        current_time = QDateTime.currentDateTime().toString('hh:mm:ss.zzz')
+        
+        lines = []
+        for message, color in entries:
+            # 格式化消息，末尾换行不产生空行
+            text = f'[{current_time}] {message}'.rstrip('\n')
+            for line in text.split('\n'):
+                # 过长的行折成多行，保证每行高度一致
+                for i in range(0, max(len(line), 1), LOG_LINE_WIDTH):
+                    lines.append((line[i:i + LOG_LINE_WIDTH], color))
+        
+        # 视图已在底部时才自动滚动，方便向上翻看历史
+        scrollbar = self.view_log.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        
+        # 添加到日志区域
+        self.log_model.append_lines(lines)
+        
+        # 自动滚动到底部
+        if at_bottom:
+            self.view_log.scrollToBottom()
+    
+    def copy_log_selection(self):
+        """复制选中的日志行"""
+        rows = sorted(index.row() for index in self.view_log.selectionModel().selectedIndexes())
+        text = '\n'.join(self.log_model.buffer[row][0] for row in rows)
+        QApplication.clipboard().setText(text)
+    
+    def clear_log(self):
+        """清除日志"""
+        reply = QMessageBox.question(
+            self,
+            '确认清除',
+            '确定要清除所有日志内容吗？',
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        
+        if reply == QMessageBox.Yes:
+            self.log_model.clear()
+            self.log_message("日志已清除")
+    
+    def save_log(self):
+        """保存日志到文件"""
+        # 获取当前时间作为默认文件名
+        current_time = QDateTime.currentDateTime().toString('yyyyMMdd_hhmmss')
+        default_filename = f"serial_debug_log_{current_time}.txt"
+        
+        # 选择保存文件
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "保存日志文件",
+            default_filename,
+            "文本文件 (*.txt);;所有文件 (*)"
+        )
+        
+        if file_path:
+            try:
+                # 逐行写入，不在内存中拼接整个日志
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    for text, _ in self.log_model.buffer:
+                        f.write(text)
+                        f.write('\n')
+                
+                self.log_message(f"日志已保存到: {file_path}", color='green')
+            
+            except Exception as e:
+                self.log_message(f"保存日志失败: {str(e)}", color='red')
+                QMessageBox.critical(self, '错误', f'保存日志失败: {str(e)}')
+    
+    def save_config(self):
+        """保存配置"""
+        try:
+            config = {}
+            # 按标签页顺序保存为serial1、serial2……
+            for i, tab in enumerate(self.tabs, 1):
+                tab.sync_settings()
+                config[f'serial{i}'] = tab.session.to_config()
+            config['log'] = {
+                'max_lines': self.spin_log_lines.value()
+            }
+            config['capture'] = {
+                'rotate_bytes': self.capture_rotate_bytes,
+                'rotate_seconds': self.capture_rotate_seconds
+            }
+            # 串口列表缓存，下次启动时直接显示
+            config['ports'] = self.port_list()
+            
+            save_config(config)
+        
+        except Exception as e:
+            self.log_message(f"保存配置失败: {e}")
+    
+    def load_config(self):
+        """加载配置，为每个serialN创建一个串口标签页"""
+        try:
+            config = load_config()
+        except Exception as e:
+            self.log_message(f"加载配置失败: {e}")
+            config = {}
+        
+        if 'ports' in config:
+            self.port_watcher.load(config['ports'])
+        
+        sections = config_port_sections(config)[:MAX_PORT_COUNT]
+        for _, port_config in sections:
+            self.add_port(port_config)
+        while len(self.tabs) < DEFAULT_PORT_COUNT:
+            self.add_port({})
+        
+        try:
+            # 加载日志配置
+            if 'log' in config and 'max_lines' in config['log']:
+                self.spin_log_lines.setValue(int(config['log']['max_lines']))
+                self.log_model.set_max_lines(self.spin_log_lines.value())
+            
+            # 加载录制配置
+            if 'capture' in config:
+                capture_config = config['capture']
+                if 'rotate_bytes' in capture_config:
+                    self.capture_rotate_bytes = int(capture_config['rotate_bytes'])
+                if 'rotate_seconds' in capture_config:
+                    self.capture_rotate_seconds = int(capture_config['rotate_seconds'])
+        
+        except Exception as e:
+            self.log_message(f"加载配置失败: {e}")
+        
+        # 设置默认焦点
+        self.tabs[0].edit_send.setFocus()
+    
+    def closeEvent(self, event):
+        """程序关闭事件"""
+        for tab in self.tabs:
+            # 断开串口连接
+            if tab.session.is_open or tab.reconnecting:
+                tab.disconnect_serial()
+            # 停止触发器和录制
+            if tab.trigger_dialog:
+                tab.trigger_dialog.stop()
+            tab.check_record.setChecked(False)
+        
+        if self.stats_dialog:
+            self.stats_dialog.check_enable.setChecked(False)
+            self.stats_dialog.check_http.setChecked(False)
+        
+        # 保存配置
+        self.port_watcher.stop()
+        self.save_config()
+        event.accept()
+    
     def show_about(self):
         """显示关于对话框"""
         from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout